@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import time
+import numpy as np
+
+from biosim.animals import Herbivore, Carnivore
+from biosim.cell import Jungle
+
+"""
+Regression benchmark for the cell phases that filter the population.
+
+Times 'Cell.deaths', 'Cell.feeding' and 'Cell.migration' on a crowded jungle
+cell with 1 250, 2 500 and 5 000 animals. Doubling the population should
+roughly double the time of each phase. A ratio close to 4 means that a phase
+has become quadratic in the cell population again.
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+SIZES = (1250, 2500, 5000)
+REPEATS = 3
+
+
+def crowded_cell(n_animals):
+    """
+    Creates a jungle cell with four jungle neighbours. The number of
+    carnivores is fixed, since every carnivore tries to kill every herbivore
+    until it is full, which is quadratic by design.
+    """
+    cell = Jungle()
+    cell.nearby_cells = [Jungle() for _ in range(4)]
+    n_carnivores = 10
+    cell.population = (
+            [Herbivore(age=5, weight=20) for _ in range(n_animals -
+                                                        n_carnivores)] +
+            [Carnivore(age=5, weight=20) for _ in range(n_carnivores)]
+    )
+    return cell
+
+
+def time_phase(phase, n_animals):
+    """
+    Returns the best time of 'REPEATS' runs of a cell phase, in seconds.
+    """
+    best = np.inf
+    for _ in range(REPEATS):
+        cell = crowded_cell(n_animals)
+        start = time.perf_counter()
+        getattr(cell, phase)()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    np.random.seed(123456)
+
+    for phase in ('deaths', 'feeding', 'migration'):
+        times = [time_phase(phase, n_animals) for n_animals in SIZES]
+        ratio = times[-1] / times[-2]
+        print('{:10} {}  ratio {:.2f}'.format(
+            phase,
+            '  '.join('{:6d}: {:7.4f} s'.format(n, t)
+                      for n, t in zip(SIZES, times)),
+            ratio))
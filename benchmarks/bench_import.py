@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+import time
+
+"""
+Startup benchmark for the package.
+
+Times 'import biosim' and 'import biosim.simulation' in fresh interpreters,
+and reports whether matplotlib or pandas were loaded by the import. The time
+of an empty interpreter is subtracted, so only the import itself is measured.
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+REPEATS = 10
+MODULES = ('biosim', 'biosim.simulation')
+HEAVY_MODULES = ('matplotlib', 'pandas')
+
+
+def time_import(statement):
+    """
+    Returns the best wall time of 'REPEATS' fresh interpreters running the
+    statement, in seconds.
+    """
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', statement])
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def loaded_heavy_modules(module):
+    """
+    Returns the heavy modules that are loaded after importing the module.
+    """
+    output = subprocess.check_output([
+        sys.executable, '-c',
+        'import sys, {}; print(" ".join(name for name in {} '
+        'if name in sys.modules))'.format(module, HEAVY_MODULES)
+    ])
+    return output.decode().split()
+
+
+if __name__ == "__main__":
+    baseline = time_import('pass')
+    print('{:20} {:>10}   {}'.format('module', 'time [ms]', 'loaded'))
+    for module in MODULES:
+        elapsed = time_import('import {}'.format(module)) - baseline
+        loaded = loaded_heavy_modules(module)
+        print('{:20} {:10.1f}   {}'.format(
+            module, 1000 * elapsed, ', '.join(loaded) or '-'
+        ))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import math
+import timeit
+import numpy as np
+
+from biosim.animals import Herbivore
+
+"""
+Microbenchmark for the derived constants of the animal parameters.
+
+Compares the methods used every year with the same calculations done from
+the parameter dictionary, as the animals did before the constants were
+introduced: the pregnancy threshold, the propensities of four neighbours
+and the fitness of one animal. Times are per call, in microseconds.
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+NUMBER = 200000
+
+
+def pregnancy_threshold_from_dict():
+    parameters = Herbivore.parameters
+    return parameters['zeta'] * (
+            parameters['w_birth'] + parameters['sigma_birth']
+    )
+
+
+def propensities_from_dict(relative_fodder_list):
+    exp_lambda = np.exp(Herbivore.parameters['lambda'])
+    return [exp_lambda * cell[0] for cell in relative_fodder_list]
+
+
+def fitness_from_dict(animal):
+    parameters = animal.parameters
+    return (1 / (1 + math.exp(
+        parameters['phi_age'] * (animal.age - parameters['a_half'])))) * \
+           (1 / (1 + math.exp(-(parameters['phi_weight'] *
+                                (animal.weight - parameters['w_half'])))))
+
+
+def per_call(function):
+    """
+    Returns the best time of one call of a function, in microseconds.
+    """
+    return min(timeit.repeat(function, number=NUMBER, repeat=5)) / \
+        NUMBER * 1e6
+
+
+if __name__ == "__main__":
+    animal = Herbivore(age=5, weight=20)
+    fodder = [(10.0, None), (0.0, None), (25.0, None), (3.0, None)]
+
+    benchmarks = (
+        ('pregnancy threshold', pregnancy_threshold_from_dict,
+         Herbivore.weight_check_for_pregnancy),
+        ('propensities', lambda: propensities_from_dict(fodder),
+         lambda: Herbivore.calculate_propensities(fodder, passable=True)),
+        ('fitness', lambda: fitness_from_dict(animal),
+         animal.calculate_fitness),
+    )
+    print('{:20} {:>10} {:>10} {:>8}'.format('', 'dict', 'constants',
+                                             'saving'))
+    for name, old, new in benchmarks:
+        old_time = per_call(old)
+        new_time = per_call(new)
+        print('{:20} {:8.3f} us {:8.3f} us {:7.0%}'.format(
+            name, old_time, new_time, 1 - new_time / old_time))
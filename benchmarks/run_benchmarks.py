@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import textwrap
+import time
+import numpy as np
+
+from biosim.animals import Herbivore, Carnivore
+from biosim.branching import Snapshot
+from biosim.population import Population
+from biosim.simulation import BioSim
+
+"""
+Benchmark suite for BioSim.
+
+Times the annual cycle, the phases that work on the cell populations
+(feeding, procreation, migration, aging, loss of weight and deaths),
+'BioSim.animal_distribution' with and without pandas and the rendering of
+one frame, for three scenarios:
+
+    small   the 21 x 13 map from 'examples/check_sim.py', 2 000 animals
+    medium  a 100 x 100 map, 50 000 animals
+    large   a 500 x 500 map, 1 000 000 animals (array backend only)
+
+Every scenario is built with fixed seeds, so two runs perform the same
+work. The cycle and the phases change the simulation, so every repeat
+starts from a snapshot of the populated simulation. The results are
+written as JSON, and the results of an earlier run can be given with
+'--compare' to print the change of each benchmark, e.g.
+
+    python benchmarks/run_benchmarks.py --output new.json --compare old.json
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+CHECK_SIM_MAP = textwrap.dedent("""\
+    OOOOOOOOOOOOOOOOOOOOO
+    OOOOOOOOSMMMMJJJJJJJO
+    OSSSSSJJJJMMJJJJJJJOO
+    OSSSSSSSSSMMJJJJJJOOO
+    OSSSSSJJJJJJJJJJJJOOO
+    OSSSSSJJJDDJJJSJJJOOO
+    OSSJJJJJDDDJJJSSSSOOO
+    OOSSSSJJJDDJJJSOOOOOO
+    OSSSJJJJJDDJJJJJJJOOO
+    OSSSSJJJJDDJJJJOOOOOO
+    OOSSSSJJJJJJJJOOOOOOO
+    OOOSSSSJJJJJJJOOOOOOO
+    OOOOOOOOOOOOOOOOOOOOO""")
+
+SCENARIOS = {
+    'small': {
+        'shape': None, 'animals': 2000, 'repeats': 5,
+        'configurations': (('object', 'cellwise'), ('array', 'cellwise'),
+                           ('array', 'island'))
+    },
+    'medium': {
+        'shape': (100, 100), 'animals': 50000, 'repeats': 3,
+        'configurations': (('object', 'cellwise'), ('array', 'cellwise'),
+                           ('array', 'island'))
+    },
+    'large': {
+        'shape': (500, 500), 'animals': 1000000, 'repeats': 1,
+        'configurations': (('array', 'island'),)
+    },
+}
+
+PHASES = ('feeding', 'procreate', 'migration', 'aging', 'loss_of_weight',
+          'deaths')
+CARNIVORE_SHARE = 0.2
+SEED = 123456
+
+
+def random_map(shape, seed=SEED):
+    """
+    Creates a map with ocean along the edges and random landscape inside.
+    """
+    rng = np.random.default_rng(seed)
+    codes = rng.choice(list('JJJSSDM'), size=shape)
+    codes[[0, -1], :] = 'O'
+    codes[:, [0, -1]] = 'O'
+    return '\n'.join(''.join(row) for row in codes)
+
+
+def populate(sim, n_animals, seed=SEED):
+    """
+    Places animals with random age and weight in random cells that can be
+    traversed. The array backend adds all animals in one call.
+    """
+    rng = np.random.default_rng(seed)
+    island = sim.simulated_island
+    cells = [cell for row in island.island_map for cell in row]
+    passable = np.flatnonzero([cell.passable for cell in cells])
+
+    location = rng.choice(passable, size=n_animals)
+    species = (rng.random(n_animals) < CARNIVORE_SHARE).astype(np.int8)
+    age = rng.integers(0, 20, size=n_animals)
+    weight = np.maximum(rng.normal(20, 5, size=n_animals), 1.0)
+
+    if island.population is not None:
+        island.population.add(location, species, age, weight)
+        return
+
+    for index, code, a, w in zip(location, species, age, weight):
+        species_class = Carnivore if code == Population.CARNIVORE \
+            else Herbivore
+        cells[index].add_animal(species_class(age=int(a), weight=float(w)))
+
+
+def build_simulation(scenario, backend, migration):
+    """
+    Creates a populated simulation for a scenario.
+    """
+    settings = SCENARIOS[scenario]
+    if settings['shape'] is None:
+        island_map = CHECK_SIM_MAP
+    else:
+        island_map = random_map(settings['shape'])
+    sim = BioSim(island_map, [], seed=SEED, backend=backend,
+                 migration=migration)
+    populate(sim, settings['animals'])
+    return sim
+
+
+def time_calls(function, repeats, setup=None):
+    """
+    Calls a function 'repeats' times and returns the times in seconds.
+
+    If 'setup' is given, it is called before every call without being
+    timed, and its return value is passed to the function.
+    """
+    times = []
+    for _ in range(repeats):
+        arguments = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        function(*arguments)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def rendering(sim):
+    """
+    Returns a function that updates and draws one frame of the simulation
+    figure with the Agg backend.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+    sim._setup_graphics(10)
+
+    def render():
+        sim._update_graphics()
+        sim._fig.canvas.draw()
+    return render
+
+
+def run_scenario(scenario):
+    """
+    Runs all benchmarks of a scenario.
+
+    Returns
+    -------
+    results: list
+        One dictionary per benchmark and configuration.
+    """
+    settings = SCENARIOS[scenario]
+    repeats = settings['repeats']
+    results = []
+    for number, (backend, migration) in enumerate(
+            settings['configurations']):
+        sim = build_simulation(scenario, backend, migration)
+        snapshot = Snapshot(sim)
+        benchmarks = [('island_cycle', 'island_cycle')] + [
+            (phase, 'island_' + phase) for phase in PHASES
+        ]
+        for name, method in benchmarks:
+            times = time_calls(
+                lambda island: getattr(island, method)(), repeats,
+                setup=lambda: snapshot.branch(SEED).simulated_island
+            )
+            results.append(record(scenario, backend, migration, name, times))
+
+        times = time_calls(lambda: sim.animal_distribution, repeats)
+        results.append(record(scenario, backend, migration,
+                              'animal_distribution', times))
+        times = time_calls(lambda: sim.get_animal_distribution(raw=True),
+                           repeats)
+        results.append(record(scenario, backend, migration,
+                              'animal_distribution_raw', times))
+
+        if number == 0:
+            times = time_calls(rendering(sim), repeats)
+            results.append(record(scenario, backend, migration, 'rendering',
+                                  times))
+    return results
+
+
+def record(scenario, backend, migration, name, times):
+    """
+    Creates the result dictionary of one benchmark and prints it.
+    """
+    result = {
+        'scenario': scenario, 'backend': backend, 'migration': migration,
+        'benchmark': name, 'best': min(times),
+        'mean': sum(times) / len(times), 'repeats': len(times)
+    }
+    print('{scenario:7} {backend:6} {migration:8} {benchmark:24} '
+          '{best:10.4f} s'.format(**result))
+    return result
+
+
+def git_commit():
+    """
+    Returns the current git commit, or None outside a git repository.
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_file):
+    """
+    Prints the ratio between the best times of this run and a baseline run.
+    """
+    with open(baseline_file) as file:
+        baseline = json.load(file)
+    key = ('scenario', 'backend', 'migration', 'benchmark')
+    old = {tuple(result[k] for k in key): result['best']
+           for result in baseline['results']}
+    print('\nCompared to {}:'.format(baseline['commit']))
+    for result in results:
+        old_best = old.get(tuple(result[k] for k in key))
+        if old_best is not None:
+            print('{scenario:7} {backend:6} {migration:8} {benchmark:24} '
+                  .format(**result) +
+                  '{:10.2f} x'.format(result['best'] / old_best))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark suite for BioSim')
+    parser.add_argument('--scenario', nargs='+', choices=list(SCENARIOS),
+                        default=['small', 'medium'])
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None)
+    args = parser.parse_args()
+
+    results = []
+    for scenario in args.scenario:
+        results += run_scenario(scenario)
+
+    with open(args.output, 'w') as file:
+        json.dump({
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'seed': SEED,
+            'results': results
+        }, file, indent=2)
+
+    if args.compare is not None:
+        compare(results, args.compare)
@@ -10,13 +10,30 @@ __email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
 import numpy as np
 import math
 
+from .parameters import ParameterDict
+
 
 class Animals:
     """
     Superclass for Herbivores and Carnivores.
+
+    The 'parameters' of each subclass are kept in a 'ParameterDict', and
+    'constants' holds the same parameters as a 'ParameterSet', together with
+    the constants derived from them. The methods used every year read the
+    parameters from 'constants', so the derived constants are only calculated
+    again when a parameter changes.
+
+    An animal on an island has its own 'constants', the parameter set of the
+    island's simulation, which is set by the island. Other animals use the
+    'constants' of their class.
     """
 
-    def __init__(self, age=0, weight=None):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'parameters' in cls.__dict__:
+            cls.parameters = ParameterDict(cls, cls.parameters)
+
+    def __init__(self, age=0, weight=None, constants=None):
         """
         Class constructor for Animals.
         Creates an animal with age, weight, fitness and 'has_moved' as instance
@@ -29,7 +46,12 @@ class Animals:
         weight: float
             Weight of the animal. If no value is specified, the weight assigned
             is calculated in class method 'calculate_weight'.
+        constants: ParameterSet
+            Parameters of the animal's simulation. If None, the 'constants'
+            of the class are used.
         """
+        if constants is not None:
+            self.constants = constants
         self.age = age
         if weight is None:
             self.weight = self.calculate_weight()
@@ -38,12 +60,19 @@ class Animals:
         self.fitness = self.calculate_fitness()
         self.has_moved = False
 
-    def aging(self):
+    def aging(self, update=True):
         """
         Increases the age of the animal by one year and updates its fitness.
+
+        Parameters
+        ----------
+        update: bool
+            If False, the fitness is not updated. Used when the fitness of many
+            animals is updated at once with 'batch_fitness'.
         """
         self.age += 1
-        self.update_fitness()
+        if update:
+            self.update_fitness()
 
     def calculate_weight(self):
         """
@@ -55,16 +84,23 @@ class Animals:
         float
             Weight of the animal.
         """
-        return np.random.normal(self.parameters['w_birth'],
-                                self.parameters['sigma_birth'])
+        return np.random.normal(self.constants.w_birth,
+                                self.constants.sigma_birth)
 
-    def loss_of_weight(self):
+    def loss_of_weight(self, update=True):
         """
         Calculates the amount of weight an animal loses every year, and updates
         the animals weight and fitness.
+
+        Parameters
+        ----------
+        update: bool
+            If False, the fitness is not updated. Used when the fitness of many
+            animals is updated at once with 'batch_fitness'.
         """
-        self.weight -= self.weight * self.parameters['eta']
-        self.update_fitness()
+        self.weight -= self.weight * self.constants.eta
+        if update:
+            self.update_fitness()
 
     def weight_gain(self, eaten):
         """
@@ -81,7 +117,7 @@ class Animals:
         float
             Weight adjustment.
         """
-        return eaten * self.parameters['beta']
+        return eaten * self.constants.beta
 
     def calculate_fitness(self):
         """
@@ -95,12 +131,11 @@ class Animals:
         if self.weight <= 0:
             return 0
         else:
+            constants = self.constants
             return (1 / (1 + math.exp(
-                self.parameters['phi_age'] * (
-                        self.age - self.parameters['a_half'])))) * \
-                   (1 / (1 + math.exp(-(self.parameters['phi_weight'] *
-                                      (self.weight - self.parameters[
-                                          'w_half'])))))
+                constants.phi_age * (self.age - constants.a_half)))) * \
+                   (1 / (1 + math.exp(-(constants.phi_weight *
+                                        (self.weight - constants.w_half)))))
 
     def update_fitness(self):
         """
@@ -108,6 +143,64 @@ class Animals:
         """
         self.fitness = self.calculate_fitness()
 
+    @classmethod
+    def batch_fitness(cls, age, weight, constants=None):
+        """
+        Calculates the fitness of many animals of the same species at once.
+        Gives the same values as 'calculate_fitness', but uses one NumPy
+        operation for all animals instead of two 'math.exp' calls per animal.
+
+        Parameters
+        ----------
+        age: array_like
+            Ages of the animals.
+        weight: array_like
+            Weights of the animals.
+        constants: ParameterSet
+            Parameters of the animals, by default the 'constants' of the
+            class.
+
+        Returns
+        -------
+        array
+            Fitness of the animals. Animals with weight <= 0 have fitness 0.
+        """
+        age = np.asarray(age, dtype=float)
+        weight = np.asarray(weight, dtype=float)
+        if constants is None:
+            constants = cls.constants
+        with np.errstate(over='ignore'):
+            fitness = (1 / (1 + np.exp(
+                constants.phi_age * (age - constants.a_half)))) * \
+                      (1 / (1 + np.exp(-(constants.phi_weight *
+                                         (weight - constants.w_half)))))
+        fitness[weight <= 0] = 0
+        return fitness
+
+    @classmethod
+    def update_fitness_of(cls, animals, constants=None):
+        """
+        Updates the fitness of a list of animals of this species using
+        'batch_fitness'.
+
+        Parameters
+        ----------
+        animals: list
+            Animals of the species the method is called on.
+        constants: ParameterSet
+            Parameters of the animals, by default the 'constants' of the
+            class.
+        """
+        if len(animals) == 0:
+            return
+        fitness = cls.batch_fitness(
+            [animal.age for animal in animals],
+            [animal.weight for animal in animals],
+            constants
+        )
+        for animal, value in zip(animals, fitness.tolist()):
+            animal.fitness = value
+
     @property
     def get_fitness(self):
         """
@@ -132,11 +225,18 @@ class Animals:
         """
         self.fitness = value
 
-    def death(self):
+    def death(self, random_number=None):
         """
         Determines whether an animal dies. The animal dies if the fitness of
         the animal is 0. The animal also has a probability of dying each year.
 
+        Parameters
+        ----------
+        random_number: float
+            Uniform random number in [0, 1) used to decide the death. Cells
+            draw these for all their animals at once. If None, a number is
+            drawn here.
+
         Returns
         -------
         Bool
@@ -145,11 +245,11 @@ class Animals:
 
         if self.fitness == 0:
             return True
-        elif bool(np.random.binomial(1, self.parameters['omega'] * (
-                1 - self.fitness))) is True:
-            return True
-        else:
-            return False
+        if random_number is None:
+            random_number = np.random.random()
+        return bool(
+            random_number < self.constants.omega * (1 - self.fitness)
+        )
 
     @classmethod
     def weight_check_for_pregnancy(cls):
@@ -162,9 +262,7 @@ class Animals:
         float
             Threshold value for pregnancy.
         """
-        return cls.parameters['zeta'] * (
-                cls.parameters['w_birth'] + cls.parameters['sigma_birth']
-        )
+        return cls.constants.pregnancy_threshold
 
     def probability_birth(self, n):
         """
@@ -180,7 +278,7 @@ class Animals:
         float
             Probability of birth
         """
-        return min(1, self.parameters['gamma'] * self.fitness * (n - 1))
+        return min(1, self.constants.gamma * self.fitness * (n - 1))
 
     def adjust_weight_after_birth(self, new_born_animal):
         """
@@ -191,9 +289,9 @@ class Animals:
         new_born_animal: Animal
             New born baby
         """
-        self.weight -= self.parameters['xi'] * new_born_animal.weight
+        self.weight -= self.constants.xi * new_born_animal.weight
 
-    def gives_birth(self, n):
+    def gives_birth(self, n, random_number=None):
         """
         Animals have a chance to produce an offspring each year. This is
         decided by their weight and the amount of nearby same species animals.
@@ -208,6 +306,9 @@ class Animals:
         ----------
         n: int
             Number of same species animals in the same cell.
+        random_number: float
+            Uniform random number in [0, 1) used to decide the birth. If None,
+            a number is drawn here.
 
         Returns
         -------
@@ -217,34 +318,46 @@ class Animals:
             Newborn animal.
         """
 
-        if self.weight >= self.weight_check_for_pregnancy():
-            if bool(np.random.binomial(1, self.probability_birth(n))) is True:
+        if self.weight >= self.constants.pregnancy_threshold:
+            if random_number is None:
+                random_number = np.random.random()
+            if random_number < self.probability_birth(n):
                 if isinstance(self, Herbivore):
-                    new_born_animal = Herbivore()
+                    new_born_animal = Herbivore(constants=self.constants)
                 else:
-                    new_born_animal = Carnivore()
+                    new_born_animal = Carnivore(constants=self.constants)
                 self.adjust_weight_after_birth(new_born_animal)
                 return new_born_animal
         else:
             pass
 
-    def check_move(self):
+    def check_move(self, random_number=None):
         """
         Checks if an animal can move. This is checked every time an animal
         attempts to migrate.
 
+        Parameters
+        ----------
+        random_number: float
+            Uniform random number in [0, 1) used for the check. If None, a
+            number is drawn here.
+
         Returns
         -------
         bool
             'True' if the check is passed, 'False' otherwise.
         """
-        return bool(
-            np.random.binomial(1, self.parameters['mu'] * self.fitness)
-        )
+        if random_number is None:
+            random_number = np.random.random()
+        return bool(random_number < self.constants.mu * self.fitness)
 
-    def calculate_propensities(self, relative_fodder_list):
+    @classmethod
+    def calculate_propensities(cls, relative_fodder_list, passable=False,
+                               constants=None):
         """
-        Calculates the propensity to move for the animal.
+        Calculates the propensity to move for the animal. The propensities are
+        the same for all animals of a species in a cell, so a cell calculates
+        them once per species and passes them on to 'migrate'.
 
         Parameters
         ----------
@@ -252,6 +365,12 @@ class Animals:
             A list of up to four nearby available cells. The list can contain
             any cells with invalid landscape types. (i.e. landscape that cannot
             be traversed such as mountain or ocean).
+        passable: bool
+            If True, the list is known to contain only cells that can be
+            traversed, and the landscape types are not checked.
+        constants: ParameterSet
+            Parameters of the animals, by default the 'constants' of the
+            class.
 
         Returns
         -------
@@ -259,6 +378,11 @@ class Animals:
             List of propensity values for each relevant cell the animal is
             considering to migrate to.
         """
+        if constants is None:
+            constants = cls.constants
+        exp_lambda = constants.exp_lambda
+        if passable:
+            return [exp_lambda * cell[0] for cell in relative_fodder_list]
         propensities = []
         for cell in relative_fodder_list:
             if cell[1].landscape_type == 'M':
@@ -266,14 +390,15 @@ class Animals:
             elif cell[1].landscape_type == 'O':
                 propensities.append(float(0))
             else:
-                propensities.append(
-                    np.exp(self.parameters['lambda']) * cell[0])
+                propensities.append(exp_lambda * cell[0])
         return propensities
 
     @staticmethod
     def choose_migration_destination(relative_fodder_list, propensities_list):
         """
-        Calculates which cell the animal decides to migrate to.
+        Calculates which cell the animal decides to migrate to. Each cell is
+        chosen with probability proportional to its propensity, using a single
+        uniform random number.
 
         Parameters
         ----------
@@ -289,21 +414,21 @@ class Animals:
         chosen_cell: Cell
             The cell the animal choose to migrate to.
         """
-        probabilities = []
-        for propensity in propensities_list:
-            probabilities.append(propensity / sum(propensities_list))
-
-        probabilities = np.array(probabilities)
-        probabilities /= probabilities.sum()
-
-        chosen_cell_index = \
-            list(np.random.choice(len(probabilities), 1, p=probabilities))[
-                0]
-
-        chosen_cell = relative_fodder_list[chosen_cell_index][1]
+        draw = np.random.random() * sum(propensities_list)
+
+        cumulative_propensity = 0
+        chosen_cell = None
+        for (_, cell), propensity in zip(relative_fodder_list,
+                                         propensities_list):
+            if propensity > 0:
+                chosen_cell = cell
+                cumulative_propensity += propensity
+                if draw < cumulative_propensity:
+                    break
         return chosen_cell
 
-    def migrate(self, relative_fodder_list):
+    def migrate(self, relative_fodder_list, random_number=None,
+                propensities=None):
         """
         Animal attempts to migrate to one of the nearby cells.
         The movement is determined by the fitness of the animal and the fodder
@@ -318,6 +443,11 @@ class Animals:
             A list of up to four nearby available cells. The list can contain
             any cells with invalid landscape types. (i.e. landscape that cannot
             be traversed such as mountain or ocean).
+        random_number: float
+            Uniform random number in [0, 1) passed on to 'check_move'.
+        propensities: list
+            Propensities for the cells in 'relative_fodder_list', as returned
+            by 'calculate_propensities'. Calculated here if None.
 
         Returns
         -------
@@ -326,8 +456,11 @@ class Animals:
             the animal does not move.
         """
 
-        if self.check_move() is True:
-            propensities = self.calculate_propensities(relative_fodder_list)
+        if self.check_move(random_number) is True:
+            if propensities is None:
+                propensities = self.calculate_propensities(
+                    relative_fodder_list, constants=self.constants
+                )
             if sum(propensities) == 0:
                 return None
             else:
@@ -363,11 +496,11 @@ class Herbivore(Animals):
         'DeltaPhiMax': None
     }
 
-    def __init__(self, age=0, weight=None):
+    def __init__(self, age=0, weight=None, constants=None):
         """
         Herbivore initializer.
         """
-        super(Herbivore, self).__init__(age, weight)
+        super(Herbivore, self).__init__(age, weight, constants)
 
     def feed(self, cell_fodder_info):
         """
@@ -386,7 +519,7 @@ class Herbivore(Animals):
             Amount of actually eaten fodder.
         """
 
-        eaten = self.parameters['F']
+        eaten = self.constants.F
         if cell_fodder_info < eaten:
             eaten = cell_fodder_info
             self.weight += self.weight_gain(eaten)
@@ -421,11 +554,11 @@ class Carnivore(Animals):
         'DeltaPhiMax': 10.0
     }
 
-    def __init__(self, age=0, weight=None):
+    def __init__(self, age=0, weight=None, constants=None):
         """
         Carnivore initializer.
         """
-        super(Carnivore, self).__init__(age, weight)
+        super(Carnivore, self).__init__(age, weight, constants)
 
     def fitness_greater_than_prey(self, prey):
         """
@@ -444,9 +577,7 @@ class Carnivore(Animals):
             and not greater than 'DeltaPhiMax' threshold. 'False' otherwise.
 
         """
-        return 0 < self.fitness - prey.fitness <= self.parameters[
-            'DeltaPhiMax'
-        ]
+        return 0 < self.fitness - prey.fitness <= self.constants.DeltaPhiMax
 
     def chance_of_kill(self, prey):
         """
@@ -462,7 +593,7 @@ class Carnivore(Animals):
         float
             Probability of killing prey.
         """
-        return (self.fitness - prey.fitness) / self.parameters['DeltaPhiMax']
+        return (self.fitness - prey.fitness) / self.constants.DeltaPhiMax
 
     def kill(self, nearby_herbivores):
         """
@@ -487,9 +618,11 @@ class Carnivore(Animals):
         eaten = 0
         killed_herbivores = []
         number_of_nearby_herbivores = len(nearby_herbivores)
+        random_numbers = np.random.random(number_of_nearby_herbivores)
 
-        for herbivore in nearby_herbivores:
-            if eaten < self.parameters['F'] and \
+        for herbivore, random_number in zip(nearby_herbivores,
+                                            random_numbers.tolist()):
+            if eaten < self.constants.F and \
                     kill_attempts <= number_of_nearby_herbivores:
                 if self.fitness <= herbivore.fitness:
                     chance = 0
@@ -498,7 +631,7 @@ class Carnivore(Animals):
                 else:
                     chance = 1
 
-                if bool(np.random.binomial(1, chance)) is True:
+                if random_number < chance:
                     self.weight += self.weight_gain(herbivore.weight)
                     eaten += herbivore.weight
                     self.update_fitness()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+"""
+Branching Module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .ensemble import apply_parameters, record_counts
+from .simulation import BioSim
+
+# snapshot of the worker processes, set by '_set_worker_snapshot'
+_worker_snapshot = None
+
+
+class Snapshot:
+    """
+    In-memory copy of the state of a running simulation, from which any
+    number of independent branches can be started.
+
+    A typical use is to simulate a burn-in once, take a snapshot, and then
+    try several interventions from the same state, e.g. adding carnivores
+    or changing parameters, without simulating the burn-in again. Each
+    branch seeds the random number generator with its own seed after the
+    state is restored, so the branches follow independent random streams.
+
+    Branches created with 'branch' in the same process share the global
+    random number generator, so run each branch to the end before starting
+    the next one. 'run' can instead run the branches in worker processes.
+    """
+
+    def __init__(self, sim):
+        """
+        Class constructor for Snapshot.
+
+        Parameters
+        ----------
+        sim: BioSim
+            The simulation to copy. The simulation can continue afterwards
+            without changing the snapshot.
+        """
+        self.state = {key: np.copy(value)
+                      for key, value in sim.state().items()}
+
+    @property
+    def year(self):
+        """
+        Year of the simulation when the snapshot was taken.
+        """
+        return int(self.state['year'])
+
+    def branch(self, seed, population=None, parameters=None, **kwargs):
+        """
+        Creates a new simulation from the snapshot.
+
+        Parameters
+        ----------
+        seed: int
+            Random number seed of the branch.
+        population: list
+            Animals to add to the branch, in the format of
+            'BioSim.add_population', or None.
+        parameters: dict
+            Parameter overrides for the branch, see
+            'ensemble.apply_parameters', or None.
+        kwargs:
+            Further arguments for the BioSim initializer, e.g. 'img_base'.
+            A 'density_history' records the branch after the population
+            was added as its first year.
+
+        Returns
+        -------
+        sim: BioSim
+            The new simulation, starting at the year of the snapshot.
+        """
+        density_history = kwargs.pop('density_history', None)
+        sim = BioSim.from_state(self.state, **kwargs)
+        np.random.seed(seed)
+        if parameters:
+            apply_parameters(sim, parameters)
+        if population:
+            sim.add_population(population)
+        if density_history is not None:
+            sim.density_history = density_history
+            density_history.record(sim)
+        return sim
+
+    def run(self, branches, num_years, processes=None):
+        """
+        Runs headless branches and records the number of animals per species
+        at the start and after every year.
+
+        On platforms where worker processes are started with 'fork', the
+        workers share the memory of the snapshot with the calling process
+        until it is changed, so the snapshot is not copied for each worker.
+
+        Parameters
+        ----------
+        branches: list
+            One dictionary per branch with the keys 'seed' and, optionally,
+            'population' and 'parameters', see 'branch'.
+        num_years: int
+            Number of years to simulate in every branch.
+        processes: int
+            Number of worker processes. By default one per CPU core. If 0,
+            the branches are run one after another in this process.
+
+        Returns
+        -------
+        counts: list
+            One array per branch with shape (num_years + 1, 2), with the
+            number of herbivores and carnivores for each year.
+        """
+        branches = list(branches)
+        if processes == 0:
+            return [_run_branch(self, branch, num_years)
+                    for branch in branches]
+
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=_set_worker_snapshot,
+                                 initargs=(self,)) as executor:
+            futures = [executor.submit(_run_worker_branch, branch, num_years)
+                       for branch in branches]
+            return [future.result() for future in futures]
+
+
+def _run_branch(snapshot, branch, num_years):
+    """
+    Runs one branch of a snapshot and returns its counts, see
+    'Snapshot.run'.
+    """
+    sim = snapshot.branch(branch['seed'], branch.get('population'),
+                          branch.get('parameters'))
+    return record_counts(sim, num_years)
+
+
+def _set_worker_snapshot(snapshot):
+    """
+    Stores the snapshot in a worker process.
+    """
+    global _worker_snapshot
+    _worker_snapshot = snapshot
+
+
+def _run_worker_branch(branch, num_years):
+    """
+    Runs one branch of the snapshot of a worker process.
+    """
+    return _run_branch(_worker_snapshot, branch, num_years)
@@ -7,22 +7,198 @@ Cell Module
 __author__ = "Michael Lindberg, Daniel Milliam Müller"
 __email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
 
+import numpy as np
+
 from .animals import Herbivore, Carnivore
+from .parameters import ParameterDict
 
 
 class Cell:
     """
     Superclass for all cell types.
+
+    The 'parameters' of each landscape type are kept in a 'ParameterDict',
+    and 'constants' holds the same parameters as a 'ParameterSet'.
+
+    A cell on an island has its own 'constants', and shares the dictionary
+    'parameter_sets' with the island, which maps each species name and
+    landscape code to the parameter set of the island's simulation. The
+    cell stores the parameter sets of its species on the animals added to
+    it. Other cells use the 'constants' of the classes.
+
+    A cell on an island also shares the island's 'species_counts', and every
+    cell method that adds or removes animals updates the counts.
     """
 
-    def __init__(self):
+    passable = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'parameters' in cls.__dict__:
+            cls.parameters = ParameterDict(cls, cls.parameters)
+
+    def __init__(self, constants=None):
         """
         Constructor for cells.
-        """
+
+        Parameters
+        ----------
+        constants: ParameterSet
+            Parameters of the cell's simulation. If None, the 'constants' of
+            the class are used.
+        """
+        if constants is not None:
+            self.constants = constants
+        self.parameter_sets = None
+        self.species_counts = None
+        self.random_numbers = 0
         self.coordinate = ()
         self.fodder = 0
-        self.population = []
+        self.index = None
+        self.population_arrays = None
+        self.herbivores = []
+        self.carnivores = []
+        self._herbivore_biomass = None
         self.nearby_cells = []
+        self._passable_nearby_cells = None
+
+    @property
+    def passable_nearby_cells(self):
+        """
+        The nearby cells that can be traversed. Set once by
+        'Island.generate_nearby_cells', otherwise filtered from
+        'nearby_cells'.
+        """
+        if self._passable_nearby_cells is None:
+            return [cell for cell in self.nearby_cells if cell.passable]
+        return self._passable_nearby_cells
+
+    @passable_nearby_cells.setter
+    def passable_nearby_cells(self, cells):
+        self._passable_nearby_cells = cells
+
+    def _count(self, species, change):
+        """
+        Adds 'change' to the number of animals of a species in the shared
+        'species_counts', if the cell has them.
+        """
+        if self.species_counts is not None and change != 0:
+            self.species_counts[species.__name__] += change
+
+    def species_constants(self, species):
+        """
+        Returns the parameter set of an animal species used in this cell.
+
+        Parameters
+        ----------
+        species: type
+            Herbivore or Carnivore.
+        """
+        if self.parameter_sets is None:
+            return species.constants
+        return self.parameter_sets[species.__name__]
+
+    def _check_object_backend(self, phase):
+        """
+        Raises a RuntimeError if the cell's animals are stored in a
+        'Population'. The phases of the annual cycle are then performed by
+        the 'Population' for the whole island, and the animal objects of the
+        cell are only copies.
+        """
+        if self.population_arrays is not None:
+            raise RuntimeError(
+                'The {} of a cell using the array backend is performed by '
+                'Island.island_{}'.format(phase, phase)
+            )
+
+    @property
+    def population(self):
+        """
+        List of the animals in the cell, herbivores first.
+
+        The herbivores and carnivores are kept in the separate lists
+        'herbivores' and 'carnivores', and this list is created from them.
+        Use 'add_animal' or assign a new list to change the population.
+
+        If the island uses the array backend, the animals are stored in a
+        'Population' object and this is a list of animal copies created from
+        the arrays. The phases of the annual cycle, e.g. 'aging', then raise
+        a RuntimeError, as they are performed by the 'Population'.
+        """
+        if self.population_arrays is not None:
+            return self.population_arrays.animals_in_cell(self.index)
+        return self.herbivores + self.carnivores
+
+    @population.setter
+    def population(self, animals):
+        """
+        Replaces the animals in the cell.
+        """
+        if self.population_arrays is not None:
+            self.population_arrays.replace_cell(self.index, animals)
+        else:
+            n_herbivores = len(self.herbivores)
+            n_carnivores = len(self.carnivores)
+            self.herbivores = [animal for animal in animals
+                               if isinstance(animal, Herbivore)]
+            self.carnivores = [animal for animal in animals
+                               if isinstance(animal, Carnivore)]
+            self._herbivore_biomass = None
+            self._count(Herbivore, len(self.herbivores) - n_herbivores)
+            self._count(Carnivore, len(self.carnivores) - n_carnivores)
+            if self.parameter_sets is not None:
+                for species, members in ((Herbivore, self.herbivores),
+                                         (Carnivore, self.carnivores)):
+                    constants = self.species_constants(species)
+                    for animal in members:
+                        animal.constants = constants
+
+    def add_animal(self, animal):
+        """
+        Adds an animal to the cell's population.
+
+        Parameters
+        ----------
+        animal: Animal
+            Herbivore or Carnivore object.
+        """
+        if self.population_arrays is not None:
+            self.population_arrays.add_animals(self.index, [animal])
+            return
+        if isinstance(animal, Herbivore):
+            self.herbivores.append(animal)
+            if self._herbivore_biomass is not None:
+                self._herbivore_biomass += animal.weight
+            species = Herbivore
+        else:
+            self.carnivores.append(animal)
+            species = Carnivore
+        self._count(species, 1)
+        if self.parameter_sets is not None:
+            animal.constants = self.species_constants(species)
+
+    @property
+    def herbivore_biomass(self):
+        """
+        Total weight of the herbivores in the cell.
+
+        The value is cached, and the cache is cleared by every cell method
+        that changes the herbivores or their weights. Call
+        'reset_herbivore_biomass' after changing herbivore weights directly.
+        """
+        if self.population_arrays is not None:
+            return self.population_arrays.biomass_in_cell(self.index)
+        if self._herbivore_biomass is None:
+            self._herbivore_biomass = sum(
+                herbivore.weight for herbivore in self.herbivores
+            )
+        return self._herbivore_biomass
+
+    def reset_herbivore_biomass(self):
+        """
+        Clears the cached herbivore biomass.
+        """
+        self._herbivore_biomass = None
 
     @staticmethod
     def sort_population(population):
@@ -35,7 +211,8 @@ class Cell:
         return sorted_population
 
     @staticmethod
-    def calculate_relative_fodder(fodder, animal_species, same_species):
+    def calculate_relative_fodder(fodder, animal_species, same_species,
+                                  constants=None):
         """
         Calculates amount of relative fodder in a cell.
 
@@ -47,60 +224,66 @@ class Cell:
             Type of animal
         same_species: int
             Number of same species animals in cell
+        constants: ParameterSet
+            Parameters of the species, by default the 'constants' of
+            'animal_species'.
 
         Returns
         -------
         float:
             Amount of relative fodder in cell.
         """
-        return fodder / (
-                (same_species + 1) * animal_species.parameters['F']
-        )
+        if constants is None:
+            constants = animal_species.constants
+        return fodder / ((same_species + 1) * constants.F)
 
-    def herbivore_nearby_fodder(self, relative_fodder_list):
+    def herbivore_nearby_fodder(self, relative_fodder_list,
+                                nearby_cells=None):
         """
         Calculates the the amount of nearby fodder for herbivores.
         relative_fodder_list is a list containing the amount of fodder for each
-        nearby cell.
+        nearby cell. By default all nearby cells are used.
         """
-        for nearby_cell in self.nearby_cells:
+        if nearby_cells is None:
+            nearby_cells = self.nearby_cells
+        constants = self.species_constants(Herbivore)
+        for nearby_cell in nearby_cells:
             fodder = nearby_cell.fodder
-            same_species = len(
-                [animal for animal in nearby_cell.population if
-                 isinstance(animal, Herbivore)])
+            same_species = nearby_cell.herbivores_in_cell
             relative_fodder = self.calculate_relative_fodder(
-                fodder, Herbivore, same_species
+                fodder, Herbivore, same_species, constants
             )
             relative_fodder_list.append((relative_fodder, nearby_cell))
 
-    def carnivore_nearby_fodder(self, relative_fodder_list):
+    def carnivore_nearby_fodder(self, relative_fodder_list,
+                                nearby_cells=None):
         """
         Calculates the the amount of nearby fodder for carnivores.
         relative_fodder_list is a list containing the amount of fodder for each
-        nearby cell.
-        """
-        for nearby_cell in self.nearby_cells:
-            same_species = len(
-                [animal for animal in nearby_cell.population if
-                 isinstance(animal, Carnivore)])
-            nearby_herbivores = [animal for animal in
-                                 nearby_cell.population if
-                                 isinstance(animal, Herbivore)]
-            fodder = sum(
-                [herbivore.weight for herbivore in nearby_herbivores])
+        nearby cell. By default all nearby cells are used.
+        """
+        if nearby_cells is None:
+            nearby_cells = self.nearby_cells
+        constants = self.species_constants(Carnivore)
+        for nearby_cell in nearby_cells:
+            same_species = nearby_cell.carnivores_in_cell
+            fodder = nearby_cell.herbivore_biomass
             relative_fodder = self.calculate_relative_fodder(
-                fodder, Carnivore, same_species
+                fodder, Carnivore, same_species, constants
             )
             relative_fodder_list.append((relative_fodder, nearby_cell))
 
-    def nearby_relative_fodder(self, animal):
+    def nearby_relative_fodder(self, animal, passable_only=False):
         """
         Calculates the amount of fodder in nearby cells.
 
         Parameters
         ----------
         animal: Animal
-            Either a class instance of Herbivore or Carnivore
+            Either a class instance of Herbivore or Carnivore, or one of the
+            two classes.
+        passable_only: bool
+            If True, only the nearby cells that can be traversed are included.
 
         Returns
         -------
@@ -109,12 +292,13 @@ class Cell:
             nearby cells.
         """
         relative_fodder_list = []
+        nearby_cells = self.passable_nearby_cells if passable_only else None
 
-        if isinstance(animal, Herbivore):
-            self.herbivore_nearby_fodder(relative_fodder_list)
+        if isinstance(animal, Herbivore) or animal is Herbivore:
+            self.herbivore_nearby_fodder(relative_fodder_list, nearby_cells)
 
-        elif isinstance(animal, Carnivore):
-            self.carnivore_nearby_fodder(relative_fodder_list)
+        elif isinstance(animal, Carnivore) or animal is Carnivore:
+            self.carnivore_nearby_fodder(relative_fodder_list, nearby_cells)
 
         return relative_fodder_list
 
@@ -123,18 +307,22 @@ class Cell:
         """
         Returns number of herbivores in cell.
         """
-        herbivores = [animal for animal in self.population if
-                      isinstance(animal, Herbivore)]
-        return len(herbivores)
+        if self.population_arrays is not None:
+            return self.population_arrays.count_in_cell(
+                self.index, self.population_arrays.HERBIVORE
+            )
+        return len(self.herbivores)
 
     @property
     def carnivores_in_cell(self):
         """
         Returns number of carnivores in cell.
         """
-        carnivores = [animal for animal in self.population if
-                      isinstance(animal, Carnivore)]
-        return len(carnivores)
+        if self.population_arrays is not None:
+            return self.population_arrays.count_in_cell(
+                self.index, self.population_arrays.CARNIVORE
+            )
+        return len(self.carnivores)
 
     def feeding(self):
         """
@@ -149,31 +337,33 @@ class Cell:
         Whenever a herbivore feeds, the amount of available fodder in the cell
         is reduced accordingly.
         Whenever a carnivore kills, the number of herbivores in the cell's
-        population is reduced.
+        population is reduced. The remaining herbivores are only filtered
+        after a kill, using a set of the killed animals' ids.
+
+        Each carnivore draws one random number per nearby herbivore, which is
+        added to 'random_numbers'.
         """
-        sorted_herbivores = self.sort_population(
-            [animal for animal in self.population if
-             isinstance(animal, Herbivore)]
-        )
-        sorted_carnivores = self.sort_population(
-            [animal for animal in self.population if
-             isinstance(animal, Carnivore)]
-        )
+        self._check_object_backend('feeding')
+        sorted_herbivores = self.sort_population(self.herbivores)
+        sorted_carnivores = self.sort_population(self.carnivores)
 
-        self.population = sorted_herbivores + sorted_carnivores
+        for herbivore in sorted_herbivores:
+            fodder_eaten = herbivore.feed(self.fodder)
+            self.fodder -= fodder_eaten
 
         nearby_herbivores = sorted_herbivores
-        killed_herbivores = []
-        for animal in self.population:
-            if isinstance(animal, Herbivore):
-                fodder_eaten = animal.feed(self.fodder)
-                self.fodder -= fodder_eaten
-            else:
-                killed_herbivores = animal.kill(nearby_herbivores)
-
-            nearby_herbivores = [herbivore for herbivore in nearby_herbivores
-                                 if herbivore not in killed_herbivores]
-        self.population = nearby_herbivores + sorted_carnivores
+        for carnivore in sorted_carnivores:
+            self.random_numbers += len(nearby_herbivores)
+            killed_herbivores = carnivore.kill(nearby_herbivores)
+            if len(killed_herbivores) > 0:
+                killed_ids = {id(herbivore) for herbivore in killed_herbivores}
+                nearby_herbivores = [herbivore for herbivore in
+                                     nearby_herbivores
+                                     if id(herbivore) not in killed_ids]
+        self._count(Herbivore, len(nearby_herbivores) - len(self.herbivores))
+        self.herbivores = nearby_herbivores
+        self.carnivores = sorted_carnivores
+        self.reset_herbivore_biomass()
 
     def procreate(self):
         """
@@ -183,21 +373,31 @@ class Cell:
         species and currently in the same cell as itself.
 
         Each new born animal is added to the cell's population.
+
+        The random numbers deciding the births are drawn for all animals in
+        the cell at once. Together with the weights of the newborns, they are
+        added to 'random_numbers'.
         """
+        self._check_object_backend('procreate')
         new_born_animals = []
-        for animal in self.population:
-            nearby_same_species = len(
-                [ani for ani in self.population if isinstance(
-                    ani, type(animal)
-                )]
-            )
-            birth = animal.gives_birth(nearby_same_species)
+        population = self.population
+        random_numbers = np.random.random(len(population)).tolist()
+        n_herbivores = self.herbivores_in_cell
+        n_carnivores = self.carnivores_in_cell
+        for animal, random_number in zip(population, random_numbers):
+            if isinstance(animal, Herbivore):
+                nearby_same_species = n_herbivores
+            else:
+                nearby_same_species = n_carnivores
+            birth = animal.gives_birth(nearby_same_species, random_number)
 
             if birth is not None:
                 new_born_animals.append(birth)
 
+        self.random_numbers += len(population) + len(new_born_animals)
+        self.reset_herbivore_biomass()
         for new_born_animal in new_born_animals:
-            self.population.append(new_born_animal)
+            self.add_animal(new_born_animal)
 
     def migration(self):
         """
@@ -210,62 +410,150 @@ class Cell:
 
         After an animal has migrated, its instance is removed from the cell's
         population list.
+
+        The random numbers for the move checks are drawn for all animals in
+        the cell at once. The relative fodder of the nearby cells and the
+        propensities to move there are calculated once per species when the
+        cell's migration starts, so each animal only needs the move check and
+        one random number for the destination. Only the nearby cells that can
+        be traversed are considered. All random numbers drawn are added to
+        'random_numbers'.
         """
+        self._check_object_backend('migration')
         migrations = []
-        if len(self.population) == 0:
-            pass
-        else:
-            for animal in self.population:
-                if animal.has_moved is False:
-                    relative_fodder_list = self.nearby_relative_fodder(animal)
-                    chosen_cell = animal.migrate(relative_fodder_list)
-                    if chosen_cell is not None:
-                        migrations.append((animal, chosen_cell))
+        random_numbers = np.random.random(
+            len(self.herbivores) + len(self.carnivores)
+        ).tolist()
+        self.random_numbers += len(random_numbers)
+        n_herbivores = len(self.herbivores)
+        n_carnivores = len(self.carnivores)
+        self.herbivores = self._migrate_animals(
+            Herbivore, self.herbivores, random_numbers[:n_herbivores],
+            migrations
+        )
+        self.carnivores = self._migrate_animals(
+            Carnivore, self.carnivores, random_numbers[n_herbivores:],
+            migrations
+        )
+        self._count(Herbivore, len(self.herbivores) - n_herbivores)
+        self._count(Carnivore, len(self.carnivores) - n_carnivores)
+        self.reset_herbivore_biomass()
+        for animal, chosen_cell in migrations:
+            chosen_cell.add_animal(animal)
 
-        migrating_animals = []
-        for migration in migrations:
-            migrating_animals.append(migration[0])
+    def _migrate_animals(self, species, animals, random_numbers, migrations):
+        """
+        Lets each animal of one species attempt to migrate.
+
+        Parameters
+        ----------
+        species: type
+            Herbivore or Carnivore.
+        animals: list
+            Animals of one species in the cell.
+        random_numbers: list
+            One uniform random number per animal for the move check.
+        migrations: list
+            List the (animal, chosen cell) pairs of migrating animals are
+            appended to.
+
+        Returns
+        -------
+        staying_animals: list
+            The animals that did not migrate.
+        """
+        staying_animals = []
+        if len(animals) == 0:
+            return staying_animals
 
-        self.population = [animal for animal in self.population if
-                           animal not in migrating_animals]
-        for migration in migrations:
-            migration[1].population.append(migration[0])
+        relative_fodder_list = self.nearby_relative_fodder(
+            species, passable_only=True
+        )
+        propensities = species.calculate_propensities(
+            relative_fodder_list, passable=True,
+            constants=self.species_constants(species)
+        )
+        for animal, random_number in zip(animals, random_numbers):
+            chosen_cell = None
+            if animal.has_moved is False:
+                chosen_cell = animal.migrate(
+                    relative_fodder_list, random_number, propensities
+                )
+                # the destination is drawn when the animal moves
+                self.random_numbers += animal.has_moved
+            if chosen_cell is None:
+                staying_animals.append(animal)
+            else:
+                migrations.append((animal, chosen_cell))
+        return staying_animals
 
-    def aging(self):
+    def aging(self, update_fitness=True):
         """
         Updates animal age for all animals in cell.
+
+        Parameters
+        ----------
+        update_fitness: bool
+            If False, the fitness of the animals is not updated, e.g. to
+            update it afterwards with 'Island.island_update_fitness'.
         """
+        self._check_object_backend('aging')
         for animal in self.population:
-            animal.aging()
+            animal.aging(update_fitness)
 
-    def loss_of_weight(self):
+    def loss_of_weight(self, update_fitness=True):
         """
         Reduces animal weight for all animals in cell
+
+        Parameters
+        ----------
+        update_fitness: bool
+            If False, the fitness of the animals is not updated, e.g. to
+            update it afterwards with 'Island.island_update_fitness'.
         """
+        self._check_object_backend('loss_of_weight')
         for animal in self.population:
-            animal.loss_of_weight()
+            animal.loss_of_weight(update_fitness)
+        self.reset_herbivore_biomass()
 
     def deaths(self):
         """
         Checks whether an animal dies for all animals in cell. Dead animals are
         removed from the cell's population.
-        """
-        dead_animals = []
-        for animal in self.population:
-            if animal.death():
-                dead_animals.append(animal)
-        self.population = [animal for animal in self.population if
-                           animal not in dead_animals]
+
+        The random numbers deciding the deaths are drawn for all animals in
+        the cell at once, and added to 'random_numbers'.
+        """
+        self._check_object_backend('deaths')
+        random_numbers = np.random.random(
+            len(self.herbivores) + len(self.carnivores)
+        ).tolist()
+        self.random_numbers += len(random_numbers)
+        n_herbivores = len(self.herbivores)
+        n_carnivores = len(self.carnivores)
+        self.herbivores = [
+            animal for animal, random_number in zip(
+                self.herbivores, random_numbers[:n_herbivores])
+            if not animal.death(random_number)
+        ]
+        self.carnivores = [
+            animal for animal, random_number in zip(
+                self.carnivores, random_numbers[n_herbivores:])
+            if not animal.death(random_number)
+        ]
+        self._count(Herbivore, len(self.herbivores) - n_herbivores)
+        self._count(Carnivore, len(self.carnivores) - n_carnivores)
+        self.reset_herbivore_biomass()
 
     def fodder_growth(self):
         """
         Replenishes fodder for current cell.
         """
         if isinstance(self, Jungle):
-            self.fodder = self.parameters['f_max']
+            self.fodder = self.constants.f_max
         elif isinstance(self, Savannah):
-            self.fodder = self.fodder + self.parameters['alpha'] * (
-                    self.parameters['f_max'] - self.fodder
+            self.fodder = self.fodder + self.constants.alpha * (
+                    self.constants.f_max - self.fodder
             )
 
 
@@ -275,6 +563,8 @@ class Ocean(Cell):
     Ocean landscape cannot be traversed and contains no food.
     """
 
+    passable = False
+
     def __init__(self):
         """
         Ocean initializer.
@@ -289,6 +579,8 @@ class Mountain(Cell):
     Mountain landscape cannot be traversed and contains no food.
     """
 
+    passable = False
+
     def __init__(self):
         """
         Mountain initializer.
@@ -306,13 +598,13 @@ class Jungle(Cell):
 
     parameters = {'f_max': 800.0}
 
-    def __init__(self):
+    def __init__(self, constants=None):
         """
         Jungle initializer.
         """
-        super(Jungle, self).__init__()
+        super(Jungle, self).__init__(constants)
         self.landscape_type = "J"
-        self.fodder = self.parameters['f_max']
+        self.fodder = self.constants.f_max
 
 
 class Savannah(Cell):
@@ -324,13 +616,13 @@ class Savannah(Cell):
 
     parameters = {'f_max': 300.0, 'alpha': 0.3}
 
-    def __init__(self):
+    def __init__(self, constants=None):
         """
         Savannah initializer.
         """
-        super(Savannah, self).__init__()
+        super(Savannah, self).__init__(constants)
         self.landscape_type = "S"
-        self.fodder = self.parameters['f_max']
+        self.fodder = self.constants.f_max
 
 
 class Desert(Cell):
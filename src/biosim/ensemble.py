@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""
+Ensemble Module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .simulation import BioSim
+
+SPECIES = ('Herbivore', 'Carnivore')
+
+
+def apply_parameters(sim, parameters):
+    """
+    Sets animal and landscape parameters that only apply to one simulation.
+
+    Parameters
+    ----------
+    sim: BioSim
+        The simulation.
+    parameters: dict
+        Dictionary mapping a species name ('Herbivore', 'Carnivore') or a
+        landscape code ('J', 'S') to a dictionary of parameters.
+    """
+    for key, params in parameters.items():
+        if key in SPECIES:
+            sim.set_animal_parameters(key, params)
+        else:
+            sim.set_landscape_parameters(key, params)
+
+
+def run_replicate(island_map, ini_pop, seed, num_years, parameters=None,
+                  backend='object', migration='cellwise'):
+    """
+    Runs one headless simulation and records the number of animals per
+    species at the start and after every year.
+
+    Parameters
+    ----------
+    island_map: str
+        Multi-line string specifying island geography.
+    ini_pop: list
+        List of dictionaries specifying initial population.
+    seed: int
+        Random number seed.
+    num_years: int
+        Number of years to simulate.
+    parameters: dict
+        Parameter overrides, in the format of 'apply_parameters'. They are
+        passed to the BioSim initializer, so the initial fodder and fitness
+        use them as well.
+    backend: str
+        'object' or 'array', see 'Island'.
+    migration: str
+        'cellwise' or 'island', see 'Island'.
+
+    Returns
+    -------
+    counts: numpy.ndarray
+        Array with shape (num_years + 1, 2), with the number of herbivores
+        and carnivores for each year.
+
+    The overrides are set on the simulation only, so a worker process can
+    run replicates with different overrides one after another.
+    """
+    sim = BioSim(island_map, ini_pop, seed, backend=backend,
+                 migration=migration, parameters=parameters)
+    return record_counts(sim, num_years)
+
+
+def record_counts(sim, num_years):
+    """
+    Simulates a simulation headless and records the number of animals per
+    species at the start and after every year.
+
+    Parameters
+    ----------
+    sim: BioSim
+        The simulation.
+    num_years: int
+        Number of years to simulate.
+
+    Returns
+    -------
+    counts: numpy.ndarray
+        Array with shape (num_years + 1, 2), with the number of herbivores
+        and carnivores for each year.
+    """
+    counts = np.zeros((num_years + 1, len(SPECIES)), dtype=int)
+    for year in range(num_years + 1):
+        if year > 0:
+            sim.simulate(num_years=1, vis_years=0)
+        per_species = sim.num_animals_per_species
+        counts[year] = [per_species[species] for species in SPECIES]
+    return counts
+
+
+class EnsembleResult:
+    """
+    The number of animals per species for each year of every replicate of
+    an ensemble.
+    """
+
+    def __init__(self, seeds, counts):
+        """
+        Class constructor for EnsembleResult.
+
+        Parameters
+        ----------
+        seeds: list
+            The seed of each replicate.
+        counts: numpy.ndarray
+            Array with shape (replicates, years, species).
+        """
+        self.seeds = list(seeds)
+        self.years = np.arange(counts.shape[1])
+        self.replicates = {
+            species: counts[:, :, k] for k, species in enumerate(SPECIES)
+        }
+
+    def mean(self, species):
+        """
+        Returns the mean number of animals of a species for each year.
+        """
+        return self.replicates[species].mean(axis=0)
+
+    def quantiles(self, species, q=(0.05, 0.5, 0.95)):
+        """
+        Returns quantiles of the number of animals of a species for each
+        year.
+
+        Parameters
+        ----------
+        species: str
+            'Herbivore' or 'Carnivore'.
+        q: tuple
+            The quantiles to compute.
+
+        Returns
+        -------
+        quantiles: numpy.ndarray
+            Array with shape (len(q), years).
+        """
+        return np.quantile(self.replicates[species], q, axis=0)
+
+
+class Ensemble:
+    """
+    Runs replicates of the same simulation with different seeds in a pool
+    of worker processes.
+
+    The replicates run headless, so the workers never import matplotlib.
+    The parameter overrides are set on each simulation only, and never
+    change the default parameters of the calling process.
+    """
+
+    def __init__(self, island_map, ini_pop, parameters=None,
+                 backend='object', migration='cellwise'):
+        """
+        Class constructor for Ensemble.
+
+        Parameters
+        ----------
+        island_map: str
+            Multi-line string specifying island geography.
+        ini_pop: list
+            List of dictionaries specifying initial population.
+        parameters: dict
+            Parameter overrides, mapping 'Herbivore', 'Carnivore', 'J' or
+            'S' to a dictionary of parameters.
+        backend: str
+            'object' or 'array', see 'Island'.
+        migration: str
+            'cellwise' or 'island', see 'Island'.
+        """
+        self.island_map = island_map
+        self.ini_pop = ini_pop
+        self.parameters = parameters
+        self.backend = backend
+        self.migration = migration
+
+    def run(self, seeds, num_years, processes=None):
+        """
+        Runs one replicate per seed.
+
+        Parameters
+        ----------
+        seeds: list
+            The seed of each replicate.
+        num_years: int
+            Number of years to simulate.
+        processes: int
+            Number of worker processes. By default one per CPU core.
+
+        Returns
+        -------
+        result: EnsembleResult
+            The number of animals per species for each year and replicate.
+        """
+        seeds = list(seeds)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [
+                executor.submit(
+                    run_replicate, self.island_map, self.ini_pop, seed,
+                    num_years, self.parameters, self.backend, self.migration
+                )
+                for seed in seeds
+            ]
+            counts = np.array([future.result() for future in futures])
+        return EnsembleResult(seeds, counts)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+"""
+History Module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import json
+import os
+import numpy as np
+
+from .animals import Herbivore, Carnivore
+
+
+class DensityHistory:
+    """
+    Writes the number of animals of each species in each cell, once per
+    year, into a memory-mapped NumPy array on disk.
+
+    The array has the shape (years, rows, columns, species), with the
+    herbivores at species index 0 and the carnivores at index 1, and is
+    stored as a '.npy' file. Only the years being written are held in
+    memory. When the file is full, it is replaced by a file with twice the
+    room, and 'close' shrinks it to the years recorded. Afterwards, any range
+    of years can be read without loading the rest, see 'load_density'.
+
+    The year of the first row is written to a small JSON file next to the
+    array, named as the array file with '.json' added, e.g.
+    'density.npy.json'.
+
+    Attach a history to a simulation with the 'density_history' argument of
+    'BioSim', which records the initial distribution and every simulated
+    year, or call 'record' directly.
+    """
+
+    species = (Herbivore, Carnivore)
+
+    def __init__(self, filename, capacity=100, dtype=np.int32):
+        """
+        Class constructor for DensityHistory.
+
+        Parameters
+        ----------
+        filename: str
+            Name of the '.npy' file.
+        capacity: int
+            Number of years to allocate room for at the start.
+        dtype: type
+            Integer type of the counts.
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.filename = filename
+        self.capacity = capacity
+        self.dtype = dtype
+        self.first_year = None
+        self.years_recorded = 0
+        self.densities = None
+        self._grid_shape = None
+        self.closed = False
+
+    def _open(self, capacity):
+        """
+        Creates the file with room for 'capacity' years, and copies the years
+        already recorded into it.
+        """
+        shape = (capacity,) + self._grid_shape
+        temporary = self.filename + '.tmp'
+        densities = np.lib.format.open_memmap(temporary, mode='w+',
+                                              dtype=self.dtype, shape=shape)
+        if self.densities is not None:
+            densities[:self.years_recorded] = \
+                self.densities[:self.years_recorded]
+            self.densities.flush()
+            del self.densities
+        densities.flush()
+        os.replace(temporary, self.filename)
+        self.densities = densities
+        self.capacity = capacity
+
+    def record(self, sim):
+        """
+        Writes the number of animals of each species in each cell for the
+        current year of a simulation.
+
+        Parameters
+        ----------
+        sim: BioSim
+            The simulation.
+        """
+        if self.closed:
+            raise ValueError('The density history is closed')
+        island = sim.simulated_island
+        if self.densities is None:
+            self._grid_shape = island.landscape_codes.shape + \
+                (len(self.species),)
+            self._open(self.capacity)
+            self.first_year = sim.year
+            with open(_years_filename(self.filename), 'w') as file:
+                json.dump({'first_year': self.first_year}, file)
+        elif self.years_recorded == self.capacity:
+            self._open(2 * self.capacity)
+
+        grid = self.densities[self.years_recorded]
+        for code, species in enumerate(self.species):
+            grid[..., code] = island.animal_count_map(species)
+        self.years_recorded += 1
+
+    def close(self):
+        """
+        Shrinks the file to the years recorded and writes it to disk. The
+        file can be read with 'load_density' afterwards.
+        """
+        self.closed = True
+        if self.densities is None:
+            return
+        if self.years_recorded < self.capacity:
+            self._open(self.years_recorded)
+        self.densities.flush()
+        self.densities = None
+
+
+def _years_filename(filename):
+    """
+    Returns the name of the file with the year of the first row of a
+    density history.
+    """
+    return filename + '.json'
+
+
+def load_density(filename, years=None, return_years=False):
+    """
+    Reads a density history written by 'DensityHistory' without loading it
+    into memory.
+
+    Parameters
+    ----------
+    filename: str
+        Name of the '.npy' file.
+    years: slice
+        Range of rows to return, e.g. slice(100, 200), or None for all.
+    return_years: bool
+        If True, the simulation year of each returned row is returned as
+        well, read from the JSON file written next to the array.
+
+    Returns
+    -------
+    densities: numpy.memmap
+        Read-only array with shape (years, rows, columns, species).
+    year_numbers: numpy.ndarray
+        Only if 'return_years' is True. The simulation year of each row of
+        'densities'.
+    """
+    densities = np.load(filename, mmap_mode='r')
+    row_numbers = np.arange(len(densities))
+    if years is not None:
+        densities = densities[years]
+        row_numbers = row_numbers[years]
+    if not return_years:
+        return densities
+
+    try:
+        with open(_years_filename(filename)) as file:
+            first_year = json.load(file)['first_year']
+    except (OSError, ValueError, KeyError):
+        raise ValueError('No year information for {}'.format(filename))
+    return densities, first_year + row_numbers
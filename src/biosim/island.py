@@ -7,8 +7,12 @@ Island Module
 __author__ = "Michael Lindberg, Daniel Milliam Müller"
 __email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
 
+import numpy as np
+
 from .cell import Ocean, Mountain, Jungle, Savannah, Desert
 from .animals import Herbivore, Carnivore
+from .parameters import SimulationParameters
+from .population import Population, build_neighbour_table
 
 
 class Island:
@@ -16,7 +20,11 @@ class Island:
     Island class. Superclass for all landscape types.
     """
 
-    def __init__(self, island_map):
+    backends = ('object', 'array')
+    migration_modes = ('cellwise', 'island')
+
+    def __init__(self, island_map, backend='object', migration='cellwise',
+                 parameters=None):
         """
         Class constructor for island.
 
@@ -25,8 +33,49 @@ class Island:
         island_map: str
             String containing information about the island such as shape and
             landscape type.
-        """
+        backend: str
+            How the animals are stored. 'object' keeps one Herbivore or
+            Carnivore object per animal in each cell's population list.
+            'array' stores all animals in a 'Population' object with one NumPy
+            array per attribute, which is much faster for large populations.
+        migration: str
+            'cellwise' lets the cells migrate one after another, so animals
+            see the moves made earlier in the year. 'island' decides the moves
+            of all animals at once from the state at the start of the
+            migration, and requires the 'array' backend.
+        parameters: dict
+            Parameter overrides that only apply to this island, mapping
+            'Herbivore', 'Carnivore', 'J' or 'S' to a dictionary of
+            parameters. They are used from the start, e.g. for the fodder of
+            new cells and the fitness of the initial animals.
+        """
+        if backend not in self.backends:
+            raise ValueError('Backend must be one of {}'.format(self.backends))
+        if migration not in self.migration_modes:
+            raise ValueError(
+                'Migration must be one of {}'.format(self.migration_modes)
+            )
+        if migration == 'island' and backend != 'array':
+            raise ValueError("Island migration requires the 'array' backend")
         self.island_map = island_map
+        self.backend = backend
+        self.migration = migration
+        self.population = None
+        self.neighbour_table = None
+        self.landscape_codes = None
+        self.cell_rows = None
+        self.cell_columns = None
+        self.species_counts = {'Herbivore': 0, 'Carnivore': 0}
+        self.profiler = None
+        self.parameters = SimulationParameters({'Herbivore': Herbivore,
+                                                'Carnivore': Carnivore,
+                                                'J': Jungle,
+                                                'S': Savannah})
+        if parameters is not None:
+            for key, params in parameters.items():
+                self.parameters.set(key, params)
+        self.parameter_sets = {}
+        self.update_parameters()
         self.landscape_dict = {'M': Mountain,
                                'O': Ocean,
                                'J': Jungle,
@@ -38,13 +87,20 @@ class Island:
         Constructs the vertical coordinates for the island map.
         """
         for x in range(len(self.island_map[h_axis])):
-            if self.island_map[h_axis][x] not in self.landscape_dict.keys():
+            landscape = self.island_map[h_axis][x]
+            if landscape not in self.landscape_dict.keys():
                 raise ValueError('Landscape type does not exist')
             else:
-                self.island_map[h_axis][x] = self.landscape_dict[
-                    self.island_map[h_axis][x]
-                ]()
-                self.island_map[h_axis][x].coordinate = (h_axis, x)
+                if landscape in self.parameter_sets:
+                    cell = self.landscape_dict[landscape](
+                        self.parameter_sets[landscape]
+                    )
+                else:
+                    cell = self.landscape_dict[landscape]()
+                cell.coordinate = (h_axis, x)
+                cell.parameter_sets = self.parameter_sets
+                cell.species_counts = self.species_counts
+                self.island_map[h_axis][x] = cell
 
     def construct_map_coordinates(self):
         """
@@ -63,8 +119,11 @@ class Island:
 
     def map_constructor(self):
         """
-        Constructs the entire map of the island.
+        Constructs the entire map of the island, and the neighbour index
+        table 'neighbour_table' used for migration, see
+        'population.build_neighbour_table'.
         """
+        self.update_parameters()
         self.island_map = self.island_map.split('\n')
 
         for n in range(len(self.island_map)):
@@ -73,6 +132,25 @@ class Island:
 
         self.construct_map_coordinates()
 
+        self.landscape_codes = np.array(
+            [[cell.landscape_type for cell in row] for row in self.island_map]
+        )
+        self.cell_rows, self.cell_columns = (
+            indices.ravel() for indices in np.indices(
+                self.landscape_codes.shape
+            )
+        )
+        self.cell_rows.flags.writeable = False
+        self.cell_columns.flags.writeable = False
+        self.neighbour_table = build_neighbour_table(np.array(
+            [[cell.passable for cell in row] for row in self.island_map]
+        ))
+
+        if self.backend == 'array':
+            self.population = Population(self.island_map,
+                                         self.parameter_sets,
+                                         self.neighbour_table)
+
     def generate_cell_above(self, x, y, list_of_nearby_cells):
         """
         Generates cell above current cell.
@@ -105,6 +183,10 @@ class Island:
         """
         Generates a list of cells near current cell. These cells are used for
         animal migration.
+
+        The nearby cells that can be traversed are also stored once in each
+        cell's 'passable_nearby_cells'. The same cells are held by index in
+        'neighbour_table', which is built by 'map_constructor'.
         """
         for y in range(len(self.island_map)):
             for x in range(len(self.island_map[y])):
@@ -122,7 +204,12 @@ class Island:
                 if x != len(self.island_map[y])-1:
                     self.generate_cell_right(x, y, list_of_nearby_cells)
 
-                self.island_map[y][x].nearby_cells = list_of_nearby_cells
+                cell = self.island_map[y][x]
+                cell.nearby_cells = list_of_nearby_cells
+                cell.passable_nearby_cells = [
+                    nearby_cell for nearby_cell in list_of_nearby_cells
+                    if nearby_cell.passable
+                ]
 
     def add_herbivores(self, animal, animal_list):
         """
@@ -137,8 +224,9 @@ class Island:
             List of animals to be added to the population.
         """
         self.island_map[animal_list['loc'][0]][
-            animal_list['loc'][1]].population.append(
-            Herbivore(age=animal['age'], weight=animal['weight']))
+            animal_list['loc'][1]].add_animal(
+            Herbivore(age=animal['age'], weight=animal['weight'],
+                      constants=self.parameter_sets['Herbivore']))
 
     def add_carnivores(self, animal, animal_list):
         """
@@ -153,8 +241,9 @@ class Island:
             List of animals to be added to the population.
         """
         self.island_map[animal_list['loc'][0]][
-            animal_list['loc'][1]].population.append(
-            Carnivore(age=animal['age'], weight=animal['weight']))
+            animal_list['loc'][1]].add_animal(
+            Carnivore(age=animal['age'], weight=animal['weight'],
+                      constants=self.parameter_sets['Carnivore']))
 
     def adding_population(self, population):
         """
@@ -175,6 +264,7 @@ class Island:
                 ],
             }]
         """
+        self.update_parameters()
         try:
             for animals in population:
                 for animal in animals['pop']:
@@ -187,6 +277,60 @@ class Island:
                 'Invalid input for population, see documentation.'
             )
 
+    def set_parameters(self, key, params):
+        """
+        Sets parameters that only apply to this island's simulation, see
+        'SimulationParameters.set', and stores the new parameter sets on the
+        cells and animals.
+
+        Parameters
+        ----------
+        key: str
+            Species name or landscape code.
+        params: dict
+            Dictionary with the parameters to set.
+        """
+        self.parameters.set(key, params)
+        self.update_parameters()
+
+    def update_parameters(self):
+        """
+        Stores the current parameter set of every species and landscape type
+        in 'parameter_sets', which is shared with the cells and the
+        'Population', and as 'constants' of the cells and animals. Only the
+        parameter sets that changed since the last call are stored again.
+
+        This is called whenever parameters of the simulation are set, and
+        before the animals are added and every annual cycle, so changes of
+        the default parameters are used from then on. If the parameters of
+        a species changed, the fitness of all animals is updated. The fodder
+        of the cells is not changed, new fodder parameters are used from the
+        next fodder growth.
+        """
+        changed = set()
+        for key in self.parameters.classes:
+            constants = self.parameters.parameter_set(key)
+            if self.parameter_sets.get(key) is not constants:
+                self.parameter_sets[key] = constants
+                changed.add(key)
+        if len(changed) == 0 or self.landscape_codes is None:
+            return
+
+        for row in self.island_map:
+            for cell in row:
+                if cell.landscape_type in changed:
+                    cell.constants = self.parameter_sets[cell.landscape_type]
+                if self.population is not None:
+                    continue
+                for species, animals in ((Herbivore, cell.herbivores),
+                                         (Carnivore, cell.carnivores)):
+                    if species.__name__ in changed:
+                        constants = self.parameter_sets[species.__name__]
+                        for animal in animals:
+                            animal.constants = constants
+        if changed & {'Herbivore', 'Carnivore'} and self.num_animals > 0:
+            self.island_update_fitness()
+
     def total_population(self):
         """
         Constructs a list containing all the animals on the island.
@@ -196,12 +340,259 @@ class Island:
         total_population_list: list
             List containing the total population on the island.
         """
+        if self.population is not None:
+            return self.population.as_animals()
+
         total_population_list = []
         for y in self.island_map:
             for cell in y:
                 total_population_list += cell.population
         return total_population_list
 
+    @property
+    def num_animals_per_species(self):
+        """
+        Number of animals per species on the island, as dictionary.
+
+        The numbers are updated whenever animals are added, born, killed or
+        die, so no animals are counted here.
+        """
+        if self.population is not None:
+            return {
+                species.__name__: self.population.count(code)
+                for code, species in enumerate(Population.species_classes)
+            }
+        return dict(self.species_counts)
+
+    @property
+    def num_animals(self):
+        """
+        Total number of animals on the island.
+        """
+        return sum(self.num_animals_per_species.values())
+
+    @property
+    def random_numbers(self):
+        """
+        Number of random numbers drawn by the phases of the annual cycle so
+        far, as counted by the cells or the 'Population'.
+        """
+        if self.population is not None:
+            return self.population.random_numbers
+        return sum(cell.random_numbers for row in self.island_map
+                   for cell in row)
+
+    def animal_count_map(self, species, out=None):
+        """
+        Counts the animals of one species in each cell, without copying any
+        animals.
+
+        Parameters
+        ----------
+        species: type
+            Herbivore or Carnivore.
+        out: numpy.ndarray
+            Optional integer array with the shape of the map to write the
+            counts into.
+
+        Returns
+        -------
+        counts: numpy.ndarray
+            Array with the number of animals of the species in each cell.
+        """
+        if out is None:
+            out = np.zeros(self.landscape_codes.shape, dtype=int)
+
+        if self.population is not None:
+            out[:] = self.population.cell_counts(
+                self.population.species_index(species)
+            ).reshape(out.shape)
+            return out
+
+        for y, row in enumerate(self.island_map):
+            for x, cell in enumerate(row):
+                if species is Herbivore:
+                    out[y, x] = len(cell.herbivores)
+                else:
+                    out[y, x] = len(cell.carnivores)
+        return out
+
+    def species_attributes(self, species):
+        """
+        Collects the age, weight and fitness of the animals of one species in
+        arrays, e.g. for statistics.
+
+        With the array backend, the arrays are selected from the
+        'Population' arrays. With the object backend, each array is filled
+        directly from the cells, with the length known from
+        'species_counts'.
+
+        Parameters
+        ----------
+        species: type
+            Herbivore or Carnivore.
+
+        Returns
+        -------
+        attributes: dict
+            Dictionary with one array each for 'age', 'weight' and
+            'fitness'.
+        """
+        if self.population is not None:
+            population = self.population
+            members = population.species == population.species_index(species)
+            return {'age': population.age[members],
+                    'weight': population.weight[members],
+                    'fitness': population.fitness[members]}
+
+        if species is Herbivore:
+            groups = [cell.herbivores for row in self.island_map
+                      for cell in row]
+        else:
+            groups = [cell.carnivores for row in self.island_map
+                      for cell in row]
+        count = self.species_counts[species.__name__]
+        attributes = {}
+        for name, dtype in (('age', int), ('weight', float),
+                            ('fitness', float)):
+            attributes[name] = np.fromiter(
+                (getattr(animal, name) for animals in groups
+                 for animal in animals),
+                dtype=dtype, count=count
+            )
+        return attributes
+
+    def state(self):
+        """
+        Collects the fodder of every cell and the attributes of every animal
+        in arrays, e.g. for a checkpoint.
+
+        Returns
+        -------
+        state: dict
+            Dictionary with the fodder of each cell in 'fodder', with the
+            shape of the map, and one array per animal attribute: 'cell'
+            (cell index, numbered row by row), 'species' (0 for herbivores,
+            1 for carnivores), 'age', 'weight', 'fitness' and 'has_moved'.
+            With the object backend, the animals are ordered by cell, with
+            the herbivores of each cell before the carnivores.
+        """
+        cells = [cell for row in self.island_map for cell in row]
+        state = {
+            'fodder': np.array([cell.fodder for cell in cells],
+                               dtype=float).reshape(self.landscape_codes.shape)
+        }
+        if self.population is not None:
+            population = self.population
+            state.update(cell=population.cell, species=population.species,
+                         age=population.age, weight=population.weight,
+                         fitness=population.fitness,
+                         has_moved=population.has_moved)
+            return state
+
+        columns = {name: [] for name in ('cell', 'species', 'age', 'weight',
+                                         'fitness', 'has_moved')}
+        for index, cell in enumerate(cells):
+            for code, animals in enumerate((cell.herbivores,
+                                            cell.carnivores)):
+                for animal in animals:
+                    columns['cell'].append(index)
+                    columns['species'].append(code)
+                    columns['age'].append(animal.age)
+                    columns['weight'].append(animal.weight)
+                    columns['fitness'].append(animal.fitness)
+                    columns['has_moved'].append(animal.has_moved)
+        state.update(
+            cell=np.array(columns['cell'], dtype=np.intp),
+            species=np.array(columns['species'], dtype=np.int8),
+            age=np.array(columns['age'], dtype=int),
+            weight=np.array(columns['weight'], dtype=float),
+            fitness=np.array(columns['fitness'], dtype=float),
+            has_moved=np.array(columns['has_moved'], dtype=bool)
+        )
+        return state
+
+    def restore_state(self, state):
+        """
+        Replaces the fodder and all animals with a state created by 'state'.
+        The island must have the same map and backend as the saved island.
+
+        Parameters
+        ----------
+        state: dict
+            Dictionary with the arrays described in 'state'.
+        """
+        cells = [cell for row in self.island_map for cell in row]
+        fodder = np.asarray(state['fodder'], dtype=float)
+        if fodder.shape != self.landscape_codes.shape:
+            raise ValueError('The state does not match the island map')
+        for cell, value in zip(cells, fodder.ravel().tolist()):
+            cell.fodder = value
+
+        if self.population is not None:
+            self.population.restore(state['cell'], state['species'],
+                                    state['age'], state['weight'],
+                                    state['fitness'], state['has_moved'])
+            return
+
+        for cell in cells:
+            cell.herbivores = []
+            cell.carnivores = []
+            cell.reset_herbivore_biomass()
+        species_classes = Population.species_classes
+        constants = [self.parameter_sets[species.__name__]
+                     for species in species_classes]
+        for index, code, age, weight, fitness, has_moved in zip(
+                state['cell'].tolist(), state['species'].tolist(),
+                state['age'].tolist(), state['weight'].tolist(),
+                state['fitness'].tolist(), state['has_moved'].tolist()):
+            animal = species_classes[code](age=age, weight=weight,
+                                           constants=constants[code])
+            animal.fitness = fitness
+            animal.has_moved = has_moved
+            if code == Population.HERBIVORE:
+                cells[index].herbivores.append(animal)
+            else:
+                cells[index].carnivores.append(animal)
+        counts = np.bincount(state['species'],
+                             minlength=len(species_classes))
+        self.species_counts.update(Herbivore=int(counts[0]),
+                                   Carnivore=int(counts[1]))
+
+    def island_update_fitness(self):
+        """
+        Recalculates the fitness of all animals on the island, one species at
+        a time with 'Animals.batch_fitness'. The animals are gathered
+        straight from the species lists of the cells.
+        """
+        if self.population is not None:
+            self.population.update_fitness()
+            return
+
+        cells = [cell for row in self.island_map for cell in row]
+        Herbivore.update_fitness_of(
+            [animal for cell in cells for animal in cell.herbivores],
+            self.parameter_sets['Herbivore']
+        )
+        Carnivore.update_fitness_of(
+            [animal for cell in cells for animal in cell.carnivores],
+            self.parameter_sets['Carnivore']
+        )
+
+    def cell_phase(self, phase):
+        """
+        Performs a phase of the annual cycle in every cell. The cells update
+        the number of animals per species in 'species_counts' themselves.
+
+        Parameters
+        ----------
+        phase: str
+            Name of the Cell method, e.g. 'deaths'.
+        """
+        for y in self.island_map:
+            for cell in y:
+                getattr(cell, phase)()
+
     def island_fodder_growth(self):
         """
         Yearly cycle for fodder growth. Fodder grows for all cells on the
@@ -215,24 +606,38 @@ class Island:
         """
         Yearly cycle for feeding. All animals on the island attempts to feed.
         """
-        for y in self.island_map:
-            for cell in y:
-                cell.feeding()
+        if self.population is not None:
+            self.population.feeding()
+            return
+
+        self.cell_phase('feeding')
 
     def island_procreate(self):
         """
         Yearly cycle for procreation. All animals on the island attempts to
         procreate.
         """
-        for y in self.island_map:
-            for cell in y:
-                cell.procreate()
+        if self.population is not None:
+            self.population.procreate()
+            return
+
+        self.cell_phase('procreate')
 
     def island_migration(self):
         """
         Yearly cycle for migration. All animals on the island cell attempts to
         migrate. Resets the 'has_moved' status of the animals afterwards.
+
+        With migration mode 'island', the moves of all animals are decided
+        and applied at once instead, see 'Population.island_migration'.
         """
+        if self.population is not None:
+            if self.migration == 'island':
+                self.population.island_migration()
+            else:
+                self.population.migration()
+            return
+
         for y in self.island_map:
             for cell in y:
                 cell.migration()
@@ -245,7 +650,16 @@ class Island:
     def island_aging(self):
         """
         Yearly cycle for aging. All animals on the island turn one year older.
+
+        The array backend updates the fitness of all animals at once. With
+        animal objects, each animal updates its own fitness, which is faster
+        than gathering the ages and weights for a batch update and writing
+        the fitness back.
         """
+        if self.population is not None:
+            self.population.aging()
+            return
+
         for y in self.island_map:
             for cell in y:
                 cell.aging()
@@ -255,6 +669,10 @@ class Island:
         Yearly cycle for loss of weight. All animals on the island loses
         weight.
         """
+        if self.population is not None:
+            self.population.loss_of_weight()
+            return
+
         for y in self.island_map:
             for cell in y:
                 cell.loss_of_weight()
@@ -264,13 +682,35 @@ class Island:
         Yearly cycle for death. Checks for all animals on the island if the
         die.
         """
-        for y in self.island_map:
-            for cell in y:
-                cell.deaths()
+        if self.population is not None:
+            self.population.deaths()
+            return
 
-    def island_cycle(self):
+        self.cell_phase('deaths')
+
+    def island_cycle(self, year=None):
         """
         Performs operations related to the annual cycle for one cell.
+
+        If a 'PhaseProfiler' is attached as 'profiler', the profiler performs
+        the cycle and records each phase. Changes of the default parameters
+        are taken up first, see 'update_parameters'.
+
+        Parameters
+        ----------
+        year: int
+            The year the cycle simulates, only used for the records of the
+            profiler.
+        """
+        self.update_parameters()
+        if self.profiler is not None:
+            self.profiler.run_cycle(self, year)
+        else:
+            self._cycle()
+
+    def _cycle(self):
+        """
+        Performs the phases of the annual cycle one after another.
         """
         self.island_fodder_growth()
         self.island_feeding()
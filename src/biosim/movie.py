@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""
+Movie Module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import subprocess
+import tempfile
+import weakref
+
+
+class MovieWriter:
+    """
+    Writes the frames of a matplotlib figure to a movie through a running
+    ffmpeg process.
+
+    Every frame is drawn on the figure canvas, and its raw RGBA pixel buffer
+    is written straight to the standard input of ffmpeg, so no image files
+    are written or read. The figure must keep the same size in pixels
+    while the movie is written.
+
+    The writer can be used as a context manager, which finishes the movie
+    when the block is left. If the writer is never closed, ffmpeg is
+    stopped when the writer is garbage collected or the interpreter exits,
+    so no ffmpeg process is left running.
+    """
+
+    def __init__(self, filename, fps=10, ffmpeg_binary='ffmpeg'):
+        """
+        Class constructor for MovieWriter.
+
+        Parameters
+        ----------
+        filename: str
+            Name of the movie file, e.g. 'sim.mp4'.
+        fps: int
+            Frames per second.
+        ffmpeg_binary: str
+            Path of the ffmpeg binary.
+        """
+        self.filename = filename
+        self.fps = fps
+        self.ffmpeg_binary = ffmpeg_binary
+        self.size = None
+        self.frames = 0
+        self._process = None
+        self._log = None
+        self._finalizer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(check=exc_type is None)
+
+    def _start(self, width, height):
+        """
+        Starts ffmpeg for frames of the given size.
+        """
+        self.size = (width, height)
+        self._log = tempfile.TemporaryFile()
+        command = [
+            self.ffmpeg_binary, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgba',
+            '-s', '{}x{}'.format(width, height), '-r', str(self.fps),
+            '-i', '-',
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+            '-profile:v', 'baseline', '-pix_fmt', 'yuv420p',
+            self.filename
+        ]
+        try:
+            self._process = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                stderr=self._log
+            )
+        except OSError as err:
+            raise RuntimeError('ERROR: ffmpeg failed with: {}'.format(err))
+        self._finalizer = weakref.finalize(self, _stop_ffmpeg, self._process,
+                                           self._log)
+
+    def write_frame(self, figure, draw=True):
+        """
+        Draws a figure and writes it as the next frame.
+
+        Parameters
+        ----------
+        figure: matplotlib.figure.Figure
+            The figure to write.
+        draw: bool
+            If False, the canvas is written as it is, e.g. when it has just
+            been updated by blitting.
+        """
+        if draw:
+            figure.canvas.draw()
+        buffer = figure.canvas.buffer_rgba()
+        height, width = buffer.shape[:2]
+        if self._process is None:
+            self._start(width, height)
+        elif (width, height) != self.size:
+            raise RuntimeError(
+                'The figure size changed while writing a movie'
+            )
+        try:
+            self._process.stdin.write(memoryview(buffer))
+        except BrokenPipeError:
+            self.close()
+            raise RuntimeError('ERROR: ffmpeg stopped reading frames')
+        self.frames += 1
+
+    def close(self, check=True):
+        """
+        Finishes the movie and waits for ffmpeg to exit.
+
+        Parameters
+        ----------
+        check: bool
+            If True, a RuntimeError is raised if ffmpeg failed. Use False
+            when the movie is closed because of another error.
+        """
+        if self._process is None:
+            return
+        self._finalizer.detach()
+        process, self._process = self._process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if process.wait() != 0 and check:
+            self._log.seek(0)
+            message = self._log.read().decode(errors='replace').strip()
+            self._log.close()
+            raise RuntimeError('ERROR: ffmpeg failed with: {}'.format(message))
+        self._log.close()
+
+
+def _stop_ffmpeg(process, log):
+    """
+    Finishes the movie of a writer that was not closed, see 'MovieWriter'.
+    """
+    try:
+        process.stdin.close()
+    except OSError:
+        pass
+    process.wait()
+    log.close()
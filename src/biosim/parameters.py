@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parameters Module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import functools
+import math
+
+
+class ParameterSet:
+    """
+    Immutable set of the parameters of one animal species or landscape type.
+
+    The parameters are available as attributes, e.g. 'constants.F', and by
+    name, e.g. constants['lambda']. Constants derived from the parameters
+    are calculated once when the set is created:
+
+    exp_lambda
+        exp(lambda), used for the propensity to move.
+    pregnancy_threshold
+        zeta * (w_birth + sigma_birth), the weight an animal must exceed to
+        give birth.
+    """
+
+    def __init__(self, parameters):
+        """
+        Class constructor for ParameterSet.
+
+        Parameters
+        ----------
+        parameters: dict
+            Dictionary with the parameters.
+        """
+        values = dict(parameters)
+        if 'lambda' in values:
+            values['exp_lambda'] = math.exp(values['lambda'])
+        if all(name in values for name in ('zeta', 'w_birth', 'sigma_birth')):
+            values['pregnancy_threshold'] = values['zeta'] * (
+                    values['w_birth'] + values['sigma_birth']
+            )
+        object.__setattr__(self, '_values', values)
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __getitem__(self, name):
+        return self._values[name]
+
+    def __contains__(self, name):
+        return name in self._values
+
+    def __eq__(self, other):
+        return isinstance(other, ParameterSet) and \
+            self._values == other._values
+
+    def __hash__(self):
+        return hash(tuple(sorted(self._values.items(), key=str)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ParameterSet is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('ParameterSet is immutable')
+
+    def __repr__(self):
+        return 'ParameterSet({})'.format(self._values)
+
+
+class ParameterDict(dict):
+    """
+    Dictionary for the default parameters of an animal or landscape class.
+
+    The dictionary can be changed like any dictionary. Every change replaces
+    the 'constants' of the class with a new 'ParameterSet', so the derived
+    constants always match the parameters. The dictionary is also available
+    as 'default_parameters' of the class.
+    """
+
+    def __init__(self, owner, parameters):
+        """
+        Class constructor for ParameterDict.
+
+        Parameters
+        ----------
+        owner: type
+            The class the parameters belong to.
+        parameters: dict
+            The default parameters.
+        """
+        super(ParameterDict, self).__init__(parameters)
+        self.owner = owner
+        self.constants = None
+        owner.default_parameters = self
+        self._changed()
+
+    def _changed(self):
+        """
+        Creates a new parameter set for the owner.
+        """
+        self.constants = ParameterSet(self)
+        self.owner.constants = self.constants
+
+    def __setitem__(self, name, value):
+        super(ParameterDict, self).__setitem__(name, value)
+        self._changed()
+
+    def __delitem__(self, name):
+        super(ParameterDict, self).__delitem__(name)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        super(ParameterDict, self).update(*args, **kwargs)
+        self._changed()
+
+    def clear(self):
+        super(ParameterDict, self).clear()
+        self._changed()
+
+    def pop(self, *args):
+        value = super(ParameterDict, self).pop(*args)
+        self._changed()
+        return value
+
+    def popitem(self):
+        item = super(ParameterDict, self).popitem()
+        self._changed()
+        return item
+
+    def setdefault(self, name, default=None):
+        value = super(ParameterDict, self).setdefault(name, default)
+        self._changed()
+        return value
+
+
+class SimulationParameters:
+    """
+    The parameters of one simulation.
+
+    A simulation uses the default parameters of the animal and landscape
+    classes, together with overrides that only apply to this simulation.
+    The island of the simulation stores the resulting parameter sets on its
+    cells and animals, see 'Island.update_parameters', so the classes are
+    never changed and several simulations can run in the same process.
+    """
+
+    def __init__(self, classes):
+        """
+        Class constructor for SimulationParameters.
+
+        Parameters
+        ----------
+        classes: dict
+            Dictionary mapping a species name or landscape code to the class
+            the parameters belong to, e.g. {'J': Jungle}.
+        """
+        self.classes = dict(classes)
+        self.overrides = {key: {} for key in self.classes}
+        self._sets = {}
+
+    def set(self, key, params):
+        """
+        Sets parameters that only apply to this simulation.
+
+        Parameters
+        ----------
+        key: str
+            Species name or landscape code.
+        params: dict
+            Dictionary with the parameters to set.
+        """
+        if key not in self.classes:
+            raise ValueError('Unknown species or landscape: {}'.format(key))
+        for parameter in params:
+            self.overrides[key][parameter] = params[parameter]
+        self._sets.pop(key, None)
+
+    def values(self):
+        """
+        Returns the parameters used by this simulation, i.e. the defaults
+        together with the overrides, as one dictionary per species or
+        landscape type.
+        """
+        values = {}
+        for key, cls in self.classes.items():
+            values[key] = dict(cls.default_parameters)
+            values[key].update(self.overrides[key])
+        return values
+
+    def parameter_set(self, key):
+        """
+        Returns the parameter set for a species or landscape type. The set is
+        only created again after the defaults or the overrides change.
+        """
+        default_parameters = self.classes[key].default_parameters
+        defaults = default_parameters.constants
+        cached = self._sets.get(key)
+        if cached is not None and cached[0] is defaults:
+            return cached[1]
+
+        if self.overrides[key]:
+            parameters = dict(default_parameters)
+            parameters.update(self.overrides[key])
+            constants = ParameterSet(parameters)
+        else:
+            constants = defaults
+        self._sets[key] = (defaults, constants)
+        return constants
+
+
+class hybridmethod:
+    """
+    Decorator for methods that can be called both on a class and on an
+    instance. The method receives the instance as first argument, or None
+    when it is called on the class.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        functools.update_wrapper(self, function)
+
+    def __get__(self, instance, owner):
+        function = self.function
+
+        @functools.wraps(function)
+        def method(*args, **kwargs):
+            return function(instance, *args, **kwargs)
+        return method
@@ -0,0 +1,747 @@
+# -*- coding: utf-8 -*-
+
+"""
+Population Module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import numpy as np
+import math
+
+from .animals import Herbivore, Carnivore
+
+
+def _column(name):
+    """
+    Creates the property for one array of 'Population', a view of the first
+    'len(population)' elements of its buffer.
+    """
+    def get(self):
+        return self._buffers[name][:self._size]
+
+    def set(self, values):
+        self._buffers[name][:self._size] = values
+
+    return property(get, set,
+                    doc="Array with the '{}' of every animal.".format(name))
+
+
+def build_neighbour_table(passable):
+    """
+    Creates the neighbour index table of a map, used for migration.
+
+    Parameters
+    ----------
+    passable: numpy.ndarray
+        Boolean array with the shape of the map, True for the cells that can
+        be traversed.
+
+    Returns
+    -------
+    table: numpy.ndarray
+        Integer array with one row per cell (numbered row by row) holding the
+        indices of the nearby cells that can be traversed, in the order
+        above, left, below and right, padded with -1.
+    """
+    rows, columns = passable.shape
+    index = np.arange(rows * columns).reshape(rows, columns)
+    y, x = np.indices((rows, columns))
+    nearby = []
+    valid = []
+    for dy, dx in ((-1, 0), (0, -1), (1, 0), (0, 1)):
+        inside = (0 <= y + dy) & (y + dy < rows) & \
+                 (0 <= x + dx) & (x + dx < columns)
+        nearby_y = np.clip(y + dy, 0, rows - 1)
+        nearby_x = np.clip(x + dx, 0, columns - 1)
+        nearby.append(index[nearby_y, nearby_x].ravel())
+        valid.append((inside & passable[nearby_y, nearby_x]).ravel())
+    nearby = np.stack(nearby, axis=1)
+    valid = np.stack(valid, axis=1)
+    table = np.where(valid, nearby, -1).astype(np.intp)
+    order = np.argsort(~valid, axis=1, kind='stable')
+    return np.take_along_axis(table, order, axis=1)
+
+
+class Population:
+    """
+    Structure-of-arrays storage for all animals on an island.
+
+    Instead of one Python object per animal, the age, weight, fitness,
+    species, cell index and 'has_moved' status of every animal are stored in
+    contiguous NumPy arrays. Element i of each array describes animal i.
+    Each phase of the annual cycle is performed on the arrays as a whole.
+    Migration uses the neighbour index table 'neighbours' of the island,
+    see 'build_neighbour_table'. The parameters are read from the
+    'parameter_sets' shared with the island, see 'species_constants'.
+    The random numbers drawn by the phases are counted in 'random_numbers'.
+
+    The arrays are views of larger buffers. When animals are added and the
+    buffers are full, they are replaced by buffers with twice the room, so
+    adding animals one at a time is cheap on average. The number of animals
+    of each species in each cell is kept up to date as well, and the
+    animals of a cell are found through an ordering by cell that is only
+    sorted again after animals were added, removed or moved.
+    """
+
+    HERBIVORE = 0
+    CARNIVORE = 1
+    species_classes = (Herbivore, Carnivore)
+    columns = (('age', int), ('weight', float), ('fitness', float),
+               ('species', np.int8), ('cell', np.intp), ('has_moved', bool))
+
+    age = _column('age')
+    weight = _column('weight')
+    fitness = _column('fitness')
+    species = _column('species')
+    cell = _column('cell')
+    has_moved = _column('has_moved')
+
+    def __init__(self, island_map, parameter_sets=None, neighbours=None):
+        """
+        Class constructor for Population.
+
+        Parameters
+        ----------
+        island_map: list
+            Nested list of constructed cells, as created by
+            'Island.map_constructor'.
+        parameter_sets: dict
+            Dictionary mapping each species name to the parameter set of the
+            simulation, kept up to date by the island. If None, the
+            'constants' of the animal classes are used.
+        neighbours: numpy.ndarray
+            Neighbour index table of the island, see
+            'build_neighbour_table'. If None, it is built from the cells.
+        """
+        self.parameter_sets = parameter_sets
+        self.shape = (len(island_map), len(island_map[0]))
+        self.cells = [cell for row in island_map for cell in row]
+        self.n_cells = len(self.cells)
+        if neighbours is None:
+            neighbours = build_neighbour_table(np.array(
+                [[cell.passable for cell in row] for row in island_map]
+            ))
+        self.neighbours = neighbours
+        self.random_numbers = 0
+
+        self._size = 0
+        self._buffers = {name: np.zeros(16, dtype=dtype)
+                         for name, dtype in self.columns}
+        self.species_counts = np.zeros(len(self.species_classes), dtype=int)
+        self._cell_counts = np.zeros(
+            (len(self.species_classes), self.n_cells), dtype=int
+        )
+        self._order = None
+        self._offsets = None
+
+        for index, cell in enumerate(self.cells):
+            cell.index = index
+            cell.population_arrays = self
+
+    def __len__(self):
+        """
+        Returns the total number of animals.
+        """
+        return self._size
+
+    def _reserve(self, number):
+        """
+        Makes room in the buffers for 'number' more animals, doubling their
+        size as often as needed.
+        """
+        capacity = len(self._buffers['age'])
+        if self._size + number <= capacity:
+            return
+        while capacity < self._size + number:
+            capacity *= 2
+        for name, buffer in self._buffers.items():
+            new_buffer = np.zeros(capacity, dtype=buffer.dtype)
+            new_buffer[:self._size] = buffer[:self._size]
+            self._buffers[name] = new_buffer
+
+    def _cell_table(self, species, cell):
+        """
+        Counts the animals with the given species codes and cell indices,
+        returning an array with one row per species and one column per cell.
+        """
+        return np.bincount(
+            species.astype(np.intp) * self.n_cells + cell,
+            minlength=len(self.species_classes) * self.n_cells
+        ).reshape(len(self.species_classes), self.n_cells)
+
+    def _moved(self):
+        """
+        Counts the animals in each cell again after the 'cell' array was
+        changed, e.g. by a migration.
+        """
+        self._cell_counts = self._cell_table(self.species, self.cell)
+        self._order = None
+
+    def _members(self, index):
+        """
+        Returns the indices of the animals in a cell, in ascending order.
+        """
+        if self._order is None:
+            self._order = np.argsort(self.cell, kind='stable')
+            self._offsets = np.concatenate(
+                ([0], np.cumsum(self._cell_counts.sum(axis=0)))
+            )
+        return self._order[self._offsets[index]:self._offsets[index + 1]]
+
+    @classmethod
+    def species_index(cls, animal):
+        """
+        Returns the species code used in the 'species' array for an animal
+        object or an animal class.
+        """
+        if isinstance(animal, Carnivore) or animal is Carnivore:
+            return cls.CARNIVORE
+        return cls.HERBIVORE
+
+    def species_constants(self, code):
+        """
+        Returns the parameter set of the species with the given code.
+        """
+        species = self.species_classes[code]
+        if self.parameter_sets is None:
+            return species.constants
+        return self.parameter_sets[species.__name__]
+
+    def parameter(self, name):
+        """
+        Looks up a parameter, or a derived constant such as 'exp_lambda',
+        for both species with 'species_constants'.
+
+        Parameters
+        ----------
+        name: str
+            Name of the parameter, e.g. 'eta'.
+
+        Returns
+        -------
+        array
+            Array with the herbivore value at index 0 and the carnivore value
+            at index 1. Index it with the 'species' array to get one value per
+            animal.
+        """
+        return np.array(
+            [self.species_constants(code)[name]
+             for code in range(len(self.species_classes))],
+            dtype=float
+        )
+
+    def calculate_fitness(self, age, weight, species):
+        """
+        Calculates the fitness for arrays of animals.
+
+        Parameters
+        ----------
+        age: array
+            Ages of the animals.
+        weight: array
+            Weights of the animals.
+        species: array
+            Species codes of the animals.
+
+        Returns
+        -------
+        array
+            Fitness of the animals. Animals with weight <= 0 have fitness 0.
+        """
+        fitness = np.zeros(len(age))
+        for code, species_class in enumerate(self.species_classes):
+            members = species == code
+            fitness[members] = species_class.batch_fitness(
+                age[members], weight[members], self.species_constants(code)
+            )
+        return fitness
+
+    def update_fitness(self, indices=None):
+        """
+        Updates the fitness of all animals, or of the animals at the given
+        indices.
+        """
+        if indices is None:
+            self.fitness = self.calculate_fitness(
+                self.age, self.weight, self.species
+            )
+        else:
+            self.fitness[indices] = self.calculate_fitness(
+                self.age[indices], self.weight[indices], self.species[indices]
+            )
+
+    def add(self, cell, species, age, weight):
+        """
+        Adds animals to the population.
+
+        Parameters
+        ----------
+        cell: array
+            Cell index of each new animal.
+        species: array
+            Species code of each new animal.
+        age: array
+            Age of each new animal.
+        weight: array
+            Weight of each new animal.
+        """
+        cell = np.asarray(cell, dtype=np.intp)
+        species = np.asarray(species, dtype=np.int8)
+        age = np.asarray(age, dtype=int)
+        weight = np.asarray(weight, dtype=float)
+
+        fitness = self.calculate_fitness(age, weight, species)
+        self._reserve(len(cell))
+        start, self._size = self._size, self._size + len(cell)
+        for name, values in (('age', age), ('weight', weight),
+                             ('fitness', fitness), ('species', species),
+                             ('cell', cell), ('has_moved', False)):
+            self._buffers[name][start:self._size] = values
+        self.species_counts += np.bincount(
+            species, minlength=len(self.species_classes)
+        )
+        self._cell_counts += self._cell_table(species, cell)
+        self._order = None
+
+    def add_animals(self, index, animals):
+        """
+        Adds animal objects to the cell with the given index.
+
+        Parameters
+        ----------
+        index: int
+            Cell index.
+        animals: list
+            List of Herbivore and Carnivore objects.
+        """
+        self.add(
+            [index] * len(animals),
+            [self.species_index(animal) for animal in animals],
+            [animal.age for animal in animals],
+            [animal.weight for animal in animals]
+        )
+
+    def keep(self, mask):
+        """
+        Keeps only the animals where 'mask' is True. The number of removed
+        animals of each species is subtracted from 'species_counts' and the
+        counts of their cells.
+        """
+        removed = ~mask
+        self.species_counts -= np.bincount(
+            self.species[removed], minlength=len(self.species_classes)
+        )
+        self._cell_counts -= self._cell_table(self.species[removed],
+                                              self.cell[removed])
+        size = int(np.count_nonzero(mask))
+        for name, buffer in self._buffers.items():
+            buffer[:size] = buffer[:self._size][mask]
+        self._size = size
+        self._order = None
+
+    def restore(self, cell, species, age, weight, fitness, has_moved):
+        """
+        Replaces all animals with the given arrays, e.g. from a checkpoint.
+        The fitness is not calculated again, so the restored population is
+        identical to the saved one.
+        """
+        self._size = 0
+        self._reserve(len(cell))
+        self._size = len(cell)
+        self.cell = cell
+        self.species = species
+        self.age = age
+        self.weight = weight
+        self.fitness = fitness
+        self.has_moved = has_moved
+        self.species_counts = np.bincount(
+            self.species, minlength=len(self.species_classes)
+        )
+        self._moved()
+
+    def animals_in_cell(self, index):
+        """
+        Creates animal objects for the animals in a cell. The objects are
+        copies, changing them does not change the population.
+
+        Parameters
+        ----------
+        index: int
+            Cell index.
+
+        Returns
+        -------
+        list
+            List of Herbivore and Carnivore objects.
+        """
+        return self.as_animals(self._members(index))
+
+    def as_animals(self, members=None):
+        """
+        Creates animal objects for the animals at the given indices, or for
+        all animals.
+        """
+        if members is None:
+            members = np.arange(len(self))
+        constants = [self.species_constants(code)
+                     for code in range(len(self.species_classes))]
+        animals = []
+        for age, weight, fitness, species, has_moved in zip(
+                self.age[members].tolist(),
+                self.weight[members].tolist(),
+                self.fitness[members].tolist(),
+                self.species[members].tolist(),
+                self.has_moved[members].tolist()):
+            animal = self.species_classes[species](
+                age=age, weight=weight, constants=constants[species]
+            )
+            animal.fitness = fitness
+            animal.has_moved = has_moved
+            animals.append(animal)
+        return animals
+
+    def replace_cell(self, index, animals):
+        """
+        Replaces all animals in a cell with the given animal objects.
+        """
+        self.keep(self.cell != index)
+        self.add_animals(index, animals)
+
+    def count_in_cell(self, index, species):
+        """
+        Returns the number of animals of one species in a cell.
+        """
+        return int(self._cell_counts[species, index])
+
+    def biomass_in_cell(self, index):
+        """
+        Returns the total weight of the herbivores in a cell.
+        """
+        members = self._members(index)
+        return float(self.weight[members][
+            self.species[members] == self.HERBIVORE
+        ].sum())
+
+    def count(self, species):
+        """
+        Returns the number of animals of one species. The numbers are kept up
+        to date by 'add' and 'keep', so no arrays are scanned.
+        """
+        return int(self.species_counts[species])
+
+    def cell_counts(self, species):
+        """
+        Returns an array with the number of animals of one species in each
+        cell.
+        """
+        return self._cell_counts[species].copy()
+
+    def herbivore_biomass(self):
+        """
+        Returns an array with the total herbivore weight in each cell.
+        """
+        herbivores = self.species == self.HERBIVORE
+        return np.bincount(
+            self.cell[herbivores],
+            weights=self.weight[herbivores],
+            minlength=self.n_cells
+        )
+
+    def _sorted_by_cell_and_fitness(self, species):
+        """
+        Returns the indices of all animals of one species, sorted by cell and
+        then by descending fitness within each cell.
+        """
+        members = np.flatnonzero(self.species == species)
+        order = np.lexsort((-self.fitness[members], self.cell[members]))
+        return members[order]
+
+    def feeding(self):
+        """
+        All animals on the island attempt to feed.
+
+        Herbivores eat in order of descending fitness within each cell, each
+        trying to eat 'F' fodder. Carnivores then hunt the surviving
+        herbivores in their cell, also in order of descending fitness.
+        """
+        fodder = np.array([cell.fodder for cell in self.cells], dtype=float)
+
+        herbivores = self._sorted_by_cell_and_fitness(self.HERBIVORE)
+        herbivore_cells = self.cell[herbivores]
+        rank = np.arange(len(herbivores)) - np.searchsorted(
+            herbivore_cells, herbivore_cells
+        )
+        constants = self.species_constants(self.HERBIVORE)
+        appetite = constants.F
+        eaten = np.clip(
+            fodder[herbivore_cells] - rank * appetite, 0, appetite
+        )
+        self.weight[herbivores] += eaten * constants.beta
+        self.update_fitness(herbivores)
+        fodder -= np.bincount(
+            herbivore_cells, weights=eaten, minlength=self.n_cells
+        )
+
+        for cell, remaining_fodder in zip(self.cells, fodder.tolist()):
+            cell.fodder = remaining_fodder
+
+        self._carnivore_feeding(herbivores, herbivore_cells)
+
+    def _carnivore_feeding(self, herbivores, herbivore_cells):
+        """
+        Carnivores attempt to kill herbivores in their cell. Killed
+        herbivores are removed from the population.
+
+        Parameters
+        ----------
+        herbivores: array
+            Herbivore indices sorted by cell and descending fitness.
+        herbivore_cells: array
+            Cell index of each herbivore in 'herbivores'.
+        """
+        carnivores = self._sorted_by_cell_and_fitness(self.CARNIVORE)
+        if len(carnivores) == 0 or len(herbivores) == 0:
+            return
+
+        constants = self.species_constants(self.CARNIVORE)
+        alive = np.ones(len(self), dtype=bool)
+        carnivore_cells = self.cell[carnivores]
+
+        for index in np.unique(carnivore_cells):
+            start, stop = np.searchsorted(herbivore_cells, [index, index + 1])
+            if start == stop:
+                continue
+            prey = herbivores[start:stop]
+            prey_fitness = self.fitness[prey]
+            first_hunter, last_hunter = np.searchsorted(
+                carnivore_cells, [index, index + 1]
+            )
+
+            for hunter in carnivores[first_hunter:last_hunter].tolist():
+                age = self.age[hunter]
+                weight = self.weight[hunter]
+                fitness = self.fitness[hunter]
+                eaten = 0
+                # The prey is killed if the draw is below
+                # (fitness - prey fitness) / DeltaPhiMax. Killed prey have
+                # infinite fitness so they are never chosen again.
+                threshold = np.random.random(len(prey)) * \
+                    constants.DeltaPhiMax + prey_fitness
+                self.random_numbers += len(prey)
+                first = 0
+                while eaten < constants.F and first < len(prey):
+                    hits = threshold[first:] < fitness
+                    k = hits.argmax()
+                    if not hits[k]:
+                        break
+                    k += first
+                    weight += constants.beta * self.weight[prey[k]]
+                    eaten += self.weight[prey[k]]
+                    fitness = self._carnivore_fitness(constants, age,
+                                                      weight)
+                    prey_fitness[k] = np.inf
+                    alive[prey[k]] = False
+                    first = k + 1
+                self.weight[hunter] = weight
+                self.fitness[hunter] = fitness
+
+        self.keep(alive)
+
+    @staticmethod
+    def _carnivore_fitness(constants, age, weight):
+        """
+        Calculates the fitness of a single carnivore with the given
+        parameters.
+        """
+        if weight <= 0:
+            return 0
+        return (1 / (1 + math.exp(
+            constants.phi_age * (age - constants.a_half)))) * \
+               (1 / (1 + math.exp(
+                   -(constants.phi_weight * (weight - constants.w_half)))))
+
+    def procreate(self):
+        """
+        All animals on the island attempt to give birth. The number of same
+        species animals in each cell is counted before any animal is born.
+        """
+        if len(self) == 0:
+            return
+        group = self.cell * 2 + self.species
+        same_species = np.bincount(group, minlength=2 * self.n_cells)[group]
+
+        threshold = self.parameter('pregnancy_threshold')
+        probability = np.minimum(
+            1,
+            self.parameter('gamma')[self.species] * self.fitness * (
+                    same_species - 1)
+        )
+        births = np.flatnonzero(
+            (self.weight >= threshold[self.species]) &
+            (np.random.random(len(self)) < probability)
+        )
+        self.random_numbers += len(self) + len(births)
+        if len(births) == 0:
+            return
+
+        species = self.species[births]
+        newborn_weight = np.random.normal(
+            self.parameter('w_birth')[species],
+            self.parameter('sigma_birth')[species]
+        )
+        self.weight[births] -= self.parameter('xi')[species] * newborn_weight
+        self.add(
+            self.cell[births],
+            species,
+            np.zeros(len(births), dtype=int),
+            newborn_weight
+        )
+
+    def island_migration(self):
+        """
+        All animals on the island attempt to migrate at the same time.
+
+        The relative fodder of every cell is evaluated once from the state at
+        the start of the migration. Then it is decided for all animals at once
+        whether they move and where, using the neighbour index table, and all
+        moves are applied together. Since no animal is visited twice, no
+        'has_moved' marks are needed.
+        """
+        if len(self) == 0:
+            return
+
+        neighbours = self.neighbours
+        counts = np.vstack((self.cell_counts(self.HERBIVORE),
+                            self.cell_counts(self.CARNIVORE)))
+        fodder = np.array([cell.fodder for cell in self.cells], dtype=float)
+        available = np.vstack((fodder, self.herbivore_biomass()))
+        relative_fodder = available / (
+                (counts + 1) * self.parameter('F')[:, np.newaxis]
+        )
+
+        valid = neighbours >= 0
+        nearby = np.where(valid, neighbours, 0)
+        propensity = np.where(
+            valid,
+            self.parameter('exp_lambda')[:, np.newaxis, np.newaxis] *
+            relative_fodder[:, nearby],
+            0
+        )
+        cumulative = np.cumsum(propensity, axis=2)
+
+        total = cumulative[self.species, self.cell, -1]
+        movers = np.flatnonzero(
+            (np.random.random(len(self)) <
+             self.parameter('mu')[self.species] * self.fitness) &
+            (total > 0)
+        )
+        draws = np.random.random(len(movers)) * total[movers]
+        self.random_numbers += len(self) + len(movers)
+        choice = np.count_nonzero(
+            cumulative[self.species[movers], self.cell[movers]] <=
+            draws[:, np.newaxis],
+            axis=1
+        )
+        self.cell[movers] = nearby[self.cell[movers], choice]
+        self._moved()
+
+    def migration(self):
+        """
+        All animals on the island attempt to migrate, cell by cell.
+
+        The relative fodder of the nearby cells is evaluated when a cell is
+        processed, so animals that moved earlier in the year are taken into
+        account. Animals that have moved are marked with 'has_moved' so they
+        do not move again, and the marks are reset afterwards.
+        """
+        if len(self) == 0:
+            return
+
+        neighbours = self.neighbours
+        counts = np.vstack((self.cell_counts(self.HERBIVORE),
+                            self.cell_counts(self.CARNIVORE))).astype(float)
+        biomass = self.herbivore_biomass()
+        fodder = np.array([cell.fodder for cell in self.cells], dtype=float)
+        appetite = self.parameter('F')
+        mu = self.parameter('mu')
+        exp_lambda = self.parameter('exp_lambda')
+
+        order = np.argsort(self.cell, kind='stable')
+        sorted_cells = self.cell[order]
+        boundaries = np.flatnonzero(np.diff(sorted_cells)) + 1
+        for members in np.split(order, boundaries):
+            members = members[~self.has_moved[members]]
+            if len(members) == 0:
+                continue
+            index = self.cell[members[0]]
+            nearby = neighbours[index]
+            valid = nearby >= 0
+            nearby = np.where(valid, nearby, 0)
+
+            for species, available in ((self.HERBIVORE, fodder),
+                                       (self.CARNIVORE, biomass)):
+                movers = members[self.species[members] == species]
+                if len(movers) == 0:
+                    continue
+                self.random_numbers += len(movers)
+                movers = movers[np.random.random(len(movers)) <
+                                mu[species] * self.fitness[movers]]
+                propensity = np.where(
+                    valid,
+                    exp_lambda[species] * available[nearby] / (
+                            (counts[species, nearby] + 1) * appetite[species]
+                    ),
+                    0
+                )
+                total = propensity.sum()
+                if len(movers) == 0 or total == 0:
+                    continue
+
+                cumulative = np.cumsum(propensity / total)
+                self.random_numbers += len(movers)
+                choice = np.searchsorted(
+                    cumulative, np.random.random(len(movers)) * cumulative[-1],
+                    side='right'
+                )
+                destination = nearby[np.minimum(choice, 3)]
+
+                self.cell[movers] = destination
+                self.has_moved[movers] = True
+                np.add.at(counts[species], destination, 1)
+                counts[species, index] -= len(movers)
+                if species == self.HERBIVORE:
+                    np.add.at(biomass, destination, self.weight[movers])
+                    biomass[index] -= self.weight[movers].sum()
+
+        self.has_moved[:] = False
+        self._moved()
+
+    def aging(self):
+        """
+        All animals turn one year older.
+        """
+        self.age += 1
+        self.update_fitness()
+
+    def loss_of_weight(self):
+        """
+        All animals lose weight.
+        """
+        self.weight -= self.weight * self.parameter('eta')[self.species]
+        self.update_fitness()
+
+    def deaths(self):
+        """
+        Removes animals that die this year. Animals with fitness 0 always die,
+        the others die with probability omega * (1 - fitness).
+        """
+        if len(self) == 0:
+            return
+        probability = self.parameter('omega')[self.species] * (
+                1 - self.fitness)
+        dies = (self.fitness == 0) | (
+                np.random.random(len(self)) < probability)
+        self.random_numbers += len(self)
+        self.keep(~dies)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+Profiling Module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import time
+
+
+class PhaseProfiler:
+    """
+    Records the cost of each phase of the annual cycle.
+
+    For every simulated year and phase, the wall time, the number of animals
+    on the island when the phase starts and the number of random numbers
+    drawn during the phase are recorded. The random numbers are counted by
+    the cells or the 'Population' where they are drawn, see
+    'Island.random_numbers'. The profiler is only used when it is attached
+    to an island, so an island without a profiler runs at full speed.
+    """
+
+    phases = ('fodder_growth', 'feeding', 'procreate', 'migration', 'aging',
+              'loss_of_weight', 'deaths')
+
+    def __init__(self):
+        """
+        Class constructor for PhaseProfiler.
+        """
+        self.records = []
+
+    def run_cycle(self, island, year=None):
+        """
+        Performs one annual cycle on the island, one phase at a time, and
+        records each phase.
+
+        Parameters
+        ----------
+        island: Island
+            The island to simulate.
+        year: int
+            The year recorded for the cycle. 'BioSim' passes the year the
+            cycle simulates.
+        """
+        for phase in self.phases:
+            animals = island.num_animals
+            random_numbers = island.random_numbers
+            start = time.perf_counter()
+            getattr(island, 'island_' + phase)()
+            self.records.append({
+                'year': year,
+                'phase': phase,
+                'time': time.perf_counter() - start,
+                'animals': animals,
+                'random_numbers': island.random_numbers - random_numbers
+            })
+
+    def totals(self):
+        """
+        Sums the records of all years for each phase.
+
+        Returns
+        -------
+        totals: dict
+            Dictionary mapping each phase to a dictionary with the total
+            'time', 'animals' and 'random_numbers'.
+        """
+        totals = {phase: {'time': 0.0, 'animals': 0, 'random_numbers': 0}
+                  for phase in self.phases}
+        for record in self.records:
+            for key in ('time', 'animals', 'random_numbers'):
+                totals[record['phase']][key] += record[key]
+        return totals
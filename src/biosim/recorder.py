@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+
+"""
+Recorder Module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import glob
+import numpy as np
+
+from .animals import Herbivore, Carnivore
+
+DEFAULT_AGE_BINS = np.arange(0, 65, 5)
+DEFAULT_WEIGHT_BINS = np.arange(0, 105, 5)
+
+
+class GrowableColumn:
+    """
+    Column of values with the same shape and type, stored in a preallocated
+    NumPy array. When the array is full, a new array with twice the capacity
+    is allocated, so appending is cheap on average.
+    """
+
+    def __init__(self, shape=(), dtype=float, capacity=64):
+        """
+        Class constructor for GrowableColumn.
+
+        Parameters
+        ----------
+        shape: tuple
+            Shape of each value, () for single numbers.
+        dtype: type
+            NumPy data type of the values.
+        capacity: int
+            Number of values to allocate room for at the start.
+        """
+        self.shape = tuple(shape)
+        self._data = np.zeros((capacity,) + self.shape, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        """
+        Returns the number of values in the column.
+        """
+        return self._size
+
+    def append(self, value):
+        """
+        Appends a value to the column.
+        """
+        if self._size == len(self._data):
+            data = np.zeros((2 * len(self._data),) + self.shape,
+                            dtype=self._data.dtype)
+            data[:self._size] = self._data
+            self._data = data
+        self._data[self._size] = value
+        self._size += 1
+
+    def clear(self):
+        """
+        Removes all values, but keeps the allocated array.
+        """
+        self._size = 0
+
+    @property
+    def data(self):
+        """
+        Array with the values of the column. The array is a view of the
+        column, and is only valid until the next change of the column.
+        """
+        return self._data[:self._size]
+
+
+class StatisticsRecorder:
+    """
+    Records statistics of a simulation once per year in columns.
+
+    The columns are:
+
+    year
+        The year the statistics were recorded.
+    herbivores, carnivores
+        Number of animals of each species.
+    herbivore_mean_fitness, herbivore_mean_age, herbivore_mean_weight, ...
+        Mean fitness, age and weight of each species, NaN if the species
+        has no animals.
+    herbivore_age_histogram, herbivore_weight_histogram, ...
+        Number of animals of each species in each age and weight bin.
+        Animals outside the bins are not counted.
+    cell_counts
+        Only if 'cell_counts' is True. Number of animals of each species in
+        each cell, with shape (rows, columns, 2).
+
+    Attach a recorder to a simulation with the 'recorder' argument of
+    'BioSim', or call 'record' directly. If 'stream_base' is given, the
+    recorded rows are written to a new compressed '.npz' file every
+    'stream_years' years and removed from memory, so the memory used does
+    not grow with the length of the simulation. Call 'flush' after the last
+    year to write the remaining rows. The files are read back with
+    'load_statistics'.
+    """
+
+    species = (Herbivore, Carnivore)
+
+    def __init__(self, age_bins=None, weight_bins=None, cell_counts=False,
+                 stream_base=None, stream_years=100):
+        """
+        Class constructor for StatisticsRecorder.
+
+        Parameters
+        ----------
+        age_bins: array_like
+            Edges of the age bins, by default every fifth year up to 60.
+        weight_bins: array_like
+            Edges of the weight bins, by default every fifth unit up to 100.
+        cell_counts: bool
+            If True, the number of animals in each cell is recorded as well.
+        stream_base: str
+            Beginning of the file names for streaming, including path, or
+            None to keep all rows in memory. Files are named
+            '{}_{:05d}.npz'.format(stream_base, chunk_no).
+        stream_years: int
+            Number of rows written to each file when streaming.
+        """
+        if stream_base is not None and stream_years < 1:
+            raise ValueError('stream_years must be at least 1')
+        self.age_bins = np.asarray(
+            DEFAULT_AGE_BINS if age_bins is None else age_bins, dtype=float
+        )
+        self.weight_bins = np.asarray(
+            DEFAULT_WEIGHT_BINS if weight_bins is None else weight_bins,
+            dtype=float
+        )
+        self.cell_counts = cell_counts
+        self.stream_base = stream_base
+        self.stream_years = stream_years
+        self.chunks_written = 0
+        self._columns = None
+
+    def _create_columns(self, map_shape):
+        """
+        Creates the columns. The shape of the map is only known when the
+        first year is recorded.
+        """
+        columns = {
+            'year': GrowableColumn(dtype=int),
+        }
+        for species in self.species:
+            name = species.__name__.lower()
+            columns[name + 's'] = GrowableColumn(dtype=int)
+            for attribute in ('fitness', 'age', 'weight'):
+                columns['{}_mean_{}'.format(name, attribute)] = \
+                    GrowableColumn()
+            columns[name + '_age_histogram'] = GrowableColumn(
+                (len(self.age_bins) - 1,), dtype=int
+            )
+            columns[name + '_weight_histogram'] = GrowableColumn(
+                (len(self.weight_bins) - 1,), dtype=int
+            )
+        if self.cell_counts:
+            columns['cell_counts'] = GrowableColumn(
+                tuple(map_shape) + (len(self.species),), dtype=int
+            )
+        return columns
+
+    def record(self, sim):
+        """
+        Records the statistics of the current year of a simulation.
+
+        Parameters
+        ----------
+        sim: BioSim
+            The simulation.
+        """
+        island = sim.simulated_island
+        if self._columns is None:
+            self._columns = self._create_columns(island.landscape_codes.shape)
+        columns = self._columns
+
+        counts = island.num_animals_per_species
+        columns['year'].append(sim.year)
+        for species in self.species:
+            name = species.__name__.lower()
+            columns[name + 's'].append(counts[species.__name__])
+            attributes = island.species_attributes(species)
+            for attribute in ('fitness', 'age', 'weight'):
+                values = attributes[attribute]
+                columns['{}_mean_{}'.format(name, attribute)].append(
+                    values.mean() if len(values) > 0 else np.nan
+                )
+            columns[name + '_age_histogram'].append(
+                np.histogram(attributes['age'], self.age_bins)[0]
+            )
+            columns[name + '_weight_histogram'].append(
+                np.histogram(attributes['weight'], self.weight_bins)[0]
+            )
+        if self.cell_counts:
+            counts = [island.animal_count_map(species)
+                      for species in self.species]
+            columns['cell_counts'].append(np.stack(counts, axis=-1))
+
+        if self.stream_base is not None and \
+                len(columns['year']) >= self.stream_years:
+            self.flush()
+
+    @property
+    def columns(self):
+        """
+        Dictionary with the recorded rows of each column that are still in
+        memory. The arrays are views, see 'GrowableColumn.data'.
+        """
+        if self._columns is None:
+            return {}
+        return {name: column.data for name, column in self._columns.items()}
+
+    def flush(self):
+        """
+        Writes the rows in memory to the next streaming file and removes
+        them from memory. Does nothing if there are no rows.
+        """
+        if self.stream_base is None:
+            raise ValueError('flush requires a stream_base')
+        if self._columns is None or len(self._columns['year']) == 0:
+            return
+        self.save_npz('{}_{:05d}.npz'.format(self.stream_base,
+                                             self.chunks_written))
+        self.chunks_written += 1
+        for column in self._columns.values():
+            column.clear()
+
+    def save_npz(self, filename, compress=True):
+        """
+        Writes the rows in memory to one '.npz' file, with one array per
+        column.
+
+        Parameters
+        ----------
+        filename: str
+            Name of the file.
+        compress: bool
+            If True, the file is compressed.
+        """
+        save = np.savez_compressed if compress else np.savez
+        with open(filename, 'wb') as file:
+            save(file, **self.columns)
+
+    def save_parquet(self, filename):
+        """
+        Writes the rows in memory to a Parquet file, with one column per
+        column of single numbers. Histograms and cell counts are flattened
+        into one column per element, e.g. 'herbivore_age_histogram_0'.
+
+        This requires pandas and a Parquet engine such as pyarrow.
+
+        Parameters
+        ----------
+        filename: str
+            Name of the file.
+        """
+        import pandas as pd
+
+        table = {}
+        for name, data in self.columns.items():
+            if data.ndim == 1:
+                table[name] = data
+            else:
+                flat = data.reshape(len(data), -1)
+                for k in range(flat.shape[1]):
+                    table['{}_{}'.format(name, k)] = flat[:, k]
+        pd.DataFrame(table).to_parquet(filename)
+
+
+def load_statistics(stream_base):
+    """
+    Reads all files written by a streaming 'StatisticsRecorder'.
+
+    Parameters
+    ----------
+    stream_base: str
+        The 'stream_base' of the recorder.
+
+    Returns
+    -------
+    columns: dict
+        Dictionary with one array per column, with the rows of all files in
+        the order they were recorded.
+    """
+    filenames = sorted(glob.glob(glob.escape(stream_base) + '_[0-9]*.npz'))
+    if len(filenames) == 0:
+        raise ValueError('No statistics files for {}'.format(stream_base))
+    chunks = []
+    for filename in filenames:
+        with np.load(filename, allow_pickle=False) as data:
+            chunks.append({name: data[name] for name in data.files})
+    return {name: np.concatenate([chunk[name] for chunk in chunks])
+            for name in chunks[0]}
@@ -8,17 +8,20 @@ __author__ = "Michael Lindberg, Daniel Milliam Müller"
 __email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
 
 
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-import pandas as pd
+import json
 import numpy as np
 import subprocess
-import copy
 import os
 
+# matplotlib and pandas are imported in the methods that use them, so that
+# importing this module and running headless simulations does not load them.
+
 from .animals import Herbivore, Carnivore
 from .cell import Ocean, Mountain, Jungle, Savannah, Desert
 from .island import Island
+from .movie import MovieWriter
+from .parameters import hybridmethod
+from .profiling import PhaseProfiler
 
 # update these variables to point to your ffmpeg and convert binaries
 _FFMPEG_BINARY = '/users/michaellindberg/downloads/ffmpeg'
@@ -29,6 +32,10 @@ _CONVERT_BINARY = 'magick'
 _DEFAULT_GRAPHICS_DIR = os.path.join('..', 'data')
 _DEFAULT_GRAPHICS_NAME = 'dv'
 _DEFAULT_MOVIE_FORMAT = 'mp4'
+_DEFAULT_MOVIE_FPS = 10
+
+# version of the checkpoint format written by 'BioSim.save_checkpoint'
+_CHECKPOINT_VERSION = 1
 
 
 class BioSim:
@@ -41,6 +48,13 @@ class BioSim:
             cmax_animals=None,
             img_base=None,
             img_fmt="png",
+            backend="object",
+            migration="cellwise",
+            profile=False,
+            recorder=None,
+            density_history=None,
+            movie_file=None,
+            parameters=None,
     ):
         """
         Initializer for the BioSim class.
@@ -61,6 +75,36 @@ class BioSim:
             String with beginning of file name for figures, including path
         img_fmt: str
             String with file type for figures, e.g. 'png'
+        backend: str
+            How the animals are stored, 'object' or 'array'. See
+            'Island' for details.
+        migration: str
+            How migration is performed, 'cellwise' or 'island'. See
+            'Island' for details.
+        profile: bool
+            If True, the wall time, number of animals and number of random
+            numbers drawn are recorded for each phase of every simulated
+            year, see 'phase_profile'.
+        recorder: StatisticsRecorder
+            If given, the recorder records the statistics of every simulated
+            year, see 'recorder.StatisticsRecorder'.
+        density_history: DensityHistory
+            If given, the number of animals of each species in each cell is
+            written to a memory-mapped file for the initial population and
+            every simulated year, see 'history.DensityHistory'.
+        movie_file: str
+            If given, the figure is streamed to ffmpeg as a movie frame
+            every 'img_years' years, and written to this file, e.g.
+            'sim.mp4'. No image files are written unless img_base is given
+            as well. Call 'make_movie' to finish the movie. If 'simulate'
+            fails, the frames streamed so far are finished as a movie.
+        parameters: dict
+            Parameter overrides that only apply to this simulation, mapping
+            'Herbivore', 'Carnivore', 'J' or 'S' to a dictionary of
+            parameters. Unlike 'set_animal_parameters' and
+            'set_landscape_parameters' on the instance, they are set before
+            the cells and animals are created, so the initial fodder and
+            fitness use them as well.
 
         If ymax_animals is None, the y-axis limit should be adjusted
         automatically.
@@ -85,13 +129,32 @@ class BioSim:
         self._cmax_animals = cmax_animals
         self._img_fmt = img_fmt
         self._img_base = img_base
+        self._movie_writer = None
+        if movie_file is not None:
+            self._movie_writer = MovieWriter(
+                movie_file, fps=_DEFAULT_MOVIE_FPS,
+                ffmpeg_binary=_FFMPEG_BINARY
+            )
 
         self.years_simulated = 0
+        self.recorder = recorder
+        self.density_history = density_history
 
-        self.simulated_island = Island(self.island_map)
+        self.simulated_island = Island(
+            self.island_map, backend=backend, migration=migration,
+            parameters=parameters
+        )
         self.simulated_island.map_constructor()
         self.simulated_island.adding_population(self.ini_pop)
         self.simulated_island.generate_nearby_cells()
+        if profile:
+            self.simulated_island.profiler = PhaseProfiler()
+        if density_history is not None:
+            density_history.record(self)
+
+        shape = self.simulated_island.landscape_codes.shape
+        self._herbivore_counts = np.zeros(shape, dtype=int)
+        self._carnivore_counts = np.zeros(shape, dtype=int)
 
         # For graphical setup
 
@@ -120,6 +183,8 @@ class BioSim:
         self.carn_heat_bar = None
         self.map_herb = None
         self.map_carn = None
+        self.map_herb_image = None
+        self.map_carn_image = None
 
         self.herb_count = None
         self.carn_count = None
@@ -128,11 +193,19 @@ class BioSim:
         self.carn_template = None
         self.herb_template = None
 
-    @staticmethod
-    def set_animal_parameters(species, params):
+        self._animated_artists = []
+        self._blit_background = None
+        self._blit_size = None
+
+    @hybridmethod
+    def set_animal_parameters(sim, species, params):
         """
         Setting parameters for animal species.
 
+        Called on the class, e.g. BioSim.set_animal_parameters(...), the
+        default parameters used by all simulations are changed. Called on a
+        BioSim instance, the parameters only apply to that simulation.
+
         Parameters
         ----------
         species: str
@@ -140,6 +213,11 @@ class BioSim:
         params: dict
             Dictionary with valid parameter specification for species.
         """
+        if sim is not None:
+            if species not in ('Herbivore', 'Carnivore'):
+                raise ValueError
+            sim.simulated_island.set_parameters(species, params)
+            return
 
         if species == 'Herbivore':
             for parameter in params:
@@ -150,11 +228,15 @@ class BioSim:
         else:
             raise ValueError
 
-    @staticmethod
-    def set_landscape_parameters(landscape, params):
+    @hybridmethod
+    def set_landscape_parameters(sim, landscape, params):
         """
         Setting parameters for landscape type.
 
+        Called on the class, the default parameters used by all simulations
+        are changed. Called on a BioSim instance, the parameters only apply
+        to that simulation.
+
         Parameters
         ----------
         landscape: str
@@ -162,6 +244,12 @@ class BioSim:
         params: dict
             Dict with valid parameter specification for landscape
         """
+        if sim is not None:
+            if landscape not in ('J', 'S'):
+                raise ValueError
+            sim.simulated_island.set_parameters(landscape, params)
+            return
+
         if landscape == 'J':
             for parameter in params:
                 Jungle.parameters[parameter] = params[parameter]
@@ -183,24 +271,26 @@ class BioSim:
         """
         Total number of animals on island.
         """
-        return len(self.simulated_island.total_population())
+        return self.simulated_island.num_animals
 
     @property
     def num_animals_per_species(self):
         """
         Number of animals per species in island, as dictionary.
         """
+        return self.simulated_island.num_animals_per_species
 
-        animals = self.simulated_island.total_population()
-        number_of_herbivores = sum(
-            isinstance(animal, Herbivore) for animal in animals
-        )
-        number_of_carnivores = sum(
-            isinstance(animal, Carnivore) for animal in animals
-        )
-
-        return {"Herbivore": number_of_herbivores,
-                "Carnivore": number_of_carnivores}
+    @property
+    def phase_profile(self):
+        """
+        Recorded cost of each phase of the annual cycle, as a list with one
+        dictionary per year and phase with the keys 'year', 'phase', 'time',
+        'animals' and 'random_numbers'. None if profiling is disabled.
+        """
+        profiler = self.simulated_island.profiler
+        if profiler is None:
+            return None
+        return profiler.records
 
     @property
     def animal_distribution(self):
@@ -214,26 +304,155 @@ class BioSim:
             The dataframe with animal counts per species for cell
             coordinates.
         """
+        return self.get_animal_distribution()
+
+    def get_animal_distribution(self, raw=False):
+        """
+        Counts the animals of each species in every cell at once.
+
+        Parameters
+        ----------
+        raw: bool
+            If True, the columns are returned as NumPy arrays, and pandas is
+            not used. This is faster for callers that poll the distribution
+            every year.
+
+        Returns
+        -------
+        distribution: pandas DataFrame or dict
+            The columns 'Row', 'Col', 'Herbivore' and 'Carnivore', with one
+            row per cell, numbered row by row. A dictionary of arrays if
+            'raw' is True.
+        """
+        island = self.simulated_island
+        distribution = {
+            'Row': island.cell_rows,
+            'Col': island.cell_columns,
+            'Herbivore': island.animal_count_map(Herbivore).ravel(),
+            'Carnivore': island.animal_count_map(Carnivore).ravel()
+        }
+        if raw:
+            return distribution
 
-        island = self.simulated_island.island_map
+        import pandas as pd
 
-        data = []
+        return pd.DataFrame(distribution)
 
-        for row in island:
-            for cell in row:
-                n_herbivores = cell.herbivores_in_cell
-                n_carnivores = cell.carnivores_in_cell
+    def state(self):
+        """
+        Collects the full state of the simulation in NumPy arrays: the map,
+        the parameters, the fodder of every cell, all animals, the year and
+        the state of the random number generator.
 
-                data.append(
-                    [cell.coordinate[0],
-                     cell.coordinate[1],
-                     n_herbivores,
-                     n_carnivores])
+        Returns
+        -------
+        state: dict
+            Dictionary of arrays, see 'Island.state' for the fodder and
+            animals. The arrays are shared with the simulation where
+            possible, so the state should not be changed.
+        """
+        island = self.simulated_island
+        state = island.state()
+        name, keys, position, has_gauss, cached_gaussian = \
+            np.random.get_state()
+        state.update(
+            version=np.array(_CHECKPOINT_VERSION),
+            island_map=np.array(self.island_map),
+            backend=np.array(island.backend),
+            migration=np.array(island.migration),
+            parameters=np.array(json.dumps(island.parameters.values())),
+            year=np.array(self.years_simulated),
+            rng_keys=keys,
+            rng_position=np.array([position, has_gauss]),
+            rng_gaussian=np.array(cached_gaussian)
+        )
+        return state
 
-        df = pd.DataFrame(data)
-        df.columns = (["Row", "Col", "Herbivore", "Carnivore"])
+    @classmethod
+    def from_state(cls, state, **kwargs):
+        """
+        Creates a simulation from a state created by 'state'. The random
+        number generator is set to the saved state, so the new simulation
+        continues exactly like the saved one would have.
 
-        return df
+        Parameters
+        ----------
+        state: dict
+            Dictionary of arrays from 'state' or 'save_checkpoint'.
+        kwargs:
+            Further arguments for the BioSim initializer, e.g. 'img_base'.
+            A 'seed' is accepted, but has no effect on the simulation, as
+            the random number generator is set to the saved state. The
+            overrides in 'parameters' are applied on top of the saved
+            parameters. A 'density_history' records the restored state
+            as its first year.
+
+        Returns
+        -------
+        sim: BioSim
+            The restored simulation.
+        """
+        if int(state['version']) != _CHECKPOINT_VERSION:
+            raise ValueError('Unsupported checkpoint version')
+        seed = kwargs.pop('seed', 0)
+        density_history = kwargs.pop('density_history', None)
+        parameters = json.loads(str(state['parameters']))
+        for key, params in kwargs.pop('parameters', {}).items():
+            parameters.setdefault(key, {}).update(params)
+        sim = cls(str(state['island_map']), [], seed=seed,
+                  backend=str(state['backend']),
+                  migration=str(state['migration']), parameters=parameters,
+                  **kwargs)
+        sim.simulated_island.restore_state(state)
+        sim.years_simulated = int(state['year'])
+        position, has_gauss = state['rng_position'].tolist()
+        np.random.set_state(('MT19937', state['rng_keys'], position,
+                             has_gauss, float(state['rng_gaussian'])))
+        if density_history is not None:
+            sim.density_history = density_history
+            density_history.record(sim)
+        return sim
+
+    def save_checkpoint(self, filename, compress=False):
+        """
+        Saves the state of the simulation to a NumPy '.npz' file. The file is
+        first written under a temporary name and then renamed, so an
+        existing checkpoint is never left half written.
+
+        Parameters
+        ----------
+        filename: str
+            Name of the checkpoint file.
+        compress: bool
+            If True, the file is compressed. This makes the file smaller,
+            but saving slower.
+        """
+        save = np.savez_compressed if compress else np.savez
+        temporary = filename + '.tmp'
+        with open(temporary, 'wb') as file:
+            save(file, **self.state())
+        os.replace(temporary, filename)
+
+    @classmethod
+    def load_checkpoint(cls, filename, **kwargs):
+        """
+        Creates a simulation from a file written by 'save_checkpoint'.
+
+        Parameters
+        ----------
+        filename: str
+            Name of the checkpoint file.
+        kwargs:
+            Further arguments for the BioSim initializer, e.g. 'img_base'.
+
+        Returns
+        -------
+        sim: BioSim
+            The restored simulation.
+        """
+        with np.load(filename, allow_pickle=False) as data:
+            state = {key: data[key] for key in data.files}
+        return cls.from_state(state, **kwargs)
 
     def add_population(self, population):
         """
@@ -258,12 +477,9 @@ class BioSim:
             A nested list with the number of carnivores in each cell.
 
         """
-        carnivore_map = copy.deepcopy(self.simulated_island.island_map)
-        carnivore_map = [
-            [cell.carnivores_in_cell for cell in row]
-            for row in carnivore_map
-        ]
-        return carnivore_map
+        return self.simulated_island.animal_count_map(
+            Carnivore, out=self._carnivore_counts
+        ).tolist()
 
     def herbivore_island_map(self):
         """
@@ -276,14 +492,12 @@ class BioSim:
             A nested list with the number of herbivores in each cell.
 
         """
-        herbivore_map = copy.deepcopy(self.simulated_island.island_map)
-        herbivore_map = [
-            [cell.herbivores_in_cell for cell in row]
-            for row in herbivore_map
-        ]
-        return herbivore_map
+        return self.simulated_island.animal_count_map(
+            Herbivore, out=self._herbivore_counts
+        ).tolist()
 
-    def simulate(self, num_years, vis_years=1, img_years=None):
+    def simulate(self, num_years, vis_years=1, img_years=None,
+                 checkpoint_years=None, checkpoint_file=None):
         """
         Simulation of the island.
 
@@ -292,12 +506,31 @@ class BioSim:
         num_years: int
             Number of years to simulate
         vis_years: int
-            Years between visualization updates
+            Years between visualization updates. If 0 or None, the
+            simulation runs headless: no figure is created, no images are
+            saved and matplotlib is not used.
         img_years: int
             Years between visualizations saved to files (default: vis_years)
+        checkpoint_years: int
+            Years between checkpoints. If None, no checkpoints are saved.
+        checkpoint_file: str
+            Name of the checkpoint file, see 'save_checkpoint'. The file is
+            replaced by every new checkpoint.
 
         Image files will be numbered consecutively.
         """
+        if checkpoint_years and checkpoint_file is None:
+            raise ValueError('checkpoint_years requires a checkpoint_file')
+
+        if not vis_years:
+            for _ in range(num_years):
+                self.simulated_island.island_cycle(self.years_simulated + 1)
+                self.years_simulated += 1
+                self._end_of_year(checkpoint_years, checkpoint_file)
+            return
+
+        import matplotlib.pyplot as plt
+
         plt.ion()
 
         if img_years is None:
@@ -305,22 +538,44 @@ class BioSim:
 
         self._setup_graphics(num_years)
 
-        for _ in range(num_years):
+        try:
+            for _ in range(num_years):
+
+                self.simulated_island.island_cycle(self.years_simulated + 1)
+                self.years_simulated += 1
 
-            self.simulated_island.island_cycle()
-            self.years_simulated += 1
+                if self.year % vis_years == 0:
+                    self._update_graphics()
 
-            if self.year % vis_years == 0:
-                self._update_graphics()
+                if self.year % img_years == 0:
+                    self._save_graphics()
 
-            if self.year % img_years == 0:
-                self._save_graphics()
+                self._end_of_year(checkpoint_years, checkpoint_file)
 
-            self.idx += 1
-            plt.pause(1e-6)
+                self.idx += 1
+                self._fig.canvas.flush_events()
+        except BaseException:
+            # finish the frames streamed so far, so ffmpeg does not keep
+            # running after the error
+            if self._movie_writer is not None:
+                self._movie_writer.close(check=False)
+            raise
 
         self.idx = 0
 
+    def _end_of_year(self, checkpoint_years, checkpoint_file):
+        """
+        Records the statistics and densities of the year, if a recorder or
+        density history is attached, and saves a checkpoint if the current
+        year is a checkpoint year.
+        """
+        if self.recorder is not None:
+            self.recorder.record(self)
+        if self.density_history is not None:
+            self.density_history.record(self)
+        if checkpoint_years and self.year % checkpoint_years == 0:
+            self.save_checkpoint(checkpoint_file)
+
     def _setup_graphics(self, num_years):
         """
         Graphical setup for visualization of the simulation.
@@ -330,6 +585,7 @@ class BioSim:
         num_years: int
             The number of years to be simulated.
         """
+        import matplotlib.pyplot as plt
 
         if self._fig is None:
             self._fig = plt.figure(figsize=(20, 10))
@@ -350,11 +606,71 @@ class BioSim:
         self._herb_heat_map_setup()
         self._herb_count_setup()
         self._carn_count_setup()
+        self._blitting_setup()
+
+    def _blitting_setup(self):
+        """
+        Setup for blitting. The artists that change every year are marked as
+        animated, so they are left out when the whole figure is drawn. The
+        figure is drawn once, and the image of the static parts is kept as
+        background for '_blit'.
+        """
+        self._animated_artists = [
+            self.herb_heat_bar, self.map_herb_image,
+            self.carn_heat_bar, self.map_carn_image,
+            self.line_herbs, self.line_carns, self.title,
+            self.herb_txt, self.carn_txt
+        ]
+        for artist in self._animated_artists:
+            artist.set_animated(True)
+        self._blit_background = None
+        self._blit()
+
+    def _blit(self):
+        """
+        Draws the animated artists on top of the saved background, and
+        updates only the regions of the figure they cover. The background is
+        drawn again if the figure has not been drawn yet, or has changed
+        size.
+        """
+        canvas = self._fig.canvas
+        if self._blit_background is None or \
+                canvas.get_width_height() != self._blit_size:
+            canvas.draw()
+            self._blit_background = canvas.copy_from_bbox(self._fig.bbox)
+            self._blit_size = canvas.get_width_height()
+        else:
+            canvas.restore_region(self._blit_background)
+
+        for artist in self._animated_artists:
+            self._fig.draw_artist(artist)
+        for region in self._blit_regions():
+            canvas.blit(region)
+
+    def _blit_regions(self):
+        """
+        Returns the regions of the figure covered by the animated artists:
+        the heat maps, the counters, and the graph together with its title.
+        """
+        from matplotlib.transforms import Bbox
+
+        graph = self.ani_ax.bbox
+        title_top = self.title.get_window_extent(
+            self._fig.canvas.get_renderer()
+        ).y1
+        return [
+            self.herb_heat.bbox, self.carn_heat.bbox,
+            self.herb_count.bbox, self.carn_count.bbox,
+            Bbox.from_extents(graph.x0, graph.y0, graph.x1,
+                              max(graph.y1, title_top + 2))
+        ]
 
     def _map_setup(self):
         """
         A graphical setup for the map with color labels.
         """
+        import matplotlib.colors as mcolors
+        import matplotlib.pyplot as plt
 
         if self.map_ax is None:
             self.map_ax = self._fig.add_axes([0.02, 0.58, 0.45, 0.35])
@@ -368,10 +684,7 @@ class BioSim:
                 "M": mcolors.to_rgba("dimgray"),
             }
 
-            rgb_island_map = copy.deepcopy(self.simulated_island.island_map)
-
-            rgb_island_map = [[rgb_values[cell.landscape_type] for cell in row]
-                              for row in rgb_island_map]
+            rgb_island_map = self._rgb_island_map(rgb_values)
 
             map_ax_lg = self._fig.add_axes([0.45, 0.7, 0.05, 0.3])
             map_ax_lg.axis('off')
@@ -390,18 +703,38 @@ class BioSim:
 
             self.map_ax.imshow(rgb_island_map, interpolation='nearest')
             self.map_ax.set_xticks(
-                range(0, len(rgb_island_map[0]), 4)
+                range(0, rgb_island_map.shape[1], 4)
             )
             self.map_ax.set_xticklabels(
-                range(0, len(rgb_island_map[0]), 4)
+                range(0, rgb_island_map.shape[1], 4)
             )
             self.map_ax.set_yticks(
-                range(0, len(rgb_island_map), 4)
+                range(0, rgb_island_map.shape[0], 4)
             )
             self.map_ax.set_yticklabels(
-                range(0, len(rgb_island_map), 4)
+                range(0, rgb_island_map.shape[0], 4)
             )
 
+    def _rgb_island_map(self, rgb_values):
+        """
+        Creates an RGBA image of the island map from the landscape codes.
+
+        Parameters
+        ----------
+        rgb_values: dict
+            Dictionary mapping landscape codes to RGBA colors.
+
+        Returns
+        -------
+        rgb_island_map: numpy.ndarray
+            Array with shape (rows, columns, 4).
+        """
+        codes = self.simulated_island.landscape_codes
+        rgb_island_map = np.empty(codes.shape + (4,))
+        for code, rgba in rgb_values.items():
+            rgb_island_map[codes == code] = rgba
+        return rgb_island_map
+
     def _graph_setup(self, num_years):
         """
         Setup for the graphs showing the number of herbivores and carnivores
@@ -413,6 +746,8 @@ class BioSim:
             The number of years to be simulated.
 
         """
+        import matplotlib.pyplot as plt
+
         if self.ani_ax is not None:
             if self.idx == 0:
                 self._fig.delaxes(self.ani_ax)
@@ -450,18 +785,20 @@ class BioSim:
         if num_years > 10:
             self.ani_ax.set_xticks(range(0, num_years, 10))
             self.ani_ax.set_xticklabels(
-                range(self.year, num_years+self.year + 1, 10)
+                range(self.year, num_years + self.year, 10)
             )
         else:
             self.ani_ax.set_xticks(range(0, num_years))
             self.ani_ax.set_xticklabels(
-                range(self.year, num_years+self.year + 1)
+                range(self.year, num_years + self.year)
             )
 
     def _herb_heat_map_setup(self):
         """
         Heat map setup for the herbivores.
         """
+        import matplotlib.pyplot as plt
+
         if self.herb_heat is None:
             self.herb_heat = self._fig.add_axes([0.55, 0.65, 0.5, 0.3])
             plt.title("Herbivore distribution", weight='bold', fontsize=15)
@@ -478,10 +815,12 @@ class BioSim:
                 range(0, len(self.simulated_island.island_map), 2)
             )
             self.herb_heat_bar = plt.imshow(
-                [[0 for _ in range(21)] for _ in range(13)],
+                self._herbivore_counts,
+                interpolation='nearest',
                 cmap='jet',
                 alpha=0.5,
                 zorder=2,
+                vmin=0,
                 vmax=self._cmax_animals['Herbivore']
             )
 
@@ -499,6 +838,8 @@ class BioSim:
         """
         Heat map setup for the carnivores.
         """
+        import matplotlib.pyplot as plt
+
         if self.carn_heat is None:
             self.carn_heat = self._fig.add_axes([0.55, 0.10, 0.5, 0.3])
             plt.title("Carnivore distribution", weight='bold', fontsize=15)
@@ -515,10 +856,12 @@ class BioSim:
                 range(0, len(self.simulated_island.island_map), 2)
             )
             self.carn_heat_bar = plt.imshow(
-                [[0 for _ in range(21)] for _ in range(13)],
+                self._carnivore_counts,
+                interpolation='nearest',
                 cmap='jet',
                 alpha=0.5,
                 zorder=2,
+                vmin=0,
                 vmax=self._cmax_animals['Carnivore']
             )
 
@@ -537,6 +880,8 @@ class BioSim:
         """
         Setup for the island map in the background of the herbivore heat map.
         """
+        import matplotlib.colors as mcolors
+
         if self.map_herb is None:
 
             self.map_herb = self._fig.add_axes([0.55, 0.65, 0.5, 0.3])
@@ -547,21 +892,18 @@ class BioSim:
                 "D": mcolors.to_rgba("lightyellow"),
                 "M": mcolors.to_rgba("gainsboro"),
             }
-            rgb_island_map = copy.deepcopy(
-                self.simulated_island.island_map
-            )
-            rgb_island_map = [
-                [rgb_values[cell.landscape_type] for cell in row]
-                for row in rgb_island_map]
+            rgb_island_map = self._rgb_island_map(rgb_values)
 
-            self.map_herb.imshow(rgb_island_map,
-                                 interpolation='nearest',
-                                 alpha=0.3, zorder=3)
+            self.map_herb_image = self.map_herb.imshow(
+                rgb_island_map, interpolation='nearest', alpha=0.3, zorder=3
+            )
 
     def _carn_map_setup(self):
         """
         Setup for the island map in the background of the carnivore heat map.
         """
+        import matplotlib.colors as mcolors
+
         if self.map_carn is None:
             self.map_carn = self._fig.add_axes([0.55, 0.10, 0.5, 0.3])
             rgb_values = {
@@ -571,16 +913,11 @@ class BioSim:
                 "D": mcolors.to_rgba("lightyellow"),
                 "M": mcolors.to_rgba("gainsboro"),
             }
-            rgb_island_map = copy.deepcopy(
-                self.simulated_island.island_map
-            )
-            rgb_island_map = [
-                [rgb_values[cell.landscape_type] for cell in row]
-                for row in rgb_island_map]
+            rgb_island_map = self._rgb_island_map(rgb_values)
 
-            self.map_carn.imshow(rgb_island_map,
-                                 interpolation='nearest',
-                                 alpha=0.3, zorder=3)
+            self.map_carn_image = self.map_carn.imshow(
+                rgb_island_map, interpolation='nearest', alpha=0.3, zorder=3
+            )
 
     def _herb_count_setup(self):
         """
@@ -622,27 +959,31 @@ class BioSim:
         """
         Updating graphics in the figure (self._fig). This is run for each
         iteration in the simulation loop.
+
+        The artists created by the setup are updated in place, and only they
+        are drawn again, see '_blit'.
         """
 
         self._update_heat_map()
         self._update_graph()
         self._herb_count_update()
         self._carn_count_update()
+        self._blit()
 
     def _update_heat_map(self):
         """
         Updating the heat maps for herbivore and carnivore distribution.
         """
-        self.herb_heat.imshow(
-            self.herbivore_island_map(),
-            interpolation='nearest',
-            cmap='jet'
+        self.herb_heat_bar.set_data(
+            self.simulated_island.animal_count_map(
+                Herbivore, out=self._herbivore_counts
+            )
         )
 
-        self.carn_heat.imshow(
-            self.carnivore_island_map(),
-            interpolation='nearest',
-            cmap='jet'
+        self.carn_heat_bar.set_data(
+            self.simulated_island.animal_count_map(
+                Carnivore, out=self._carnivore_counts
+            )
         )
 
     def _update_graph(self):
@@ -680,24 +1021,43 @@ class BioSim:
 
     def _save_graphics(self):
         """
-        Saving graphics.
+        Saving graphics. The figure is written as the next movie frame if a
+        movie file is given, and saved as an image file if img_base is
+        given.
         """
+        import matplotlib.pyplot as plt
+
+        if self._movie_writer is not None:
+            self._movie_writer.write_frame(self._fig, draw=False)
 
         if self._img_base is None:
             return
 
-        plt.savefig(
-            '{base}_{num:05d}.{type}'.format(
-                base=self._img_base,
-                num=self._img_ctr,
-                type=self._img_fmt)
-        )
+        # animated artists are left out when the whole figure is drawn
+        for artist in self._animated_artists:
+            artist.set_animated(False)
+        try:
+            plt.savefig(
+                '{base}_{num:05d}.{type}'.format(
+                    base=self._img_base,
+                    num=self._img_ctr,
+                    type=self._img_fmt)
+            )
+        finally:
+            for artist in self._animated_artists:
+                artist.set_animated(True)
         self._img_ctr += 1
 
     def make_movie(self):
         """
         Create MPEG4 movie from visualization images saved.
+
+        If a movie file was given, the frames have already been streamed to
+        ffmpeg, and the movie is finished instead.
         """
+        if self._movie_writer is not None:
+            self._movie_writer.close()
+            return
 
         movie_fmt = _DEFAULT_MOVIE_FORMAT
 
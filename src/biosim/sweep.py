@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+"""
+Sweep Module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import itertools
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .ensemble import SPECIES, run_replicate
+
+
+def parameter_grid(grid):
+    """
+    Creates all combinations of the parameter values in a grid.
+
+    Parameters
+    ----------
+    grid: dict
+        Dictionary mapping a species name or landscape code to a dictionary
+        with a list of values for each parameter, e.g.
+        {'Herbivore': {'gamma': [0.1, 0.2]}, 'J': {'f_max': [500, 800]}}.
+
+    Returns
+    -------
+    combinations: list
+        List of parameter dictionaries in the format used by
+        'ensemble.apply_parameters', one per combination.
+    """
+    keys = [(target, name) for target in grid for name in grid[target]]
+    combinations = []
+    for values in itertools.product(*(grid[target][name]
+                                      for target, name in keys)):
+        combination = {}
+        for (target, name), value in zip(keys, values):
+            combination.setdefault(target, {})[name] = value
+        combinations.append(combination)
+    return combinations
+
+
+def _json_default(value):
+    """
+    Converts NumPy scalars, e.g. the values of a grid created with
+    'numpy.linspace', to Python numbers for JSON.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('{} is not JSON serializable'.format(type(value)))
+
+
+def result_key(combination, seed):
+    """
+    Returns a string identifying a combination and seed, used to recognise
+    finished runs when a sweep is resumed.
+    """
+    return json.dumps([combination, seed], sort_keys=True,
+                      default=_json_default)
+
+
+class Sweep:
+    """
+    Runs the same simulation for many parameter combinations in a pool of
+    worker processes.
+
+    Every run sets its parameters on its own simulation, so the runs are
+    isolated from each other and from the calling process. Results are
+    returned as soon as each run finishes. If a results file is given, every
+    result is appended to it as one line of JSON, and runs already in the
+    file are skipped, so an interrupted sweep can be resumed by running it
+    again.
+    """
+
+    def __init__(self, island_map, ini_pop, combinations, num_years,
+                 seeds=(1,), results_file=None, backend='object',
+                 migration='cellwise'):
+        """
+        Class constructor for Sweep.
+
+        Parameters
+        ----------
+        island_map: str
+            Multi-line string specifying island geography.
+        ini_pop: list
+            List of dictionaries specifying initial population.
+        combinations: list
+            List of parameter dictionaries, e.g. from 'parameter_grid'.
+        num_years: int
+            Number of years to simulate.
+        seeds: tuple
+            Seeds to run for every combination.
+        results_file: str
+            Path of a JSON lines file to store results in, or None.
+        backend: str
+            'object' or 'array', see 'Island'.
+        migration: str
+            'cellwise' or 'island', see 'Island'.
+        """
+        self.island_map = island_map
+        self.ini_pop = ini_pop
+        self.combinations = list(combinations)
+        self.num_years = num_years
+        self.seeds = list(seeds)
+        self.results_file = results_file
+        self.backend = backend
+        self.migration = migration
+
+    def finished(self):
+        """
+        Reads the results already stored in the results file.
+
+        Returns
+        -------
+        results: dict
+            Dictionary mapping 'result_key' of each finished run to its
+            result.
+        """
+        results = {}
+        if self.results_file is None or not os.path.exists(
+                self.results_file):
+            return results
+        with open(self.results_file) as file:
+            for line in file:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                results[result_key(result['parameters'],
+                                   result['seed'])] = result
+        return results
+
+    def run(self, processes=None):
+        """
+        Runs all combinations and seeds that are not finished.
+
+        Parameters
+        ----------
+        processes: int
+            Number of worker processes. By default one per CPU core.
+
+        Yields
+        ------
+        result: dict
+            Dictionary with the 'parameters', the 'seed' and the number of
+            animals of each species per year in 'counts', in the order the
+            runs finish.
+        """
+        finished = self.finished()
+        tasks = [(combination, seed) for combination in self.combinations
+                 for seed in self.seeds
+                 if result_key(combination, seed) not in finished]
+        if len(tasks) == 0:
+            return
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {
+                executor.submit(
+                    run_replicate, self.island_map, self.ini_pop, seed,
+                    self.num_years, combination, self.backend,
+                    self.migration
+                ): (combination, seed)
+                for combination, seed in tasks
+            }
+            for future in as_completed(futures):
+                combination, seed = futures[future]
+                counts = future.result()
+                result = {
+                    'parameters': combination,
+                    'seed': seed,
+                    'counts': {species: counts[:, k].tolist()
+                               for k, species in enumerate(SPECIES)}
+                }
+                self._store(result)
+                yield result
+
+    def _store(self, result):
+        """
+        Appends a result to the results file, if there is one.
+        """
+        if self.results_file is None:
+            return
+        with open(self.results_file, 'a') as file:
+            file.write(json.dumps(result, default=_json_default) + '\n')
+            file.flush()
+
+    def results(self):
+        """
+        Returns all results stored in the results file, in the order of the
+        combinations and seeds.
+        """
+        finished = self.finished()
+        return [finished[result_key(combination, seed)]
+                for combination in self.combinations
+                for seed in self.seeds
+                if result_key(combination, seed) in finished]
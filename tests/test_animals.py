@@ -134,6 +134,21 @@ class TestAnimals:
         """
         assert self.invalid_herbivore.calculate_fitness() == 0
 
+    def test_batch_fitness(self):
+        """
+        Tests that 'batch_fitness' gives the same values as
+        'calculate_fitness', and 0 for animals with weight <= 0.
+        """
+        herbivores = [Herbivore(age=age, weight=weight)
+                      for age, weight in ((2, 10), (30, 25.5), (80, 3))]
+        fitness = Herbivore.batch_fitness(
+            [herb.age for herb in herbivores],
+            [herb.weight for herb in herbivores]
+        )
+        for herb, value in zip(herbivores, fitness):
+            assert value == approx(herb.calculate_fitness())
+        assert list(Carnivore.batch_fitness([2, 5], [0, -1])) == [0, 0]
+
     def test_update_fitness(self):
         """
         Tests that an animal's fitness is correctly updated.
@@ -193,6 +208,14 @@ class TestDeath:
 
         assert True not in death_results
 
+    def test_death_with_given_random_number(self):
+        """
+        Tests that 'death' uses the given random number instead of drawing
+        one.
+        """
+        assert self.herbivore.death(random_number=0.0) is True
+        assert self.herbivore.death(random_number=self.prob_death) is False
+
     def test_probability_of_death(self):
         """
         Tests the binomial distribution of animal deaths. 'Stats.binom_test' is
@@ -382,6 +405,17 @@ class TestMigrate:
         assert isinstance(chosen_cell, Jungle)
         assert self.herbivore.has_moved is True
 
+    def test_choose_migration_destination(self):
+        """
+        Tests that a cell with propensity 0 is never chosen.
+        """
+        jungle = Jungle()
+        relative_fodder_list = [(0, Ocean()), (5, jungle), (0, Mountain())]
+        for _ in range(20):
+            assert self.herbivore.choose_migration_destination(
+                relative_fodder_list, [0, 5, 0]
+            ) is jungle
+
 
 class TestFeedingKilling:
     """
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for branching module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import pytest
+import numpy as np
+from biosim.branching import Snapshot
+from biosim.simulation import BioSim
+
+
+class TestSnapshot:
+    """
+    Tests for snapshots and branches of a simulation.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_snapshot(self):
+        """
+        Setup for branching tests, with a burn-in of three years.
+        """
+        self.island_map = "OOOOO\nOJJSO\nOJSJO\nOOOOO"
+        ini_pop = [
+            {
+                "loc": (1, 1),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(50)
+                ],
+            }
+        ]
+        self.carnivores = [
+            {
+                "loc": (2, 2),
+                "pop": [
+                    {"species": "Carnivore", "age": 5, "weight": 20}
+                    for _ in range(10)
+                ],
+            }
+        ]
+        self.sim = BioSim(self.island_map, ini_pop, seed=1)
+        self.sim.simulate(num_years=3, vis_years=0)
+        self.snapshot = Snapshot(self.sim)
+
+    def test_snapshot_is_a_copy(self):
+        """
+        Tests that the simulation can continue without changing the
+        snapshot.
+        """
+        herbivores = self.sim.num_animals_per_species['Herbivore']
+        self.sim.simulate(num_years=2, vis_years=0)
+        assert self.snapshot.year == 3
+        branch = self.snapshot.branch(seed=5)
+        assert branch.year == 3
+        assert branch.num_animals_per_species['Herbivore'] == herbivores
+
+    def test_branches_with_same_seed_match(self):
+        """
+        Tests that two branches with the same seed and intervention give
+        the same result, and that the intervention is applied.
+        """
+        results = []
+        for _ in range(2):
+            branch = self.snapshot.branch(seed=5, population=self.carnivores)
+            assert branch.num_animals_per_species['Carnivore'] == 10
+            branch.simulate(num_years=3, vis_years=0)
+            results.append(branch.state())
+        for key in results[0]:
+            assert np.array_equal(results[0][key], results[1][key])
+
+    def test_branches_in_processes(self):
+        """
+        Tests that branches run in worker processes give the same counts as
+        branches run in this process, and that different seeds give
+        different streams.
+        """
+        branches = [
+            {'seed': 1},
+            {'seed': 2},
+            {'seed': 1, 'population': self.carnivores,
+             'parameters': {'Herbivore': {'mu': 0.0}}},
+        ]
+        in_process = self.snapshot.run(branches, num_years=4, processes=0)
+        in_workers = self.snapshot.run(branches, num_years=4, processes=2)
+        for counts, expected in zip(in_workers, in_process):
+            assert counts.shape == (5, 2)
+            assert np.array_equal(counts, expected)
+        assert not np.array_equal(in_process[0], in_process[1])
+        assert list(in_process[2][0]) == [in_process[0][0, 0], 10]
@@ -8,6 +8,8 @@ __author__ = "Michael Lindberg, Daniel Milliam Müller"
 __email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
 
 import pytest
+import numpy as np
+from pytest import approx
 from biosim.cell import Cell, Ocean, Mountain, Jungle, Savannah, Desert
 from biosim.animals import Animals, Carnivore, Herbivore
 from biosim.simulation import BioSim
@@ -163,6 +165,31 @@ class TestCellOperations:
         self.desert_cell.population = self.test_pop
         assert self.desert_cell.carnivores_in_cell == 1
 
+    def test_species_partitions(self):
+        """
+        Tests that the population is split into herbivores and carnivores, and
+        that added animals go to the list of their species.
+        """
+        self.savannah_cell.population = self.test_pop
+        self.savannah_cell.add_animal(Carnivore())
+        assert len(self.savannah_cell.herbivores) == 3
+        assert len(self.savannah_cell.carnivores) == 2
+        assert self.savannah_cell.population == (
+                self.savannah_cell.herbivores + self.savannah_cell.carnivores
+        )
+
+    def test_herbivore_biomass(self):
+        """
+        Tests that the herbivore biomass is the total herbivore weight, and
+        that it is updated when herbivores are added or lose weight.
+        """
+        self.savannah_cell.population = self.test_pop
+        assert self.savannah_cell.herbivore_biomass == 70
+        self.savannah_cell.add_animal(Herbivore(age=2, weight=30))
+        assert self.savannah_cell.herbivore_biomass == 100
+        self.savannah_cell.loss_of_weight()
+        assert self.savannah_cell.herbivore_biomass == approx(95)
+
     def test_feeding_population_update(self):
         """
         Test if the feeding method updates the population correctly if at least
@@ -240,6 +267,32 @@ class TestCellOperations:
         self.jungle_cell.migration()
         assert self.mock_migrate.call_count == 4
 
+    def test_propensities_calculated_once_per_species(self, mocker):
+        """
+        Tests that the propensities are calculated once per species, not once
+        per animal.
+        """
+        mock_herbivore = mocker.spy(Herbivore, 'calculate_propensities')
+        mock_carnivore = mocker.spy(Carnivore, 'calculate_propensities')
+        self.jungle_cell.nearby_cells = [Jungle(), Savannah()]
+        self.jungle_cell.population = self.test_pop
+        self.jungle_cell.migration()
+        assert mock_herbivore.call_count == 1
+        assert mock_carnivore.call_count == 1
+
+    def test_migration_skips_impassable_cells(self):
+        """
+        Tests that only nearby cells that can be traversed are considered for
+        migration.
+        """
+        self.jungle_cell.nearby_cells = [Ocean(), Jungle(), Mountain()]
+        assert len(self.jungle_cell.passable_nearby_cells) == 1
+        relative_fodder_list = self.jungle_cell.nearby_relative_fodder(
+            Herbivore, passable_only=True
+        )
+        assert len(relative_fodder_list) == 1
+        assert isinstance(relative_fodder_list[0][1], Jungle)
+
     def test_aging(self):
         """
         Tests that 'aging' successfully increases the age of the
@@ -278,6 +331,35 @@ class TestCellOperations:
         assert len(self.jungle_cell.population) < 4
         assert self.mock_deaths.call_count == 4
 
+    def test_deaths_removes_only_dead_animals(self):
+        """
+        Tests that 'deaths' keeps exactly the animals that survive, in their
+        original order.
+        """
+        herbivores = [Herbivore(age=2, weight=20) for _ in range(6)]
+        for herbivore in herbivores[::2]:
+            herbivore.get_fitness = 0
+        for herbivore in herbivores[1::2]:
+            herbivore.get_fitness = 1
+        self.jungle_cell.population = list(herbivores)
+        self.jungle_cell.deaths()
+        assert self.jungle_cell.population == herbivores[1::2]
+
+    def test_one_random_draw_per_phase(self, mocker):
+        """
+        Tests that procreation, migration and deaths draw the random numbers
+        for all animals in the cell with a single call.
+        """
+        self.jungle_cell.population = [Herbivore(age=2, weight=40)
+                                       for _ in range(50)]
+        mock_random = mocker.spy(np.random, 'random')
+        self.jungle_cell.procreate()
+        assert mock_random.call_count == 1
+        self.jungle_cell.deaths()
+        assert mock_random.call_count == 2
+        self.jungle_cell.migration()
+        assert mock_random.call_count == 3
+
     def test_fodder_growth(self):
         """
         Tests that 'fodder_growth' successfully replenishes the fodder in the
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for ensemble module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import pytest
+import numpy as np
+from biosim.animals import Herbivore
+from biosim.ensemble import Ensemble, EnsembleResult, run_replicate
+
+
+class TestEnsemble:
+    """
+    Tests for ensembles of simulations.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_ensemble(self):
+        """
+        Setup for ensemble tests.
+        """
+        self.island_map = "OOOO\nOJSO\nOOOO"
+        self.ini_pop = [
+            {
+                "loc": (1, 1),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(20)
+                ] + [
+                    {"species": "Carnivore", "age": 5, "weight": 20}
+                    for _ in range(5)
+                ],
+            }
+        ]
+
+    def test_run_replicate(self):
+        """
+        Tests that a replicate records the initial counts and the counts
+        after every year.
+        """
+        counts = run_replicate(self.island_map, self.ini_pop, 1, 4)
+        assert counts.shape == (5, 2)
+        assert list(counts[0]) == [20, 5]
+
+    def test_ensemble_matches_replicates(self):
+        """
+        Tests that the ensemble runs one replicate per seed in worker
+        processes, with the same results as running them one by one.
+        """
+        ensemble = Ensemble(self.island_map, self.ini_pop)
+        result = ensemble.run([1, 2, 3], num_years=4, processes=2)
+        assert isinstance(result, EnsembleResult)
+        assert result.seeds == [1, 2, 3]
+        assert list(result.years) == [0, 1, 2, 3, 4]
+        assert result.replicates['Herbivore'].shape == (3, 5)
+        for k, seed in enumerate([1, 2, 3]):
+            counts = run_replicate(self.island_map, self.ini_pop, seed, 4)
+            assert list(result.replicates['Herbivore'][k]) == \
+                list(counts[:, 0])
+            assert list(result.replicates['Carnivore'][k]) == \
+                list(counts[:, 1])
+
+    def test_parameters_applied_in_workers_only(self):
+        """
+        Tests that the parameter overrides are used by the replicates, but
+        do not change the parameters of the calling process.
+        """
+        herbivores = [{"loc": (1, 1), "pop": self.ini_pop[0]["pop"][:20]}]
+        ensemble = Ensemble(self.island_map, herbivores,
+                            parameters={'Herbivore': {'omega': 0.0,
+                                                      'mu': 0.0}})
+        result = ensemble.run([1, 2], num_years=1, processes=2)
+        assert Herbivore.parameters['omega'] == 0.4
+        assert np.all(result.replicates['Herbivore'][:, 1] >= 20)
+
+    def test_statistics(self):
+        """
+        Tests the mean and quantiles of the replicates.
+        """
+        counts = np.array([[[10, 1], [20, 2]], [[30, 3], [40, 4]]])
+        result = EnsembleResult([1, 2], counts)
+        assert list(result.mean('Herbivore')) == [20, 30]
+        quantiles = result.quantiles('Carnivore', q=(0, 1))
+        assert quantiles.shape == (2, 2)
+        assert list(quantiles[1]) == [3, 4]
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for history module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import pytest
+import numpy as np
+from biosim.animals import Herbivore, Carnivore
+from biosim.branching import Snapshot
+from biosim.history import DensityHistory, load_density
+from biosim.simulation import BioSim
+
+
+class TestDensityHistory:
+    """
+    Tests for the memory-mapped density history.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_history(self, tmp_path):
+        """
+        Setup for density history tests.
+        """
+        self.filename = str(tmp_path / 'density.npy')
+        self.island_map = "OOOOO\nOJJSO\nOJSJO\nOOOOO"
+        self.ini_pop = [
+            {
+                "loc": (1, 1),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(40)
+                ] + [
+                    {"species": "Carnivore", "age": 5, "weight": 20}
+                    for _ in range(5)
+                ],
+            }
+        ]
+
+    @pytest.mark.parametrize('backend', ['object', 'array'])
+    def test_records_every_year(self, backend):
+        """
+        Tests that the initial distribution and every year are written, and
+        that the file grows past its first capacity.
+        """
+        history = DensityHistory(self.filename, capacity=2)
+        sim = BioSim(self.island_map, self.ini_pop, seed=1, backend=backend,
+                     density_history=history)
+        sim.simulate(num_years=4, vis_years=0)
+        island = sim.simulated_island
+        last_herbivores = island.animal_count_map(Herbivore)
+        last_carnivores = island.animal_count_map(Carnivore)
+        history.close()
+
+        densities = load_density(self.filename)
+        assert isinstance(densities, np.memmap)
+        assert densities.shape == (5, 4, 5, 2)
+        assert history.first_year == 0
+        assert densities[0, 1, 1, 0] == 40
+        assert densities[0, 1, 1, 1] == 5
+        assert np.array_equal(densities[-1, ..., 0], last_herbivores)
+        assert np.array_equal(densities[-1, ..., 1], last_carnivores)
+
+    def test_read_year_range(self):
+        """
+        Tests that a range of years can be read.
+        """
+        history = DensityHistory(self.filename)
+        sim = BioSim(self.island_map, self.ini_pop, seed=1,
+                     density_history=history)
+        sim.simulate(num_years=5, vis_years=0)
+        history.close()
+        densities = load_density(self.filename, years=slice(2, 4))
+        assert densities.shape == (2, 4, 5, 2)
+        assert np.array_equal(densities, np.load(self.filename)[2:4])
+
+    def test_first_year_is_stored(self):
+        """
+        Tests that the year of each row can be read back for a history
+        started after the simulation has run for some years.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=1)
+        sim.simulate(num_years=3, vis_years=0)
+        history = DensityHistory(self.filename)
+        history.record(sim)
+        for _ in range(2):
+            sim.simulate(num_years=1, vis_years=0)
+            history.record(sim)
+        history.close()
+
+        densities, year_numbers = load_density(self.filename,
+                                               return_years=True)
+        assert len(densities) == 3
+        assert list(year_numbers) == [3, 4, 5]
+        densities, year_numbers = load_density(self.filename, slice(1, 2),
+                                               return_years=True)
+        assert list(year_numbers) == [4]
+
+    @pytest.mark.parametrize('branch', [False, True])
+    def test_restored_simulation(self, branch):
+        """
+        Tests that a history attached to a restored or branched simulation
+        starts with the restored state and its year.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=1)
+        sim.simulate(num_years=5, vis_years=0)
+        herbivores = sim.simulated_island.animal_count_map(Herbivore)
+        history = DensityHistory(self.filename)
+        if branch:
+            restored = Snapshot(sim).branch(2, density_history=history)
+        else:
+            restored = BioSim.from_state(sim.state(),
+                                         density_history=history)
+        restored.simulate(num_years=3, vis_years=0)
+        history.close()
+
+        assert history.first_year == 5
+        densities, year_numbers = load_density(self.filename,
+                                               return_years=True)
+        assert list(year_numbers) == [5, 6, 7, 8]
+        assert herbivores.sum() > 0
+        assert np.array_equal(densities[0, ..., 0], herbivores)
+
+    def test_closed_history(self):
+        """
+        Tests that a closed history can not record more years.
+        """
+        history = DensityHistory(self.filename)
+        sim = BioSim(self.island_map, self.ini_pop, seed=1,
+                     density_history=history)
+        history.close()
+        with pytest.raises(ValueError):
+            sim.simulate(num_years=1, vis_years=0)
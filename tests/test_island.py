@@ -9,6 +9,8 @@ __email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
 
 import textwrap
 import pytest
+import numpy as np
+from pytest import approx
 from biosim.island import Island
 from biosim.cell import Cell, Desert
 from biosim.animals import Herbivore, Carnivore
@@ -171,6 +173,29 @@ class TestIsland:
         for coordinate in test_coordinates:
             assert isinstance(coordinate, Desert)
 
+    def test_neighbour_table(self):
+        """
+        Tests that the neighbour index table holds the indices of the nearby
+        cells that can be traversed, padded with -1, and that the same cells
+        are stored in each cell's 'passable_nearby_cells'.
+        """
+        self.island.map_constructor()
+        table = self.island.neighbour_table
+        self.island.generate_nearby_cells()
+
+        assert table.shape == (30, 4)
+        assert list(table[0]) == [10, 1, -1, -1]
+        assert list(table[12]) == [11, 22, -1, -1]
+        assert len(self.island.island_map[1][2].passable_nearby_cells) == 2
+        assert len(self.island.island_map[1][2].nearby_cells) == 4
+        columns = len(self.island.island_map[0])
+        cells = [cell for row in self.island.island_map for cell in row]
+        for index, cell in enumerate(cells):
+            nearby = [y * columns + x for y, x in
+                      (nearby_cell.coordinate
+                       for nearby_cell in cell.passable_nearby_cells)]
+            assert list(table[index][table[index] >= 0]) == nearby
+
     def test_add_herbivores(self):
         """
         Tests that herbivores can successfully be added to the island.
@@ -212,9 +237,9 @@ class TestIsland:
         pop_1 = self.island.island_map[1][3].population
         assert isinstance(pop_1, list)
         assert len(pop_1) == 3
-        assert isinstance(pop_1[0], Carnivore)
+        assert isinstance(pop_1[0], Herbivore)
         assert isinstance(pop_1[1], Herbivore)
-        assert isinstance(pop_1[2], Herbivore)
+        assert isinstance(pop_1[2], Carnivore)
 
     def test_adding_population_bad_input(self):
         """
@@ -240,6 +265,94 @@ class TestIsland:
         for animal in total_population:
             assert isinstance(animal, Herbivore)
 
+    @pytest.mark.parametrize('backend', ['object', 'array'])
+    def test_num_animals_per_species(self, backend):
+        """
+        Tests that the number of animals per species is kept up to date when
+        animals are added, born, killed and die.
+        """
+        island = Island(self.sample_map, backend=backend)
+        island.map_constructor()
+        island.generate_nearby_cells()
+        island.adding_population(self.test_population)
+        island.adding_population(self.herbivore_population)
+        assert island.num_animals_per_species == {
+            'Herbivore': 8, 'Carnivore': 2
+        }
+
+        for _ in range(10):
+            island.island_cycle()
+            animals = island.total_population()
+            assert island.num_animals_per_species == {
+                'Herbivore': sum(isinstance(a, Herbivore) for a in animals),
+                'Carnivore': sum(isinstance(a, Carnivore) for a in animals)
+            }
+            assert island.num_animals == len(animals)
+
+    @pytest.mark.parametrize('backend', ['object', 'array'])
+    def test_counts_follow_cell_api(self, backend):
+        """
+        Tests that the number of animals per species is kept up to date when
+        animals are added with 'Cell.add_animal' or by assigning
+        'Cell.population'.
+        """
+        island = Island(self.sample_map, backend=backend)
+        island.map_constructor()
+        island.generate_nearby_cells()
+        jungle = island.island_map[0][0]
+        jungle.add_animal(Herbivore(age=5, weight=20))
+        jungle.add_animal(Carnivore(age=5, weight=20))
+        assert island.num_animals_per_species == {
+            'Herbivore': 1, 'Carnivore': 1
+        }
+
+        jungle.population = [Herbivore() for _ in range(3)]
+        island.island_map[0][1].population = [Carnivore(), Carnivore()]
+        assert island.num_animals_per_species == {
+            'Herbivore': 3, 'Carnivore': 2
+        }
+
+        for _ in range(5):
+            island.island_cycle()
+            animals = island.total_population()
+            assert island.num_animals_per_species == {
+                'Herbivore': sum(isinstance(a, Herbivore) for a in animals),
+                'Carnivore': sum(isinstance(a, Carnivore) for a in animals)
+            }
+
+    def test_landscape_codes(self):
+        """
+        Tests that the landscape codes are stored in an array with the shape
+        of the map.
+        """
+        self.island.map_constructor()
+        assert self.island.landscape_codes.shape == (3, 10)
+        assert self.island.landscape_codes[0, 2] == 'O'
+        assert self.island.landscape_codes[1, 2] == 'M'
+
+    @pytest.mark.parametrize('backend', ['object', 'array'])
+    def test_animal_count_map(self, backend):
+        """
+        Tests that the number of animals of each species is counted per cell,
+        and that the counts can be written into a given array.
+        """
+        island = Island(self.sample_map, backend=backend)
+        island.map_constructor()
+        island.adding_population(self.test_population)
+
+        herbivores = island.animal_count_map(Herbivore)
+        assert herbivores.shape == (3, 10)
+        assert herbivores[0, 0] == 1
+        assert herbivores[1, 3] == 2
+        assert herbivores.sum() == 3
+
+        out = np.full((3, 10), -1)
+        carnivores = island.animal_count_map(Carnivore, out=out)
+        assert carnivores is out
+        assert carnivores[0, 0] == 1
+        assert carnivores[1, 3] == 1
+        assert carnivores.sum() == 2
+
 
 class TestIslandCycles:
     """
@@ -362,6 +475,19 @@ class TestIslandCycles:
         self.island.island_aging()
         assert self.mock_aging.call_count == 30
 
+    def test_island_aging_updates_fitness(self):
+        """
+        Tests that the fitness of the animals is updated after aging and loss
+        of weight.
+        """
+        self.island.map_constructor()
+        self.island.adding_population(self.test_population)
+        self.island.island_aging()
+        self.island.island_loss_of_weight()
+        for animal in self.island.total_population():
+            assert animal.age == 2
+            assert animal.fitness == approx(animal.calculate_fitness())
+
     def test_island_loss_of_weight(self):
         """
         Tests that loss_of_weight is successfully called for all cells.
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for movie module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import gc
+import json
+import os
+import sys
+import textwrap
+import pytest
+import matplotlib.pyplot as plt
+import biosim.simulation
+from biosim.movie import MovieWriter
+from biosim.simulation import BioSim
+
+
+class TestMovieWriter:
+    """
+    Tests for streaming frames to ffmpeg. A small script stands in for
+    ffmpeg and records its arguments and the number of bytes it reads.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_ffmpeg(self, tmp_path):
+        """
+        Creates the stand-in for ffmpeg.
+        """
+        self.tmp_path = tmp_path
+        self.ffmpeg = str(tmp_path / 'ffmpeg')
+        with open(self.ffmpeg, 'w') as file:
+            file.write(textwrap.dedent('''\
+                #!{}
+                import json, sys
+                data = sys.stdin.buffer.read()
+                if sys.argv[-1].endswith('fail.mp4'):
+                    sys.stderr.write('bad output')
+                    sys.exit(1)
+                with open(sys.argv[-1], 'w') as file:
+                    json.dump({{'args': sys.argv[1:], 'bytes': len(data)}},
+                              file)
+                ''').format(sys.executable))
+        os.chmod(self.ffmpeg, 0o755)
+        yield
+        plt.close('all')
+
+    def test_write_frames(self):
+        """
+        Tests that the raw RGBA buffer of every frame is sent to ffmpeg.
+        """
+        filename = str(self.tmp_path / 'movie.mp4')
+        figure = plt.figure(figsize=(2, 1), dpi=50)
+        writer = MovieWriter(filename, fps=5, ffmpeg_binary=self.ffmpeg)
+        for _ in range(3):
+            writer.write_frame(figure)
+        writer.close()
+        assert writer.size == (100, 50)
+        with open(filename) as file:
+            result = json.load(file)
+        assert result['bytes'] == 3 * 100 * 50 * 4
+        assert '100x50' in result['args']
+        assert 'rgba' in result['args']
+
+    def test_ffmpeg_error(self):
+        """
+        Tests that an error of ffmpeg is reported when the movie is
+        finished.
+        """
+        figure = plt.figure(figsize=(2, 1), dpi=50)
+        writer = MovieWriter(str(self.tmp_path / 'fail.mp4'),
+                             ffmpeg_binary=self.ffmpeg)
+        writer.write_frame(figure)
+        with pytest.raises(RuntimeError, match='bad output'):
+            writer.close()
+
+    def test_context_manager(self):
+        """
+        Tests that the movie is finished when the 'with' block is left, also
+        when the block fails.
+        """
+        figure = plt.figure(figsize=(2, 1), dpi=50)
+        filename = str(self.tmp_path / 'movie.mp4')
+        with MovieWriter(filename, ffmpeg_binary=self.ffmpeg) as writer:
+            writer.write_frame(figure)
+        assert os.path.exists(filename)
+
+        filename = str(self.tmp_path / 'failed.mp4')
+        with pytest.raises(ValueError):
+            with MovieWriter(filename, ffmpeg_binary=self.ffmpeg) as writer:
+                writer.write_frame(figure)
+                process = writer._process
+                raise ValueError
+        assert process.returncode is not None
+        assert os.path.exists(filename)
+
+    def test_unclosed_writer_stops_ffmpeg(self):
+        """
+        Tests that ffmpeg is stopped when a writer that was never closed is
+        garbage collected.
+        """
+        figure = plt.figure(figsize=(2, 1), dpi=50)
+        writer = MovieWriter(str(self.tmp_path / 'movie.mp4'),
+                             ffmpeg_binary=self.ffmpeg)
+        writer.write_frame(figure)
+        process = writer._process
+        del writer
+        gc.collect()
+        assert process.returncode is not None
+
+    def test_failed_simulation_closes_writer(self, monkeypatch):
+        """
+        Tests that the movie is finished when the simulation fails.
+        """
+        monkeypatch.setattr(biosim.simulation, '_FFMPEG_BINARY', self.ffmpeg)
+        filename = str(self.tmp_path / 'sim.mp4')
+        sim = BioSim("OOOO\nOJSO\nOOOO", [], seed=1, movie_file=filename)
+        sim.simulate(num_years=2, vis_years=1)
+        process = sim._movie_writer._process
+
+        def failing_cycle(year=None):
+            raise ValueError
+        monkeypatch.setattr(sim.simulated_island, 'island_cycle',
+                            failing_cycle)
+        with pytest.raises(ValueError):
+            sim.simulate(num_years=2, vis_years=1)
+        assert process.returncode is not None
+        with open(filename) as file:
+            assert json.load(file)['bytes'] > 0
+
+    @pytest.mark.parametrize('with_images', [False, True])
+    def test_simulation_streams_frames(self, monkeypatch, with_images):
+        """
+        Tests that a simulation with a movie file streams one frame per
+        image year, and writes image files only if img_base is given. The
+        simulation runs in a directory inside tmp_path, so the default
+        graphics directory is inside tmp_path as well.
+        """
+        monkeypatch.setattr(biosim.simulation, '_FFMPEG_BINARY', self.ffmpeg)
+        run_dir = self.tmp_path / 'run'
+        run_dir.mkdir()
+        monkeypatch.chdir(str(run_dir))
+        img_base = None
+        if with_images:
+            img_base = str(self.tmp_path / 'images' / 'dv')
+            (self.tmp_path / 'images').mkdir()
+        filename = str(self.tmp_path / 'sim.mp4')
+        sim = BioSim("OOOO\nOJSO\nOOOO", [], seed=1, movie_file=filename,
+                     img_base=img_base)
+        sim.simulate(num_years=4, vis_years=1, img_years=2)
+        sim.make_movie()
+        with open(filename) as file:
+            result = json.load(file)
+        width, height = sim._fig.canvas.get_width_height()
+        assert result['bytes'] == 2 * width * height * 4
+
+        images = sorted(
+            os.path.relpath(os.path.join(directory, name),
+                            str(self.tmp_path))
+            for directory, _, names in os.walk(str(self.tmp_path))
+            for name in names if name.endswith('.png')
+        )
+        if with_images:
+            assert images == [os.path.join('images', 'dv_00000.png'),
+                              os.path.join('images', 'dv_00001.png')]
+        else:
+            assert images == []
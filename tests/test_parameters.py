@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for parameters module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import math
+import pytest
+from biosim.animals import Herbivore, Carnivore
+from biosim.cell import Jungle
+from biosim.parameters import ParameterSet, ParameterDict
+from biosim.simulation import BioSim
+
+
+class TestParameterSet:
+    """
+    Tests for immutable parameter sets.
+    """
+
+    def test_derived_constants(self):
+        """
+        Tests that exp(lambda) and the pregnancy threshold are calculated
+        when the set is created.
+        """
+        constants = ParameterSet({'lambda': 1.0, 'zeta': 3.5,
+                                  'w_birth': 8.0, 'sigma_birth': 1.5})
+        assert constants.exp_lambda == math.exp(1.0)
+        assert constants.pregnancy_threshold == 3.5 * (8.0 + 1.5)
+        assert constants['lambda'] == 1.0
+
+    def test_immutable(self):
+        """
+        Tests that a parameter set can not be changed.
+        """
+        constants = ParameterSet({'F': 10.0})
+        with pytest.raises(AttributeError):
+            constants.F = 20.0
+        with pytest.raises(AttributeError):
+            del constants.F
+
+
+class TestParameterDict:
+    """
+    Tests for the default parameters of the classes.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_parameters(self):
+        """
+        Restores the parameters of the herbivores after each test.
+        """
+        saved = dict(Herbivore.parameters)
+        yield
+        Herbivore.parameters.clear()
+        Herbivore.parameters.update(saved)
+
+    def test_classes_use_parameter_dict(self):
+        """
+        Tests that the animal and landscape classes get parameter
+        dictionaries with matching constants.
+        """
+        for cls in (Herbivore, Carnivore, Jungle):
+            assert isinstance(cls.parameters, ParameterDict)
+            assert cls.constants is cls.parameters.constants
+
+    def test_change_replaces_constants(self):
+        """
+        Tests that changing a parameter replaces the constants, both through
+        the dictionary and through set_animal_parameters.
+        """
+        old = Herbivore.constants
+        Herbivore.parameters['lambda'] = 2.0
+        assert Herbivore.constants is not old
+        assert Herbivore.constants.exp_lambda == math.exp(2.0)
+        BioSim.set_animal_parameters('Herbivore', {'zeta': 1.0})
+        assert Herbivore.constants.pregnancy_threshold == \
+            1.0 * (Herbivore.parameters['w_birth'] +
+                   Herbivore.parameters['sigma_birth'])
+
+    def test_methods_follow_changes(self):
+        """
+        Tests that the methods reading the derived constants use the new
+        values after set_animal_parameters.
+        """
+        BioSim.set_animal_parameters('Herbivore', {'zeta': 2.0,
+                                                   'lambda': 0.5})
+        assert Herbivore.weight_check_for_pregnancy() == \
+            2.0 * (Herbivore.parameters['w_birth'] +
+                   Herbivore.parameters['sigma_birth'])
+        propensities = Herbivore.calculate_propensities([(2.0, None)],
+                                                        passable=True)
+        assert propensities == [pytest.approx(2.0 * math.exp(0.5))]
+
+
+class TestSimulationParameters:
+    """
+    Tests for parameters that only apply to one simulation.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_simulations(self):
+        """
+        Setup for simulation parameter tests.
+        """
+        self.island_map = "OOOO\nOJSO\nOOOO"
+        self.ini_pop = [
+            {
+                "loc": (1, 1),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(20)
+                ],
+            }
+        ]
+
+    def test_simulations_do_not_share_overrides(self):
+        """
+        Tests that parameters set on one simulation are stored on the cells
+        and animals of that simulation only, and leave the defaults
+        unchanged.
+        """
+        immortal = BioSim(self.island_map, self.ini_pop, seed=1)
+        immortal.set_animal_parameters('Herbivore', {'omega': 0.0})
+        starving = BioSim(self.island_map, self.ini_pop, seed=1)
+        starving.set_landscape_parameters('J', {'f_max': 0.0})
+
+        for sim, omega, f_max in ((immortal, 0.0, 800.0),
+                                  (starving, 0.4, 0.0)):
+            island = sim.simulated_island
+            jungle = island.island_map[1][1]
+            assert jungle.constants.f_max == f_max
+            for animal in jungle.herbivores:
+                assert animal.constants.omega == omega
+
+        assert Herbivore.constants.omega == 0.4
+        assert Jungle.constants.f_max == 800.0
+
+    @pytest.mark.parametrize('backend', ['object', 'array'])
+    def test_animals_use_simulation_parameters(self, backend):
+        """
+        Tests that animals born and moved during a simulation use the
+        parameters of the simulation, and that the classes are never
+        changed.
+        """
+        parameters = Herbivore.parameters
+        constants = Herbivore.constants
+        sim = BioSim(self.island_map, self.ini_pop, seed=1, backend=backend)
+        sim.set_animal_parameters('Herbivore', {'mu': 0.5})
+        sim.simulate(num_years=5, vis_years=0)
+        assert Herbivore.parameters is parameters
+        assert Herbivore.constants is constants
+
+        island = sim.simulated_island
+        assert island.parameter_sets['Herbivore'].mu == 0.5
+        animals = island.total_population()
+        assert len(animals) > 20
+        for animal in animals:
+            assert animal.constants.mu == 0.5
+
+    def test_default_changes_are_used(self):
+        """
+        Tests that a change of the default parameters is used by a running
+        simulation from the next year on.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=1)
+        try:
+            BioSim.set_landscape_parameters('J', {'f_max': 500.0})
+            sim.simulate(num_years=1, vis_years=0)
+            jungle = sim.simulated_island.island_map[1][1]
+            assert jungle.constants.f_max == 500.0
+        finally:
+            BioSim.set_landscape_parameters('J', {'f_max': 800.0})
+
+    @pytest.mark.parametrize('backend', ['object', 'array'])
+    def test_constructor_overrides(self, backend):
+        """
+        Tests that overrides given to the initializer are used for the
+        initial fodder and the fitness of the initial animals.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=1, backend=backend,
+                     parameters={'J': {'f_max': 10.0},
+                                 'Herbivore': {'w_half': 30.0}})
+        island = sim.simulated_island
+        assert island.island_map[1][1].fodder == 10.0
+        assert island.island_map[1][2].fodder == 300.0
+
+        expected = Herbivore(age=5, weight=20,
+                             constants=island.parameter_sets['Herbivore'])
+        assert expected.fitness < Herbivore(age=5, weight=20).fitness
+        for animal in island.total_population():
+            assert animal.fitness == pytest.approx(expected.fitness)
+
+    def test_set_parameters_updates_fitness(self):
+        """
+        Tests that setting parameters of a species on a simulation updates
+        the fitness of its animals.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=1)
+        sim.set_animal_parameters('Herbivore', {'w_half': 30.0})
+        expected = Herbivore(
+            age=5, weight=20,
+            constants=sim.simulated_island.parameter_sets['Herbivore']
+        )
+        for animal in sim.simulated_island.total_population():
+            assert animal.fitness == pytest.approx(expected.fitness)
+
+    def test_unknown_key(self):
+        """
+        Tests that unknown species and landscapes are rejected.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=1)
+        with pytest.raises(ValueError):
+            sim.set_animal_parameters('Rabbit', {'mu': 0.0})
+        with pytest.raises(ValueError):
+            sim.set_landscape_parameters('D', {'f_max': 10.0})
+        with pytest.raises(ValueError):
+            BioSim(self.island_map, self.ini_pop, seed=1,
+                   parameters={'D': {'f_max': 10.0}})
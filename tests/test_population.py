@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for population module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import textwrap
+import pytest
+import numpy as np
+from pytest import approx
+from biosim.island import Island
+from biosim.population import Population, build_neighbour_table
+from biosim.animals import Herbivore, Carnivore
+from biosim.simulation import BioSim
+
+
+class TestPopulation:
+    """
+    Tests for the array backend.
+    """
+
+    default_herbivore_parameters = {
+        'w_birth': 8.0, 'sigma_birth': 1.5, 'beta': 0.9, 'eta': 0.05,
+        'a_half': 40.0, 'phi_age': 0.2, 'w_half': 10.0, 'phi_weight': 0.1,
+        'mu': 0.25, 'lambda': 1.0, 'gamma': 0.2, 'zeta': 3.5, 'xi': 1.2,
+        'omega': 0.4, 'F': 10.0
+    }
+
+    @pytest.fixture(autouse=True)
+    def reset_all_params(self):
+        """
+        Sets all parameters to default values after each test.
+        """
+        yield
+        BioSim.set_animal_parameters(
+            "Herbivore", self.default_herbivore_parameters
+        )
+
+    @pytest.fixture(autouse=True)
+    def setup_population(self):
+        """
+        Setup for population tests.
+        """
+        sample_map = """\
+                        OOOOO
+                        OJJMO
+                        OJSDO
+                        OOOOO"""
+        self.sample_map = textwrap.dedent(sample_map)
+        self.island = Island(self.sample_map, backend='array')
+        self.island.map_constructor()
+        self.island.generate_nearby_cells()
+        self.island.adding_population([
+            {
+                "loc": (1, 1),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20.0}
+                    for _ in range(20)
+                ] + [
+                    {"species": "Carnivore", "age": 5, "weight": 20.0}
+                    for _ in range(5)
+                ],
+            }
+        ])
+        self.population = self.island.population
+
+    def test_invalid_backend(self):
+        """
+        Tests that an unknown backend raises ValueError.
+        """
+        with pytest.raises(ValueError):
+            Island("OOO", backend='dict')
+
+    def test_population_arrays(self):
+        """
+        Tests that added animals are stored in the arrays.
+        """
+        assert isinstance(self.population, Population)
+        assert len(self.population) == 25
+        assert self.population.count(Population.HERBIVORE) == 20
+        assert self.population.count(Population.CARNIVORE) == 5
+        assert np.all(self.population.cell == 6)
+
+    def test_cell_population_view(self):
+        """
+        Tests that the cell population is available as animal objects.
+        """
+        cell = self.island.island_map[1][1]
+        animals = cell.population
+        assert len(animals) == 25
+        assert sum(isinstance(animal, Herbivore) for animal in animals) == 20
+        assert cell.herbivores_in_cell == 20
+        assert cell.carnivores_in_cell == 5
+        assert self.island.island_map[1][2].population == []
+
+    def test_cell_population_setter(self):
+        """
+        Tests that setting the population of a cell replaces its animals.
+        """
+        self.island.island_map[1][2].population = [Carnivore(age=3,
+                                                             weight=10)]
+        self.island.island_map[1][1].population = []
+        assert len(self.population) == 1
+        assert self.island.island_map[1][2].population[0].age == 3
+
+    @pytest.mark.parametrize('phase', ['feeding', 'procreate', 'migration',
+                                       'aging', 'loss_of_weight', 'deaths'])
+    def test_cell_phases_raise(self, phase):
+        """
+        Tests that the phases of a cell using the array backend raise
+        RuntimeError and leave the animals unchanged.
+        """
+        cell = self.island.island_map[1][1]
+        age = self.population.age.copy()
+        weight = self.population.weight.copy()
+        with pytest.raises(RuntimeError):
+            getattr(cell, phase)()
+        assert np.array_equal(self.population.age, age)
+        assert np.array_equal(self.population.weight, weight)
+
+    def test_fitness_matches_animals(self):
+        """
+        Tests that the array fitness equals the fitness of animal objects.
+        """
+        herbivore = Herbivore(age=5, weight=20.0)
+        carnivore = Carnivore(age=5, weight=20.0)
+        herbivores = self.population.species == Population.HERBIVORE
+        assert self.population.fitness[herbivores] == approx(
+            herbivore.fitness)
+        assert self.population.fitness[~herbivores] == approx(
+            carnivore.fitness)
+
+    def test_feeding(self):
+        """
+        Tests that herbivores eat from the cell fodder.
+        """
+        self.island.population.keep(
+            self.population.species == Population.HERBIVORE
+        )
+        self.island.island_feeding()
+        assert self.island.island_map[1][1].fodder == 800 - 20 * 10
+        assert self.population.weight == approx(29.0)
+
+    def test_procreate(self):
+        """
+        Tests that newborns are added when the probability of birth is 1.
+        """
+        self.island.set_parameters('Herbivore', {'gamma': 20.0})
+        self.population.weight[:] = 40.0
+        self.island.island_procreate()
+        newborns = self.population.age == 0
+        assert np.count_nonzero(newborns) >= 20
+        assert np.all(self.population.cell[newborns] == 6)
+
+    def test_migration(self):
+        """
+        Tests that animals only migrate to nearby cells that can be traversed.
+        """
+        self.population.fitness[:] = 4
+        self.island.island_migration()
+        assert set(self.population.cell) <= {6, 7, 11}
+        assert not self.population.has_moved.any()
+
+    @pytest.mark.parametrize('migration', ['cellwise', 'island'])
+    def test_neighbour_table_from_construction(self, migration):
+        """
+        Tests that the population uses the neighbour table built by the
+        island's map constructor, so migration works without generating the
+        nearby cells.
+        """
+        island = Island(self.sample_map, backend='array',
+                        migration=migration)
+        island.map_constructor()
+        island.adding_population([
+            {"loc": (1, 1),
+             "pop": [{"species": "Herbivore", "age": 5, "weight": 20.0}
+                     for _ in range(20)]}
+        ])
+        population = island.population
+        assert population.neighbours is island.neighbour_table
+        population.fitness[:] = 4
+        island.island_migration()
+        assert set(population.cell) <= {6, 7, 11}
+        assert set(population.cell) != {6}
+
+    def test_build_neighbour_table(self):
+        """
+        Tests that the neighbour table lists the traversable nearby cells
+        above, left, below and right, padded with -1.
+        """
+        passable = np.array([[False, True, True],
+                             [True, True, False]])
+        table = build_neighbour_table(passable)
+        assert table.tolist() == [
+            [3, 1, -1, -1], [4, 2, -1, -1], [1, -1, -1, -1],
+            [4, -1, -1, -1], [1, 3, -1, -1], [2, 4, -1, -1]
+        ]
+
+    def test_adding_animals_one_at_a_time(self):
+        """
+        Tests that the buffers are only replaced when they are full, so
+        adding animals one at a time does not copy the arrays every time.
+        """
+        cell = self.island.island_map[1][2]
+        replaced = 0
+        buffer = self.population._buffers['age']
+        for age in range(1000):
+            cell.add_animal(Herbivore(age=age, weight=10))
+            if self.population._buffers['age'] is not buffer:
+                buffer = self.population._buffers['age']
+                replaced += 1
+        assert len(self.population) == 1025
+        assert replaced <= 7
+        assert cell.herbivores_in_cell == 1000
+        assert [animal.age for animal in cell.population] == list(
+            range(1000)
+        )
+
+    @pytest.mark.parametrize('migration', ['cellwise', 'island'])
+    def test_cell_counts_follow_phases(self, migration):
+        """
+        Tests that the counts, biomass and animals of each cell equal the
+        values found by scanning the arrays, after animals were born, moved
+        and removed.
+        """
+        ini_pop = [
+            {
+                "loc": loc,
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20.0}
+                    for _ in range(30)
+                ] + [
+                    {"species": "Carnivore", "age": 5, "weight": 20.0}
+                    for _ in range(5)
+                ],
+            }
+            for loc in ((2, 2), (3, 3))
+        ]
+        sim = BioSim(self.sample_map, ini_pop, seed=1, backend='array',
+                     migration=migration)
+        sim.simulate(num_years=5, vis_years=0)
+        population = sim.simulated_island.population
+        assert len(population) > 0
+        for index in range(population.n_cells):
+            in_cell = population.cell == index
+            herbivores = in_cell & (population.species ==
+                                    Population.HERBIVORE)
+            assert population.count_in_cell(
+                index, Population.HERBIVORE) == np.count_nonzero(herbivores)
+            assert population.count_in_cell(
+                index, Population.CARNIVORE) == \
+                np.count_nonzero(in_cell) - np.count_nonzero(herbivores)
+            assert population.biomass_in_cell(index) == approx(
+                population.weight[herbivores].sum())
+            assert [animal.weight for animal in population.animals_in_cell(
+                index)] == population.weight[in_cell].tolist()
+
+    def test_island_migration(self):
+        """
+        Tests that island-wide migration moves animals to nearby cells that
+        can be traversed, and keeps all animals. The carnivores stay, since
+        there are no herbivores in the nearby cells.
+        """
+        self.island.migration = 'island'
+        self.population.fitness[:] = 4
+        self.island.island_migration()
+        herbivores = self.population.species == Population.HERBIVORE
+        assert len(self.population) == 25
+        assert set(self.population.cell[herbivores]) <= {7, 11}
+        assert np.all(self.population.cell[~herbivores] == 6)
+
+    def test_island_migration_requires_array_backend(self):
+        """
+        Tests that island-wide migration is refused for the object backend.
+        """
+        with pytest.raises(ValueError):
+            Island("OOO", migration='island')
+
+    def test_aging_and_loss_of_weight(self):
+        """
+        Tests that aging and loss of weight update the arrays.
+        """
+        self.island.island_aging()
+        self.island.island_loss_of_weight()
+        assert np.all(self.population.age == 6)
+        herbivores = self.population.species == Population.HERBIVORE
+        assert self.population.weight[herbivores] == approx(19.0)
+        assert self.population.weight[~herbivores] == approx(17.5)
+
+    def test_deaths(self):
+        """
+        Tests that animals with fitness 0 die.
+        """
+        self.population.fitness[:5] = 0
+        self.population.fitness[5:] = 1
+        self.island.island_deaths()
+        assert len(self.population) == 20
+
+    def test_simulation_with_array_backend(self):
+        """
+        Tests that the island cycle runs with the array backend and that the
+        simulation reports the population.
+        """
+        sim = BioSim(
+            "OOOO\nOJSO\nOOOO",
+            [{"loc": (1, 1), "pop": [
+                {"species": "Herbivore", "age": 5, "weight": 20}
+                for _ in range(50)]}],
+            seed=1,
+            backend='array'
+        )
+        for _ in range(10):
+            sim.simulated_island.island_cycle()
+        assert sim.num_animals == len(sim.simulated_island.population)
+        assert sim.num_animals_per_species['Carnivore'] == 0
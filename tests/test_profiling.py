@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for profiling module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import pytest
+import numpy as np
+from biosim.profiling import PhaseProfiler
+from biosim.simulation import BioSim
+
+
+class TestPhaseProfiler:
+    """
+    Tests for the phase profiler.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_simulation(self):
+        """
+        Setup for profiling tests.
+        """
+        self.ini_pop = [
+            {
+                "loc": (1, 1),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(20)
+                ] + [
+                    {"species": "Carnivore", "age": 5, "weight": 20}
+                    for _ in range(5)
+                ],
+            }
+        ]
+        self.island_map = "OOOO\nOJSO\nOOOO"
+
+    def test_profiling_disabled_by_default(self):
+        """
+        Tests that no profiler is attached unless profiling is requested.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=1)
+        sim.simulate(num_years=2, vis_years=0)
+        assert sim.simulated_island.profiler is None
+        assert sim.phase_profile is None
+
+    @pytest.mark.parametrize('backend', ['object', 'array'])
+    def test_records_every_phase(self, backend):
+        """
+        Tests that one record is made per phase and year, with the number of
+        animals when the phase starts.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=1, backend=backend,
+                     profile=True)
+        sim.simulate(num_years=3, vis_years=0)
+        records = sim.phase_profile
+        assert len(records) == 3 * len(PhaseProfiler.phases)
+        assert [record['year'] for record in records[::7]] == [1, 2, 3]
+        assert [record['phase'] for record in records[:7]] == list(
+            PhaseProfiler.phases
+        )
+        assert records[0]['animals'] == 25
+        assert all(record['time'] >= 0 for record in records)
+
+    @pytest.mark.parametrize('backend, migration', [
+        ('object', 'cellwise'), ('array', 'cellwise'), ('array', 'island')
+    ])
+    def test_counts_random_numbers(self, monkeypatch, backend, migration):
+        """
+        Tests that the random numbers counted for each phase are the random
+        numbers drawn by NumPy during the phase, and that NumPy is not
+        changed by the profiler.
+        """
+        drawn = []
+
+        def counting(function):
+            def counted_function(*args, **kwargs):
+                result = function(*args, **kwargs)
+                drawn[-1] += np.size(result)
+                return result
+            return counted_function
+
+        for name in ('random', 'normal'):
+            monkeypatch.setattr(np.random, name,
+                                counting(getattr(np.random, name)))
+        sim = BioSim(self.island_map, self.ini_pop, seed=1, backend=backend,
+                     migration=migration, profile=True)
+        island = sim.simulated_island
+        for phase in PhaseProfiler.phases:
+            method = getattr(island, 'island_' + phase)
+
+            def counted_phase(method=method):
+                drawn.append(0)
+                method()
+            monkeypatch.setattr(island, 'island_' + phase, counted_phase)
+
+        sim.simulate(num_years=4, vis_years=0)
+        records = sim.phase_profile
+        assert [record['random_numbers'] for record in records] == drawn
+        assert sum(drawn) > 0
+        by_phase = {record['phase']: record for record in records[:7]}
+        assert by_phase['fodder_growth']['random_numbers'] == 0
+        assert by_phase['deaths']['random_numbers'] == \
+            by_phase['deaths']['animals']
+
+    def test_records_year_after_restore(self):
+        """
+        Tests that a simulation restored from a state records the years
+        following the year of the state.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=1)
+        sim.simulate(num_years=3, vis_years=0)
+        restored = BioSim.from_state(sim.state(), profile=True)
+        restored.simulate(num_years=2, vis_years=0)
+        assert [record['year'] for record in
+                restored.phase_profile[::7]] == [4, 5]
+
+    def test_profiling_keeps_results(self):
+        """
+        Tests that profiling does not change the simulation.
+        """
+        plain = BioSim(self.island_map, self.ini_pop, seed=1)
+        plain.simulate(num_years=5, vis_years=0)
+        profiled = BioSim(self.island_map, self.ini_pop, seed=1, profile=True)
+        profiled.simulate(num_years=5, vis_years=0)
+        assert plain.num_animals_per_species == \
+            profiled.num_animals_per_species
+
+    def test_totals(self):
+        """
+        Tests that the totals sum the records of each phase.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=1, profile=True)
+        sim.simulate(num_years=2, vis_years=0)
+        totals = sim.simulated_island.profiler.totals()
+        assert set(totals) == set(PhaseProfiler.phases)
+        assert totals['feeding']['animals'] == sum(
+            record['animals'] for record in sim.phase_profile
+            if record['phase'] == 'feeding'
+        )
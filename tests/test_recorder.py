@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for recorder module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import pytest
+import numpy as np
+from biosim.recorder import GrowableColumn, StatisticsRecorder, \
+    load_statistics
+from biosim.simulation import BioSim
+
+
+class TestGrowableColumn:
+    """
+    Tests for growable columns.
+    """
+
+    def test_append_grows(self):
+        """
+        Tests that a column keeps all values when it grows past its
+        capacity.
+        """
+        column = GrowableColumn(shape=(2,), dtype=int, capacity=2)
+        for k in range(5):
+            column.append([k, -k])
+        assert len(column) == 5
+        assert column.data.shape == (5, 2)
+        assert list(column.data[:, 0]) == [0, 1, 2, 3, 4]
+
+    def test_clear(self):
+        """
+        Tests that a cleared column is empty.
+        """
+        column = GrowableColumn()
+        column.append(1.0)
+        column.clear()
+        assert len(column) == 0
+        assert column.data.shape == (0,)
+
+
+class TestStatisticsRecorder:
+    """
+    Tests for recording the statistics of a simulation.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_recorder(self):
+        """
+        Setup for recorder tests.
+        """
+        self.island_map = "OOOOO\nOJJSO\nOJSJO\nOOOOO"
+        self.ini_pop = [
+            {
+                "loc": (1, 1),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(40)
+                ] + [
+                    {"species": "Carnivore", "age": 5, "weight": 20}
+                    for _ in range(5)
+                ],
+            }
+        ]
+
+    @pytest.mark.parametrize('backend', ['object', 'array'])
+    def test_records_every_year(self, backend):
+        """
+        Tests that one row is recorded per simulated year, with the same
+        numbers of animals as the simulation.
+        """
+        recorder = StatisticsRecorder(cell_counts=True)
+        sim = BioSim(self.island_map, self.ini_pop, seed=1, backend=backend,
+                     recorder=recorder)
+        sim.simulate(num_years=3, vis_years=0)
+        columns = recorder.columns
+        assert list(columns['year']) == [1, 2, 3]
+        assert columns['herbivores'][-1] == \
+            sim.num_animals_per_species['Herbivore']
+        assert columns['carnivores'][-1] == \
+            sim.num_animals_per_species['Carnivore']
+        assert columns['cell_counts'].shape == (3, 4, 5, 2)
+        assert np.array_equal(columns['cell_counts'].sum(axis=(1, 2)),
+                              np.stack([columns['herbivores'],
+                                        columns['carnivores']], axis=1))
+        assert columns['herbivore_age_histogram'].shape == (3, 12)
+        assert np.all(columns['herbivore_mean_age'] > 0)
+
+    @pytest.mark.parametrize('backend', ['object', 'array'])
+    def test_matches_state(self, mocker, backend):
+        """
+        Tests that the recorded statistics equal the statistics of the
+        animals in the state of the island, which the recorder does not
+        create itself.
+        """
+        recorder = StatisticsRecorder()
+        sim = BioSim(self.island_map, self.ini_pop, seed=1, backend=backend)
+        sim.simulate(num_years=3, vis_years=0)
+        state = mocker.spy(sim.simulated_island, 'state')
+        recorder.record(sim)
+        assert state.call_count == 0
+
+        state = sim.simulated_island.state()
+        for code, name in enumerate(('herbivore', 'carnivore')):
+            members = state['species'] == code
+            assert recorder.columns[name + 's'][0] == \
+                np.count_nonzero(members)
+            for attribute in ('fitness', 'age', 'weight'):
+                assert recorder.columns[
+                    '{}_mean_{}'.format(name, attribute)][0] == \
+                    pytest.approx(state[attribute][members].mean())
+            assert np.array_equal(
+                recorder.columns[name + '_weight_histogram'][0],
+                np.histogram(state['weight'][members],
+                             recorder.weight_bins)[0]
+            )
+
+    def test_missing_species(self):
+        """
+        Tests that the means of a species without animals are NaN.
+        """
+        recorder = StatisticsRecorder()
+        sim = BioSim(self.island_map, self.ini_pop[:0], seed=1)
+        recorder.record(sim)
+        assert recorder.columns['herbivores'][0] == 0
+        assert np.isnan(recorder.columns['herbivore_mean_fitness'][0])
+
+    def test_save_npz(self, tmp_path):
+        """
+        Tests that all columns are written to an npz file.
+        """
+        filename = str(tmp_path / 'statistics.npz')
+        recorder = StatisticsRecorder()
+        sim = BioSim(self.island_map, self.ini_pop, seed=1,
+                     recorder=recorder)
+        sim.simulate(num_years=2, vis_years=0)
+        recorder.save_npz(filename)
+        with np.load(filename) as data:
+            assert set(data.files) == set(recorder.columns)
+            assert list(data['year']) == [1, 2]
+
+    def test_streaming(self, tmp_path):
+        """
+        Tests that streaming bounds the rows in memory, and that the files
+        together hold every year.
+        """
+        base = str(tmp_path / 'statistics')
+        recorder = StatisticsRecorder(stream_base=base, stream_years=3)
+        sim = BioSim(self.island_map, self.ini_pop, seed=1,
+                     recorder=recorder)
+        sim.simulate(num_years=7, vis_years=0)
+        assert len(recorder.columns['year']) == 1
+        recorder.flush()
+        assert recorder.chunks_written == 3
+        columns = load_statistics(base)
+        assert list(columns['year']) == list(range(1, 8))
+
+    def test_save_parquet(self, tmp_path):
+        """
+        Tests that the columns are written to a Parquet file, with the
+        histograms flattened.
+        """
+        pd = pytest.importorskip('pandas')
+        pytest.importorskip('pyarrow')
+        filename = str(tmp_path / 'statistics.parquet')
+        recorder = StatisticsRecorder()
+        sim = BioSim(self.island_map, self.ini_pop, seed=1,
+                     recorder=recorder)
+        sim.simulate(num_years=2, vis_years=0)
+        recorder.save_parquet(filename)
+        table = pd.read_parquet(filename)
+        assert list(table['year']) == [1, 2]
+        assert 'herbivore_age_histogram_0' in table.columns
@@ -7,8 +7,11 @@ Tests for simulation module
 __author__ = "Michael Lindberg, Daniel Milliam Müller"
 __email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
 
+import subprocess
+import sys
 import textwrap
 import pytest
+import numpy as np
 import pandas as pd
 from biosim.animals import Carnivore, Herbivore
 from biosim.cell import Jungle, Savannah
@@ -221,6 +224,8 @@ class TestSimulation:
         """
         carnivore_map = self.sim.carnivore_island_map()
         assert isinstance(carnivore_map, list)
+        assert len(carnivore_map) == 3
+        assert carnivore_map[2][2] == 40
 
     def test_herbivore_island_map(self):
         """
@@ -263,6 +268,35 @@ class TestSimulation:
         self.sim.simulate(num_years=1)
         assert self.sim.year == 1
 
+    @pytest.mark.parametrize('vis_years', [0, None])
+    def test_headless_simulate(self, mocker, vis_years):
+        """
+        Tests that a headless simulation updates the year without setting up
+        or updating any graphics.
+        """
+        mock_setup = mocker.spy(BioSim, '_setup_graphics')
+        mock_update = mocker.spy(BioSim, '_update_graphics')
+        self.sim.simulate(num_years=3, vis_years=vis_years)
+        assert self.sim.year == 3
+        assert self.sim._fig is None
+        assert mock_setup.call_count == 0
+        assert mock_update.call_count == 0
+
+    def test_headless_simulate_does_not_import_matplotlib(self):
+        """
+        Tests that neither matplotlib nor pandas are imported by importing
+        the simulation module and running a headless simulation.
+        """
+        script = textwrap.dedent("""\
+            import sys
+            from biosim.simulation import BioSim
+            sim = BioSim("OOO\\nOJO\\nOOO", [], seed=1)
+            sim.simulate(num_years=2, vis_years=0)
+            print('matplotlib' in sys.modules, 'pandas' in sys.modules)
+            """)
+        output = subprocess.check_output([sys.executable, '-c', script])
+        assert output.decode().split() == ['False', 'False']
+
     def test_num_animals_property(self):
         """
         Tests that the correct number of animals is returned.
@@ -288,9 +322,161 @@ class TestSimulation:
         data_frame = self.sim.animal_distribution
         assert isinstance(data_frame, pd.DataFrame)
 
+    @pytest.mark.parametrize('backend', ['object', 'array'])
+    def test_animal_distribution_raw(self, backend):
+        """
+        Tests that the raw distribution holds the same columns as the
+        DataFrame, as NumPy arrays.
+        """
+        sim = BioSim("OOOO\nOJSO\nOOOO", [
+            {"loc": (1, 2), "pop": [
+                {"species": "Herbivore", "age": 5, "weight": 20},
+                {"species": "Carnivore", "age": 5, "weight": 20}]}
+        ], seed=1, backend=backend)
+        raw = sim.get_animal_distribution(raw=True)
+        data_frame = sim.animal_distribution
+        assert set(raw) == {"Row", "Col", "Herbivore", "Carnivore"}
+        for column in raw:
+            assert isinstance(raw[column], np.ndarray)
+            assert list(raw[column]) == list(data_frame[column])
+        assert list(raw['Row']) == [0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2]
+        assert list(raw['Col']) == [0, 1, 2, 3] * 3
+        assert raw['Herbivore'][6] == 1
+        assert raw['Carnivore'].sum() == 1
+
+    def test_heat_maps_match_island(self):
+        """
+        Tests that the heat maps have the shape of the island and show the
+        number of animals in each cell.
+        """
+        self.sim._setup_graphics(5)
+        self.sim._update_graphics()
+        herbivores = self.sim.herb_heat_bar.get_array()
+        assert herbivores.shape == (3, 10)
+        assert herbivores[2, 1] == 150
+        assert self.sim.carn_heat_bar.get_array()[2, 2] == 40
+
+    def test_update_graphics_reuses_artists(self, mocker):
+        """
+        Tests that updating the graphics changes the existing artists and
+        redraws only them, instead of adding images and drawing the whole
+        figure.
+        """
+        self.sim._setup_graphics(20)
+        draw = mocker.spy(self.sim._fig.canvas, 'draw')
+        for _ in range(5):
+            self.sim._update_graphics()
+            self.sim.idx += 1
+        assert len(self.sim.herb_heat.images) == 1
+        assert len(self.sim.carn_heat.images) == 1
+        assert draw.call_count == 0
+        assert all(artist.get_animated()
+                   for artist in self.sim._animated_artists)
+
+    def test_saved_images_include_animated_artists(self, tmp_path):
+        """
+        Tests that the artists updated by blitting are drawn when an image
+        is saved, and are animated again afterwards.
+        """
+        self.sim._img_base = str(tmp_path / 'frame')
+        self.sim._setup_graphics(5)
+        self.sim._update_graphics()
+        drawn = []
+        self.sim.herb_heat_bar.draw = lambda renderer: drawn.append(True)
+        self.sim._save_graphics()
+        assert drawn
+        assert (tmp_path / 'frame_00000.png').exists()
+        assert self.sim.herb_heat_bar.get_animated()
+
     def test_make_movies_raises_error(self):
         """
         Tests that 'make_movie' raises runtime error for no self._img_base.
         """
         with pytest.raises(RuntimeError):
             self.sim.make_movie()
+
+
+class TestCheckpoint:
+    """
+    Tests for saving and restoring the state of a simulation.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_checkpoint(self):
+        """
+        Setup for checkpoint tests.
+        """
+        self.island_map = "OOOOOOO\nOJJSJJO\nOJSJJSO\nOJJDJMO\nOOOOOOO"
+        self.ini_pop = [
+            {
+                "loc": (2, 2),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(100)
+                ] + [
+                    {"species": "Carnivore", "age": 5, "weight": 20}
+                    for _ in range(20)
+                ],
+            }
+        ]
+
+    @pytest.mark.parametrize('backend, migration', [
+        ('object', 'cellwise'), ('array', 'cellwise'), ('array', 'island')
+    ])
+    def test_restore_is_exact(self, tmp_path, backend, migration):
+        """
+        Tests that a restored simulation continues exactly like the saved
+        simulation, including parameters set on the simulation only.
+        """
+        filename = str(tmp_path / 'checkpoint.npz')
+        sim = BioSim(self.island_map, self.ini_pop, seed=2, backend=backend,
+                     migration=migration)
+        sim.set_animal_parameters('Herbivore', {'mu': 0.3})
+        sim.simulate(num_years=4, vis_years=0)
+        sim.save_checkpoint(filename)
+        sim.simulate(num_years=6, vis_years=0)
+        expected = sim.state()
+
+        restored = BioSim.load_checkpoint(filename)
+        assert restored.year == 4
+        restored.simulate(num_years=6, vis_years=0)
+        state = restored.state()
+        assert restored.year == 10
+        assert set(state) == set(expected)
+        for key in expected:
+            assert np.array_equal(state[key], expected[key])
+
+    def test_from_state_accepts_seed(self):
+        """
+        Tests that 'from_state' accepts a seed, and that the restored
+        simulation still continues from the saved random state.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=2)
+        sim.simulate(num_years=2, vis_years=0)
+        state = sim.state()
+        sim.simulate(num_years=3, vis_years=0)
+        expected = sim.num_animals_per_species
+
+        restored = BioSim.from_state(state, seed=99)
+        restored.simulate(num_years=3, vis_years=0)
+        assert restored.num_animals_per_species == expected
+
+    def test_periodic_checkpoints(self, tmp_path):
+        """
+        Tests that 'simulate' replaces the checkpoint file every
+        'checkpoint_years' years.
+        """
+        filename = str(tmp_path / 'checkpoint.npz')
+        sim = BioSim(self.island_map, self.ini_pop, seed=2)
+        sim.simulate(num_years=7, vis_years=0, checkpoint_years=3,
+                     checkpoint_file=filename)
+        assert BioSim.load_checkpoint(filename).year == 6
+        assert not (tmp_path / 'checkpoint.npz.tmp').exists()
+
+    def test_checkpoint_file_required(self):
+        """
+        Tests that checkpoint years without a file are rejected.
+        """
+        sim = BioSim(self.island_map, self.ini_pop, seed=2)
+        with pytest.raises(ValueError):
+            sim.simulate(num_years=1, vis_years=0, checkpoint_years=1)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for sweep module
+"""
+
+__author__ = "Michael Lindberg, Daniel Milliam Müller"
+__email__ = "michael.lindberg@nmbu.no, daniel.milliam.muller@nmbu.no"
+
+import json
+import numpy as np
+import pytest
+from biosim.animals import Herbivore
+from biosim.ensemble import run_replicate
+from biosim.sweep import Sweep, parameter_grid, result_key
+
+
+class TestSweep:
+    """
+    Tests for parameter sweeps.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_sweep(self, tmp_path):
+        """
+        Setup for sweep tests.
+        """
+        self.island_map = "OOOO\nOJSO\nOOOO"
+        self.ini_pop = [
+            {
+                "loc": (1, 1),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(20)
+                ],
+            }
+        ]
+        self.combinations = parameter_grid(
+            {'Herbivore': {'gamma': [0.2, 0.5]}, 'J': {'f_max': [300, 800]}}
+        )
+        self.results_file = str(tmp_path / 'sweep.jsonl')
+
+    def test_parameter_grid(self):
+        """
+        Tests that the grid contains every combination of values.
+        """
+        assert len(self.combinations) == 4
+        assert {'Herbivore': {'gamma': 0.5}, 'J': {'f_max': 300}} in \
+            self.combinations
+
+    def test_run_streams_results(self):
+        """
+        Tests that one result is returned per combination and seed, with the
+        same counts as a single run with the combination.
+        """
+        sweep = Sweep(self.island_map, self.ini_pop, self.combinations,
+                      num_years=3, seeds=(1, 2))
+        results = list(sweep.run(processes=2))
+        assert len(results) == 8
+        for result in results:
+            counts = run_replicate(self.island_map, self.ini_pop,
+                                   result['seed'], 3, result['parameters'])
+            assert result['counts']['Herbivore'] == list(counts[:, 0])
+        assert Herbivore.parameters['gamma'] == 0.2
+
+    def test_resume(self):
+        """
+        Tests that finished runs are stored and skipped when the sweep is
+        run again.
+        """
+        sweep = Sweep(self.island_map, self.ini_pop, self.combinations[:2],
+                      num_years=2, results_file=self.results_file)
+        assert len(list(sweep.run(processes=2))) == 2
+
+        sweep = Sweep(self.island_map, self.ini_pop, self.combinations,
+                      num_years=2, results_file=self.results_file)
+        assert len(list(sweep.run(processes=2))) == 2
+        assert len(list(sweep.run(processes=2))) == 0
+
+        results = sweep.results()
+        assert [result['parameters'] for result in results] == \
+            self.combinations
+        with open(self.results_file) as file:
+            assert len([json.loads(line) for line in file]) == 4
+
+    def test_numpy_grid_values(self):
+        """
+        Tests that grids with NumPy values, e.g. from 'numpy.linspace', can
+        be stored and resumed.
+        """
+        combinations = parameter_grid(
+            {'Herbivore': {'gamma': np.linspace(0.2, 0.4, 2)}}
+        )
+        assert result_key(combinations[0], np.int64(1)) == \
+            result_key({'Herbivore': {'gamma': 0.2}}, 1)
+
+        sweep = Sweep(self.island_map, self.ini_pop, combinations,
+                      num_years=2, results_file=self.results_file)
+        assert len(list(sweep.run(processes=2))) == 2
+        assert len(list(sweep.run(processes=2))) == 0